@@ -22,15 +22,26 @@
 # SOFTWARE.
 import nidaqmx
 from  nidaqmx.constants import *
+from nidaqmx.stream_readers import AnalogMultiChannelReader, CounterReader
 from connectionConfig import *
+import numpy as np
 import sys
 
 def configureDAQ(Nsamples):
+	if DAQ_AcquisitionMode == 'counter':
+		return configureCounter(Nsamples)
+	if DAQ_AcquisitionMode != 'analog':
+		print('Error: unrecognised DAQ_AcquisitionMode',DAQ_AcquisitionMode,'. Valid modes are \'analog\' and \'counter\'. Please edit DAQ_AcquisitionMode in connectionConfig.py.')
+		sys.exit()
+	readTask = None
 	try:
 		#Create and configure an analog input voltage task
 		NsampsPerDAQread=2*Nsamples
 		readTask = nidaqmx.Task()
 		channel = readTask.ai_channels.add_ai_voltage_chan(DAQ_APDInput,"",TerminalConfiguration.RSE,minVoltage,maxVoltage,VoltageUnits.VOLTS)
+		if DAQ_RefInput is not None:
+			#Reference channel (e.g. laser-power photodiode), sampled by the same sample clock as the APD input:
+			refChannel = readTask.ai_channels.add_ai_voltage_chan(DAQ_RefInput,"",TerminalConfiguration.RSE,minVoltage,maxVoltage,VoltageUnits.VOLTS)
 		#Configure sample clock
 		readTask.timing.cfg_samp_clk_timing(DAQ_MaxSamplingRate,DAQ_SampleClk,Edge.RISING,AcquisitionType.FINITE, NsampsPerDAQread)
 		#Configure convert clock
@@ -41,10 +52,88 @@ def configureDAQ(Nsamples):
 		readStartTrig.cfg_dig_edge_start_trig(DAQ_StartTrig,Edge.RISING)
 	except Exception as excpt:
 		print('Error configuring DAQ. Please check your DAQ is connected and powered. Exception details:', type(excpt).__name__,'.',excpt)
-		closeDAQTask(task)
+		if readTask is not None:
+			closeDAQTask(readTask)
+		sys.exit()
+	return readTask
+
+def configureCounter(Nsamples):
+	#Configures a photon-counting task: the counter counts the rising edges of the APD's TTL pulses (DAQ_CounterSource) only while the PB_DAQ gate pulse (DAQ_SampleClk) is high, and the count is sampled at the end of each gate pulse.
+	if DAQ_RefInput is not None:
+		print('Error: the reference input (DAQ_RefInput) can only be used in the \'analog\' DAQ_AcquisitionMode. Please set DAQ_RefInput to None in connectionConfig.py.')
+		sys.exit()
+	readTask = None
+	try:
+		NsampsPerDAQread=2*Nsamples
+		readTask = nidaqmx.Task()
+		channel = readTask.ci_channels.add_ci_count_edges_chan(DAQ_CounterInput,"",Edge.RISING,0,CountDirection.COUNT_UP)
+		channel.ci_count_edges_term = DAQ_CounterSource
+		#Pause counting while the gate is low:
+		readTask.triggers.pause_trigger.trig_type = TriggerType.DIGITAL_LEVEL
+		readTask.triggers.pause_trigger.dig_lvl_src = DAQ_SampleClk
+		readTask.triggers.pause_trigger.dig_lvl_when = Level.LOW
+		#Sample the count on the falling edge of each gate pulse:
+		readTask.timing.cfg_samp_clk_timing(DAQ_MaxSamplingRate,DAQ_SampleClk,Edge.FALLING,AcquisitionType.FINITE, NsampsPerDAQread)
+		#Counter tasks are armed (rather than started) by the start trigger:
+		readTask.triggers.arm_start_trigger.trig_type = TriggerType.DIGITAL_EDGE
+		readTask.triggers.arm_start_trigger.dig_edge_src = DAQ_StartTrig
+		readTask.triggers.arm_start_trigger.dig_edge_edge = Edge.RISING
+	except Exception as excpt:
+		print('Error configuring DAQ counter. Please check your DAQ is connected and powered. Exception details:', type(excpt).__name__,'.',excpt)
+		if readTask is not None:
+			closeDAQTask(readTask)
 		sys.exit()
 	return readTask
 
+class SimulatedCounterTask:
+	#Stand-in for a counter task, for testing and benchmarking the counting mode without a DAQ. Gates alternate between signal and
+	#background (as in the pulse sequences), with Poisson-distributed counts of mean countsPerGate*[1, backgroundRatio], and
+	#read_many_sample_uint32 returns the cumulative counts, which restart from initialCount (set close to 2**32 to test counter rollover) when the task is started.
+	def __init__(self,countsPerGate=20,backgroundRatio=1.05,initialCount=0,seed=None):
+		self.meanCounts = [countsPerGate,countsPerGate*backgroundRatio]
+		self.initialCount = initialCount
+		self.currentCount = initialCount
+		self.rng = np.random.default_rng(seed)
+		self.lastGateCounts = None
+
+	def start(self):
+		self.currentCount = self.initialCount
+
+	def stop(self):
+		pass
+
+	def read_many_sample_uint32(self,buffer,number_of_samples_per_channel,timeout):
+		N = number_of_samples_per_channel
+		lam = np.resize(self.meanCounts,N)
+		self.lastGateCounts = self.rng.poisson(lam).astype(np.uint32)
+		buffer[:N] = (self.currentCount+np.cumsum(self.lastGateCounts,dtype=np.uint64))%(2**32)
+		self.currentCount = int(buffer[N-1])
+		return N
+
+	def close(self):
+		pass
+
+def readDAQcounts(task,N,timeout,buffer=None,previousCount=None):
+	#Reads N cumulative counts from a counter task into a uint32 NumPy buffer (which can be passed in to be reused between reads) and returns the number of counts in each gate.
+	#When an acquisition is read in several chunks, previousCount is the last cumulative count of the previous chunk.
+	if buffer is None:
+		buffer = np.zeros(N,dtype=np.uint32)
+	try:
+		if isinstance(task,SimulatedCounterTask):
+			task.read_many_sample_uint32(buffer,number_of_samples_per_channel=N,timeout=timeout)
+		else:
+			CounterReader(task.in_stream).read_many_sample_uint32(buffer,number_of_samples_per_channel=N,timeout=timeout)
+	except Exception as excpt:
+		print('Error: could not read DAQ counter. Please check your DAQ\'s connections. Exception details:', type(excpt).__name__,'.',excpt)
+		sys.exit()
+	#The counter restarts from its initial count (0) for every read. Differences are taken in uint32 arithmetic, so they stay correct if the counter rolls over.
+	if previousCount is None:
+		previousCount = task.initialCount if isinstance(task,SimulatedCounterTask) else 0
+	gateCounts = np.empty(N,dtype=np.uint32)
+	np.subtract(buffer[0:1],np.uint32(previousCount),out=gateCounts[0:1])
+	np.subtract(buffer[1:N],buffer[0:N-1],out=gateCounts[1:])
+	return gateCounts
+
 def readDAQ(task,N,timeout):
 	try:
 		counts = task.read(N,timeout)
@@ -52,6 +141,29 @@ def readDAQ(task,N,timeout):
 		print('Error: could not read DAQ. Please check your DAQ\'s connections. Exception details:', type(excpt).__name__,'.',excpt)
 		sys.exit()
 	return counts
+
+def readDAQchannels(task,N,timeout,buffer=None):
+	#Reads N samples from each channel of the task into a (channels, samples) NumPy array. Row 0 is the APD input and row 1, if configured, the reference input (DAQ_RefInput).
+	#A buffer of this shape can be passed in to be reused between reads.
+	if buffer is None:
+		buffer = np.zeros((len(task.ai_channels.channel_names),N))
+	try:
+		AnalogMultiChannelReader(task.in_stream).read_many_sample(buffer,N,timeout)
+	except Exception as excpt:
+		print('Error: could not read DAQ. Please check your DAQ\'s connections. Exception details:', type(excpt).__name__,'.',excpt)
+		sys.exit()
+	return buffer
 	
+def startDAQ(task):
+	#Starts an acquisition explicitly, so that it can be read in several chunks (a read of a task which has not been started starts and stops the task for that read only).
+	try:
+		task.start()
+	except Exception as excpt:
+		print('Error: could not start DAQ acquisition. Exception details:', type(excpt).__name__,'.',excpt)
+		sys.exit()
+
+def stopDAQ(task):
+	task.stop()
+
 def closeDAQTask(task):
 	task.close()
\ No newline at end of file
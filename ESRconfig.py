@@ -56,7 +56,7 @@ To run this script:
  *Nsamples: number of fluorescence measurement samples to take at each frequency point.
  *Navg: number of averaging runs (i.e. number of times the frequency scan is repeated).
  *plotPulseSequence: if set to True, this script will generate a plot of the pulse sequence ouput by the PulseBlaster
- *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired)
+ *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired). Set this to 'auto' to derive the timeout of each DAQ read from the period of the compiled pulse sequence (twice the expected acquisition time plus a 1s margin), so that a hang is detected quickly.
  *contrastMode: set this to one of 'ratio_SignalOverReference', 'ratio_DifferenceOverSum' or 'signalOnly', depending on which contrast mode you want to use (see 'Contrast setting' description above)
  *livePlotUpdate: set this to True to update the plot as data is acquired (see 'Plotting options' above)
  *plotPulseSequence: set this to True to plot the pulse sequence at the start of the experiment (see 'Plotting options' above)
@@ -74,7 +74,6 @@ from spinapi import ns,us,ms
 from SRScontrol import Hz, kHz, MHz, GHz
 import os
 import numpy as np
-from time import localtime, strftime
 from connectionConfig import *
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/PBclk #in ns
@@ -97,8 +96,8 @@ t_duration = 80*us
 Nsamples = 1000
 # Number of averaging runs to do:
 Navg = 1
-#DAQ timeout, in seconds:
-DAQtimeout = 10
+#DAQ timeout, in seconds (or 'auto'):
+DAQtimeout = 'auto'
 # Contrast mode
 contrastMode ='ratio_SignalOverReference'
 # Plotting options--------------------------------------------------------------
@@ -125,31 +124,6 @@ shotByShotNormalization = False
 # Option to randomize order of scan points
 randomize = True
 #------------------------- END OF USER INPUT ----------------------------------#
-
-scannedParam = np.linspace(startFreq,endFreq, N_scanPts, endpoint=True)
-#Sequence string:
+#Sequence string (the scan points, save file names, sequence arguments and param file contents are derived from the user
+#inputs above by configControl.py, see configControl.sequenceInfo):
 sequence = 'ESRseq'
-#Scan start Name
-scanStartName = 'startFreq'
-#Scan end Name
-scanEndName = 'endFreq'
-#PB channels
-PBchannels = {'AOM':AOM,'uW':uW,'DAQ':DAQ,'STARTtrig':STARTtrig}
-#Sequence args
-sequenceArgs = [t_duration]
-#Make save file path
-dateTimeStr = strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
-dataFileName = savePath + saveFileName+ dateTimeStr +".txt"
-#Make param file path
-paramFileName = savePath + saveFileName+dateTimeStr+'_PARAMS'+".txt"
-#Param file save settings
-formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%r\n%s\t%r\n%s\t%d\n%s\t%d\n%s\t%s\n"
-expParamList =  ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'startFreq:',scannedParam[0],'endFreq:',scannedParam[-1],'microwavePower:',microwavePower,'t_duration:',t_duration,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-
-def updateSequenceArgs():
-	sequenceArgs = [t_duration]
-	return sequenceArgs
-	
-def updateExpParamList():
-	expParamList =  ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'startFreq:',scannedParam[0],'endFreq:',scannedParam[-1],'microwavePower:',microwavePower,'t_duration:',t_duration,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-	return expParamList
\ No newline at end of file
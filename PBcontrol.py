@@ -24,8 +24,13 @@ from ctypes import *
 from spinapi import *
 import numpy as np
 import sequenceControl as seqCtl
+import sequenceCache as seqCache
 from connectionConfig import *
 import sys
+# Argument and return types of the SpinAPI pb_inst_pbonly function, declared once so that ctypes converts plain Python values directly, without creating a ctypes object for every argument (see uploadInstructions):
+spinapi.pb_inst_pbonly.argtypes = [c_uint,c_int,c_int,c_double]
+spinapi.pb_inst_pbonly.restype = c_int
+
 def errorCatcher(statusVar):
 	if statusVar<0:
 		print ('Error: ', pb_get_error())
@@ -33,6 +38,9 @@ def errorCatcher(statusVar):
 		
 def configurePB():
 	pb_set_debug(1)
+	#Select the PulseBlaster board of this setup (see PBboard in connectionConfig.py):
+	status = pb_select_board(PBboard)
+	errorCatcher(status)
 	status = pb_init()
 	errorCatcher(status)
 	pb_core_clock(PBclk)
@@ -45,44 +53,58 @@ def pb_inst_pbonly(flags,inst,inst_data,length):
 	length = c_double(length)
 	return spinapi.pb_inst_pbonly(flags, inst, inst_data, length)
 	
-def programPB(sequence,sequenceArgs):
+def compileSequence(sequence,sequenceArgs):
+	#Returns the instruction array of the requested sequence without programming the PulseBlaster (e.g. to calculate its period, see sequenceControl.sequencePeriod).
+	#Compiled sequences are cached on disk across sessions, if sequenceCachePath is set in connectionConfig.py (see sequenceCache.py).
+	if seqCache.enabled():
+		cacheKey = seqCache.cacheKey(sequence,sequenceArgs)
+		instructionArray = seqCache.load(cacheKey)
+		if instructionArray is not None:
+			return instructionArray
 	channels=seqCtl.makeSequence(sequence, sequenceArgs)
-	channelBitMasks = seqCtl.sequenceEventCataloguer(channels)
-	instructionArray=programSequence(channelBitMasks)
+	eventCatalog = seqCtl.sequenceEventCataloguer(channels)
+	instructionArray = makeInstructionArray(eventCatalog)
+	if seqCache.enabled():
+		seqCache.store(cacheKey,instructionArray)
+	return instructionArray
+
+def programPB(sequence,sequenceArgs):
+	instructionArray=compileSequence(sequence,sequenceArgs)
+	uploadSequence(instructionArray)
 	return instructionArray
 	
-def programSequence(channelBitMasks):
-	eventTimes = list(channelBitMasks.keys())
-	numEvents = len(eventTimes)
-	eventDurations =list(np.zeros(numEvents-1))
-	numInstructions = numEvents-1
-	for i in range(0,numInstructions):
-		if i == numInstructions-1:
-			eventDurations[i] = eventTimes[i+1]-eventTimes[i]
-		else:
-			eventDurations[i] = eventTimes[i+1]-eventTimes[i]
-	instructionArray = []
-	bitMasks = list(channelBitMasks.values())
-	start = [0]
-	for i in range(0,numEvents-1):
-		if i==(numEvents-2):
-			instructionArray.extend([[bitMasks[i], Inst.BRANCH, start[0], eventDurations[i]]])
-		else:
-			instructionArray.extend([[bitMasks[i], Inst.CONTINUE, 0, eventDurations[i]]])
-	
+def programSequence(eventCatalog):
+	instructionArray = makeInstructionArray(eventCatalog)
+	uploadSequence(instructionArray)
+	return instructionArray
+
+def makeInstructionArray(eventCatalog):
+	#Returns the instruction array (a structured array of seqCtl.instructionDtype) of the events catalogued by seqCtl.sequenceEventCataloguer: one instruction per event, lasting until the next event. The last instruction branches back to the start of the program.
+	[eventTimes,bitMasks] = eventCatalog
+	instructionArray = np.zeros(len(eventTimes)-1,dtype=seqCtl.instructionDtype)
+	instructionArray['bitMask'] = bitMasks[:-1]
+	instructionArray['inst'] = Inst.CONTINUE
+	#Branch to instruction 0 (instData is 0):
+	instructionArray['inst'][-1] = Inst.BRANCH
+	instructionArray['duration'] = np.diff(eventTimes)*seqCtl.t_min
+	return instructionArray
+
+def uploadInstructions(instructionArray):
+	#Writes an instruction array (see makeInstructionArray) to the PulseBlaster, which must be in programming mode (after pb_start_programming). Each column is converted to Python values once, the instructions are written in a tight loop (one SpinAPI call per instruction,
+	#as SpinAPI has no call writing several instructions at once), and the return values are checked once, at the end. Returns the address of the first instruction. See benchmarkUpload.py for the time taken per instruction.
+	statuses = list(map(spinapi.pb_inst_pbonly,instructionArray['bitMask'].tolist(),instructionArray['inst'].tolist(),instructionArray['instData'].tolist(),instructionArray['duration'].tolist()))
+	if statuses and min(statuses)<0:
+		failedInstruction = next(i for i,status in enumerate(statuses) if status<0)
+		print('Error: could not write instruction',failedInstruction,'of',len(statuses),'to the PulseBlaster:', pb_get_error())
+		sys.exit()
+	return statuses[0] if statuses else None
+
+def uploadSequence(instructionArray):
 	#Program Pulseblaster
 	configurePB()
 	status = pb_start_programming(PULSE_PROGRAM)
 	errorCatcher(status)
-	startDone = False
-	for i in range(0, len(instructionArray)):
-		if startDone:
-			status = pb_inst_pbonly(instructionArray[i][0],instructionArray[i][1],instructionArray[i][2],instructionArray[i][3])
-			errorCatcher(status)
-		else:
-			start[0]= pb_inst_pbonly(instructionArray[0][0],instructionArray[0][1],instructionArray[0][2],instructionArray[0][3])
-			errorCatcher(start[0])
-			startDone = True
+	uploadInstructions(instructionArray)
 	status = pb_stop_programming()
 	errorCatcher(status)
 	status = pb_start()
@@ -57,7 +57,7 @@ To run this script:
  *t_readoutDelay: delay between start of AOM pulse and DAQ readout pulse (ns). The optimum delay can be found using optimReadoutDelay.py (see step 54 in our protocol paper)
  *Nsamples: number of fluorescence measurement samples to take at each scan point.
  *Navg: number of averaging runs (i.e. number of times the pulse length scan is repeated).
- *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired)
+ *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired). Set this to 'auto' to derive the timeout of each DAQ read from the period of the compiled pulse sequence (twice the expected acquisition time plus a 1s margin), so that a hang is detected quickly.
  *contrastMode: set this to one of 'ratio_SignalOverReference', 'ratio_DifferenceOverSum' or 'signalOnly', depending on which contrast mode you want to use (see 'Contrast setting' description above)
  *livePlotUpdate: set this to True to update the plot as data is acquired (see 'Plotting options' above)
  *plotPulseSequence: set this to True to plot the pulse sequence at the start of the experiment (see 'Plotting options' above)
@@ -74,8 +74,8 @@ To run this script:
 from spinapi import ns,us,ms
 import os
 import numpy as np
-from time import localtime, strftime
 from connectionConfig import *
+import calibrationStore as calStore
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/PBclk #in ns
 #-------------------------  USER INPUT  ---------------------------------------#
@@ -94,14 +94,14 @@ microwaveFrequency = 2e9
 # Pulse sequence parameters:----------------------------------------------------
 # AOM pulse duration (ns)
 t_AOM = 5*us
-# Readout delay (ns)
-t_readoutDelay = 2.3*us
+# Readout delay (ns) - by default, the value found by optimReadoutDelay.py (search mode) is read from the calibration store, or 2.3us if no calibration has been stored yet:
+t_readoutDelay = calStore.getCalibratedValue('t_readoutDelay',2.3*us)
 # Number of fluorescence measurement samples to take at each pulse length point:
 Nsamples = 1000
 # Number of averaging runs to do:
 Navg = 1
-#DAQ timeout, in seconds:
-DAQtimeout = 10
+#DAQ timeout, in seconds (or 'auto'):
+DAQtimeout = 'auto'
 # Plotting options--------------------------------------------------------------
 # Contrast mode
 contrastMode ='ratio_SignalOverReference'
@@ -128,31 +128,6 @@ shotByShotNormalization = False
 # Option to randomize order of scan points
 randomize = True
 #------------------------- END OF USER INPUT ----------------------------------#
-
-scannedParam = np.linspace(startPulseDuration,endPulseDuration, N_scanPts, endpoint=True) 
-#Sequence string:
+#Sequence string (the scan points, save file names, sequence arguments and param file contents are derived from the user
+#inputs above by configControl.py, see configControl.sequenceInfo):
 sequence = 'RabiSeq'
-#Scan start Name
-scanStartName = 'startPulseDuration'
-#Scan end Name
-scanEndName = 'endPulseDuration'
-#PB channels
-PBchannels = {'AOM':AOM,'uW':uW,'DAQ':DAQ,'STARTtrig':STARTtrig}
-#Sequence args
-sequenceArgs = [t_AOM,t_readoutDelay]
-#Make save file path
-dateTimeStr = strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
-dataFileName = savePath + saveFileName+ dateTimeStr +".txt"
-#Make param file path
-paramFileName = savePath + saveFileName+dateTimeStr+'_PARAMS'+".txt"
-#Param file save settings
-formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%r\n%s\t%r\n%s\t%d\n%s\t%d\n%s\t%s\n"
-expParamList = ['N_timePts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'startPulseDuration:',scannedParam[0],'endPulseDuration:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-
-def updateSequenceArgs():
-	sequenceArgs = [t_AOM,t_readoutDelay]
-	return sequenceArgs
-	
-def updateExpParamList():
-	expParamList = ['N_timePts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'startPulseDuration:',scannedParam[0],'endPulseDuration:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-	return expParamList
\ No newline at end of file
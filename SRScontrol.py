@@ -20,7 +20,7 @@
 # ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-import visa
+# visa (PyVISA) is imported in initSRS, so that modules which only need the frequency units defined below (e.g. ESRconfig.py) do not load the VISA library.
 import sys
 # Frequency unit multiplier definitions
 Hz =1
@@ -43,6 +43,7 @@ def initSRS(GPIBaddr,modelName):
 		sys.exit()
 	elif modelName not in ['SG384', 'SG386']:
 		print('Warning: This code has only been tested with SRS models SG384 and SG386, but will likely also support other SG models. Please refer to your SRS\'s manual and check that the functions used in SRScontrol.py are compatible with your model\'s GPIB interface.') 
+	import visa
 	#Construct instrument identifier from GPIB address:
 	SRSaddr = unicode('GPIB0::'+str(GPIBaddr)+'::INSTR')
 	#Instantiate a resource manager
@@ -35,6 +35,12 @@ By default, for each scan point, the script calculates the contrast as a functio
 
 The first time the script scans over the delays, it does so in order from the shortest to the longest delay. If Navg>1, the script then repeats the scan Navg times and averages the results. By default, the order of the scan points is randomized for all but the first scan. If you wish to turn off this randomization, set the randomize option below to False.
 
+-- Multiplexed acquisition --
+If multiplexFactor is set to K>1, the delay points are measured in groups of K: the T1 sequences of the K delays of a group are played one after the other in a single PulseBlaster program, each repetition giving an R1 and an R2 reading for every delay of the group, and the readings are demultiplexed back into the K scan points. The PulseBlaster is then reprogrammed (and the DAQ read) once per group rather than once per scan point; the group sequences of each run are compiled (or loaded from the sequence cache) before the run starts. Note that the dark time of each delay still has to be waited out (a laser pulse re-initializes the spins, so the waits of different delays cannot overlap), so the acquisition time is unchanged: multiplexing only saves the reprogramming and DAQ read overhead of the scan points, which is small next to the acquisition time of long delays. E.g. with the default settings below (200 delays up to 5ms, Nsamples = 1000), each run takes ~2006s of acquisition plus ~0.1s per PulseBlaster reprogram (see PBreprogramTime in mainControl.py), i.e. ~20s with multiplexFactor = 1, ~5s with multiplexFactor = 4: a saving of under 1% of the run. Multiplexing helps more with short delays and small Nsamples, where the overhead dominates.
+
+-- Non-uniform sampling --
+With samplingMode set to 'log', only N_sampledPts delays are measured instead of the N_scanPts uniformly spaced delays: the delays are spaced logarithmically from start_t to end_t (rounded to multiples of t_min), so that each decade of the decay is sampled by the same number of points. After each averaging run, the script fits a stretched exponential to the averaged contrast (see fitControl.py) and prints the fitted T1. A decay spanning several decades is resolved with far fewer delays than with uniform sampling, which spends most of its points on the tail of the decay.
+
 -- Plotting options --
 Set livePlotUpdate to True to plot the data as it is acquired. Note that, after the first scan is completed, the plot will only update at the end of every subsequent scan. If livePlotUpdate is set to False, the data will only be plotted at the end of the experiment.
 
@@ -60,7 +66,7 @@ To run this script:
  *t_pi: pi pulse duration, in ns.
  *Nsamples: number of fluorescence measurement samples to take at each scan point.
  *Navg: number of averaging runs (i.e. number of times the delay scan is repeated).
- *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired)
+ *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired). Set this to 'auto' to derive the timeout of each DAQ read from the period of the compiled pulse sequence (twice the expected acquisition time plus a 1s margin), so that a hang is detected quickly.
  *contrastMode: for this experiment, this should be set to set this to 'ratio_DifferenceOverSum'. Other available contrast modes are 'ratio_SignalOverReference' and 'signalOnly' (see 'Contrast setting' description above).
  *livePlotUpdate: set this to True to update the plot as data is acquired (see 'Plotting options' above).
  *plotPulseSequence: set this to True to plot the pulse sequence at the start of the experiment (see 'Plotting options' above).
@@ -72,13 +78,17 @@ To run this script:
  *saveFileName: file name under which to save the data. This name will later be augmented by the date and time at which the script was run.
  *shotByShotNormalization: set this option to True to do shot by shot contrast normalization (see 'Averaging Options' above).
  *randomize: set this option to True to randomize the order of frequency points in all scans after the first one.
+ *multiplexFactor: number of delay points measured together by a single pulse sequence (see 'Multiplexed acquisition' above). Set to 1 to measure each delay point with its own sequence.
+ *samplingMode: set this to 'log' to measure N_sampledPts log-spaced delays instead of N_scanPts uniformly spaced delays (see 'Non-uniform sampling' above), or 'uniform' to measure all N_scanPts delays.
+ *N_sampledPts: number of delays measured with 'log' sampling (at least 4, the number of parameters of the fitted decay).
+ *longestPointFirst: set this option to True to measure the delay points in order of decreasing duration (i.e. from the longest to the shortest delay) in the first scan, instead of from the shortest to the longest delay. The duration of each point is estimated from its compiled pulse sequence.
 """
 #Imports
 from spinapi import ns,us,ms
 import os
 import numpy as np
-from time import localtime, strftime
 from connectionConfig import *
+import calibrationStore as calStore
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/PBclk #in ns
 
@@ -99,16 +109,16 @@ microwaveFrequency = 2e9
 # Pulse sequence parameters:----------------------------------------------------
 # AOM pulse duration (in ns)
 t_AOM= 5*us
-# Readout delay (in ns)
-t_readoutDelay = 2.3*us
+# Readout delay (in ns) - by default, the value found by optimReadoutDelay.py (search mode) is read from the calibration store, or 2.3us if no calibration has been stored yet:
+t_readoutDelay = calStore.getCalibratedValue('t_readoutDelay',2.3*us)
 # Pi-pulse duration (in ns)
 t_pi = 24
 # Number of fluorescence measurement samples to take at each delay point:
 Nsamples = 1000
 # Number of averaging runs to do:
 Navg = 1
-#DAQ timeout, in seconds:
-DAQtimeout = 120
+#DAQ timeout, in seconds (or 'auto'):
+DAQtimeout = 'auto'
 # Plotting options--------------------------------------------------------------
 # Contrast mode
 contrastMode ='ratio_DifferenceOverSum'
@@ -134,35 +144,14 @@ saveFileName = "T1_"
 shotByShotNormalization = False
 # Option to randomize order of scan points
 randomize = True
+# Number of delay points measured together by each pulse sequence
+multiplexFactor = 1
+# Option to measure the longest scan points first in the first scan
+longestPointFirst = False
+# Scan point sampling ('uniform' or 'log') and number of delays measured with 'log' sampling
+samplingMode = 'uniform'
+N_sampledPts = 40
 #------------------------- END OF USER INPUT ----------------------------------#
-scannedParam = np.linspace(start_t,end_t, N_scanPts, endpoint=True)
-#If start_t<(t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi), shift scanned time points by (t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi) to avoid pulse overlap errors and warn user:
-if start_t< (t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi):
-	scannedParam = [x + (t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi) for x in scannedParam]
-	print('Note: start_t (and all subsequent scan points) have been shifted by ', (t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi),'ns to avoid pulse overlap errors. First scan point is hence', scannedParam[0],'ns.')
-#Sequence string:
+#Sequence string (the scan points, save file names, sequence arguments and param file contents are derived from the user
+#inputs above by configControl.py, see configControl.sequenceInfo):
 sequence = 'T1seq'
-#Scan start Name
-scanStartName = 'start_t'
-#Scan end Name
-scanEndName = 'end_t'
-#Sequence arguments:
-sequenceArgs = [t_AOM,t_readoutDelay,t_pi]
-#PB channels
-PBchannels = {'AOM':AOM,'uW':uW,'DAQ':DAQ,'STARTtrig':STARTtrig}
-#Make save file path
-dateTimeStr = strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
-dataFileName = savePath + saveFileName+ dateTimeStr +".txt"
-#Make param file path
-paramFileName = savePath + saveFileName+dateTimeStr+'_PARAMS'+".txt"
-#Param file save settings
-formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%r\n%s\t%r\n%s\t%d\n%s\t%d\n%s\t%s\n"
-expParamList = ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'start_t:',scannedParam[0],'end_t:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'t_pi',t_pi,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-
-def updateSequenceArgs():
-	sequenceArgs = [t_AOM,t_readoutDelay,t_pi]
-	return sequenceArgs
-	
-def updateExpParamList():
-	expParamList = ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'start_t:',scannedParam[0],'end_t:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'t_pi',t_pi,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-	return expParamList
\ No newline at end of file
@@ -63,7 +63,7 @@ To run this script:
  *N: number of repeats of the block of 8 pi-pulses in the XY8 pulse sequence.
  *Nsamples: number of fluorescence measurement samples to take at each scan point
  *Navg: number of averaging runs (i.e. number of times the delay scan is repeated)
- *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired)
+ *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired). Set this to 'auto' to derive the timeout of each DAQ read from the period of the compiled pulse sequence (twice the expected acquisition time plus a 1s margin), so that a hang is detected quickly.
  *contrastMode: for this experiment, this should be set to set this to 'ratio_DifferenceOverSum'. Other available contrast modes are 'ratio_SignalOverReference' and 'signalOnly' (see 'Contrast setting' description above)
  *livePlotUpdate: set this to True to update the plot as data is acquired (see 'Plotting options' above)
  *plotPulseSequence: set this to True to plot the pulse sequence at the start of the experiment (see 'Plotting options' above)
@@ -81,8 +81,8 @@ To run this script:
 from spinapi import ns,us,ms
 import os
 import numpy as np
-from time import localtime, strftime
 from connectionConfig import *
+import calibrationStore as calStore
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/PBclk #in ns
 #-------------------------  USER INPUT  ---------------------------------------#
@@ -101,8 +101,8 @@ microwaveFrequency = 2e9
 # Pulse sequence parameters:----------------------------------------------------
 # AOM pulse duration (in ns)
 t_AOM= 5*us
-# Readout delay (in ns)
-t_readoutDelay = 2.3*us
+# Readout delay (in ns) - by default, the value found by optimReadoutDelay.py (search mode) is read from the calibration store, or 2.3us if no calibration has been stored yet:
+t_readoutDelay = calStore.getCalibratedValue('t_readoutDelay',2.3*us)
 # Pi-pulse duration (in ns)
 t_pi = 24
 # Number of repeats of the block of 8 pi-pulses in the XY8 pulse sequence:
@@ -111,8 +111,8 @@ N =12
 Nsamples = 10000
 # Number of averaging runs to do:
 Navg = 5
-#DAQ timeout, in seconds:
-DAQtimeout = 10
+#DAQ timeout, in seconds (or 'auto'):
+DAQtimeout = 'auto'
 # Plotting options--------------------------------------------------------------
 # Contrast mode
 contrastMode ='ratio_DifferenceOverSum'
@@ -144,32 +144,6 @@ randomize = True
 # editted with close monitoring of the pulse sequence on the scope.
 IQpadding = t_min*round(30*ns/t_min)
 #------------------------- END OF USER INPUT ----------------------------------#
-
-
-scannedParam = np.linspace(startTau,endTau, N_scanPts, endpoint=True) 
-#Sequence string:
+#Sequence string (the scan points, save file names, sequence arguments and param file contents are derived from the user
+#inputs above by configControl.py, see configControl.sequenceInfo):
 sequence = 'XY8seq'
-#Scan start Name
-scanStartName = 'startTau'
-#Scan end Name
-scanEndName = 'endTau'
-#PB channels
-PBchannels = {'AOM':AOM,'uW':uW,'DAQ':DAQ,'STARTtrig':STARTtrig,'I':I,'Q':Q}
-#Sequence args
-sequenceArgs = [t_AOM,t_readoutDelay,t_pi,IQpadding,N]
-#Make save file path
-dateTimeStr = strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
-dataFileName = savePath + saveFileName+ dateTimeStr +".txt"
-#Make param file path
-paramFileName = savePath + saveFileName+dateTimeStr+'_PARAMS'+".txt"
-#Param file save settings
-formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%r\n%s\t%r\n%s\t%d\n%s\t%d\n%s\t%s\n"
-expParamList = ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'startTau:',scannedParam[0],'endTau:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'t_pi',t_pi,'N',N,'IQpadding',IQpadding,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-
-def updateSequenceArgs():
-	sequenceArgs = [t_AOM,t_readoutDelay,t_pi,IQpadding,N]
-	return sequenceArgs
-	
-def updateExpParamList():
-	expParamList = ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'startTau:',scannedParam[0],'endTau:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'t_pi',t_pi,'N',N,'IQpadding',IQpadding,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-	return expParamList
\ No newline at end of file
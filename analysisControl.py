@@ -0,0 +1,226 @@
+# analysisControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Batch reanalysis
+
+This script reloads saved experiments (the data files written by mainControl.py and their _PARAMS.txt files) and fits
+them with the model matching their pulse sequence:
+ *ESRseq: Lorentzian dip, parameters [f0, gamma, depth, offset]
+ *RabiSeq: damped sinusoid, parameters [amplitude, period, decayTime, offset]
+ *T1seq, T2seq, XY8seq: stretched exponential, parameters [amplitude, decayTime, stretch, offset]
+(see fitControl.py). Correlation spectroscopy runs are loaded but not fitted, and so are runs with fewer scan points
+than fit parameters; a run whose fit fails is reported (and cached) as not fitted, without stopping the analysis.
+
+The sequence of each run is identified from the labels of its _PARAMS.txt file (see configControl.sequenceInfo), and
+the contrast is recalculated from the saved signal and background with the default contrast mode of that sequence's
+config file (contrast modes are not saved in the _PARAMS.txt file; shot-by-shot contrasts cannot be recovered).
+Runs of the same sequence and length can be stacked into 2D NumPy arrays (one row per run) with stackRuns.
+
+Fits are run in parallel in a pool of worker processes, and their results are cached in fitCache.json, in the folder
+of the data files, keyed by a hash of the data and _PARAMS.txt files: re-running the analysis over a folder only fits
+the runs which are new or have changed.
+
+To run this script, from a windows command prompt, call:
+ python analysisControl.py <folder or data file> [<folder or data file> ...]
+e.g. python analysisControl.py Saved_Data
+"""
+#Imports
+import configControl as cfgCtl
+import fitControl as fitCtl
+import mainControl as mainCtl
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import ast
+import glob
+import hashlib
+import json
+import os
+import sys
+
+Run = namedtuple('Run',['dataFileName','paramFileName','sequence','params','scannedParam','signal','background','contrast'])
+
+# Model fitted to each sequence: [fit function, names of the fit parameters]
+fitModels = {
+	'ESRseq':[fitCtl.fitLorentzianDip,['f0','gamma','depth','offset']],
+	'RabiSeq':[fitCtl.fitDampedSinusoid,['amplitude','period','decayTime','offset']],
+	'T1seq':[fitCtl.fitStretchedExponential,['amplitude','decayTime','stretch','offset']],
+	'T2seq':[fitCtl.fitStretchedExponential,['amplitude','decayTime','stretch','offset']],
+	'XY8seq':[fitCtl.fitStretchedExponential,['amplitude','decayTime','stretch','offset']],
+}
+# Contrast mode used to recalculate the contrast of each sequence (the default of its config file):
+contrastModes = {'ESRseq':'ratio_SignalOverReference','RabiSeq':'ratio_SignalOverReference','T1seq':'ratio_DifferenceOverSum',
+				'T2seq':'ratio_DifferenceOverSum','XY8seq':'ratio_DifferenceOverSum','correlSpecSeq':'ratio_DifferenceOverSum'}
+cacheFileName = 'fitCache.json'
+
+##-------------------- Loading runs--------------------
+def parseValue(text):
+	#Converts a value written with the formats of formattingSaveString (%d, %f, %r or %s) back to a Python value.
+	for convert in [int,float,ast.literal_eval]:
+		try:
+			return convert(text)
+		except (ValueError,SyntaxError):
+			pass
+	return text
+
+def readParamFile(paramFileName):
+	#Returns the {label: value} dictionary of a _PARAMS.txt file, with the labels as written in the file (e.g. 'N_scanPts:').
+	params = {}
+	with open(paramFileName) as paramFile:
+		for line in paramFile:
+			if '\t' in line:
+				[label,value] = line.rstrip('\n').split('\t',1)
+				params[label] = parseValue(value)
+	return params
+
+def identifySequence(params):
+	#Returns the sequence whose _PARAMS.txt labels (see configControl.sequenceInfo) best match the labels of params.
+	bestSequence = None
+	bestScore = 0
+	for sequence,info in cfgCtl.sequenceInfo.items():
+		if info.scanStartName+':' not in params:
+			continue
+		score = len([field for field in info.paramFileFields if field[0] in params])
+		if score>bestScore:
+			[bestSequence,bestScore] = [sequence,score]
+	return bestSequence
+
+def loadRun(dataFileName):
+	#Loads a data file and its _PARAMS.txt file into a Run.
+	paramFileName = dataFileName[:-len('.txt')]+'_PARAMS.txt'
+	if not os.path.isfile(paramFileName):
+		print('Error: no parameter file found for data file',dataFileName,'(expected',paramFileName,').')
+		sys.exit()
+	params = readParamFile(paramFileName)
+	sequence = identifySequence(params)
+	if sequence is None:
+		print('Error: could not identify the pulse sequence of',paramFileName,'.')
+		sys.exit()
+	data = np.loadtxt(dataFileName,ndmin=2)
+	[scannedParam,signal,background] = [data[:,0],data[:,1],data[:,2]]
+	contrast = mainCtl.calculateContrast(contrastModes[sequence],signal,background)
+	return Run(dataFileName,paramFileName,sequence,params,scannedParam,signal,background,contrast)
+
+def findDataFiles(paths):
+	#Returns the data files given in paths, replacing folders by all the data files they contain.
+	dataFileNames = []
+	for path in paths:
+		if os.path.isdir(path):
+			#Data files are the .txt files which have a _PARAMS.txt file (other .txt files, e.g. _SPECTRUM.txt files, are skipped):
+			dataFileNames.extend(sorted(name for name in glob.glob(os.path.join(path,'*.txt')) if os.path.isfile(name[:-len('.txt')]+'_PARAMS.txt')))
+		else:
+			dataFileNames.append(path)
+	return dataFileNames
+
+def loadRuns(paths):
+	return [loadRun(dataFileName) for dataFileName in findDataFiles(paths)]
+
+def stackRuns(runs):
+	#Groups runs by sequence and number of scan points, and returns a dictionary of {(sequence, N_scanPts): [runs, scannedParam, signal, background, contrast]},
+	#where scannedParam, signal, background and contrast are (number of runs, N_scanPts) arrays.
+	groups = {}
+	for run in runs:
+		groups.setdefault((run.sequence,len(run.scannedParam)),[]).append(run)
+	return {key:[groupRuns]+[np.vstack([getattr(run,name) for run in groupRuns]) for name in ['scannedParam','signal','background','contrast']] for key,groupRuns in groups.items()}
+
+##-------------------- Fitting--------------------
+def runHash(run):
+	#Hash of the contents of a run's data and parameter files, used as its fit-cache key.
+	digest = hashlib.sha1()
+	for fileName in [run.dataFileName,run.paramFileName]:
+		with open(fileName,'rb') as runFile:
+			digest.update(runFile.read())
+	return digest.hexdigest()
+
+def fitRun(run):
+	#Fits a run with the model of its sequence. Returns a {parameter name: value} dictionary, or None if the sequence has no model,
+	#the run has too few scan points (see fitControl.minFitPoints) or the fit fails (so that one bad run does not abort the analysis
+	#of the others, and the failure is cached like a fit result).
+	if run.sequence not in fitModels:
+		return None
+	if len(run.scannedParam)<fitCtl.minFitPoints:
+		print('Warning: not fitting',run.dataFileName,'(',len(run.scannedParam),'scan points; at least',fitCtl.minFitPoints,'are needed).')
+		return None
+	[fitFunction,parameterNames] = fitModels[run.sequence]
+	try:
+		fitParams = fitFunction(run.scannedParam,run.contrast)
+	except Exception as excpt:
+		print('Warning: could not fit',run.dataFileName,'. Exception details:', type(excpt).__name__,'.',excpt)
+		return None
+	if not np.all(np.isfinite(fitParams)):
+		print('Warning: could not fit',run.dataFileName,'(the fit did not converge to finite parameters).')
+		return None
+	return dict(zip(parameterNames,[float(value) for value in fitParams]))
+
+def loadFitCache(folder):
+	cacheFile = os.path.join(folder,cacheFileName)
+	if not os.path.isfile(cacheFile):
+		return {}
+	with open(cacheFile) as cache:
+		return json.load(cache)
+
+def saveFitCache(folder,fitCache):
+	cacheFile = os.path.join(folder,cacheFileName)
+	# Write to a temporary file first, so that an interrupted write cannot corrupt the cache:
+	with open(cacheFile+'.tmp','w') as cache:
+		json.dump(fitCache,cache,indent=1)
+	os.replace(cacheFile+'.tmp',cacheFile)
+
+def fitRuns(runs,maxWorkers=None):
+	#Fits runs in parallel, reusing cached fits of unchanged files. Returns the list of fit results (see fitRun), in the order of runs.
+	folders = sorted(set(os.path.dirname(os.path.abspath(run.dataFileName)) for run in runs))
+	fitCaches = {folder:loadFitCache(folder) for folder in folders}
+	keys = [runHash(run) for run in runs]
+	results = [None]*len(runs)
+	toFit = []
+	for i,[run,key] in enumerate(zip(runs,keys)):
+		fitCache = fitCaches[os.path.dirname(os.path.abspath(run.dataFileName))]
+		if key in fitCache:
+			results[i] = fitCache[key]['fit']
+		else:
+			toFit.append(i)
+	if toFit:
+		with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+			for i,result in zip(toFit,executor.map(fitRun,[runs[i] for i in toFit])):
+				results[i] = result
+				fitCaches[os.path.dirname(os.path.abspath(runs[i].dataFileName))][keys[i]] = {'dataFileName':os.path.basename(runs[i].dataFileName),'sequence':runs[i].sequence,'fit':result}
+		for folder in folders:
+			saveFitCache(folder,fitCaches[folder])
+	print('Fitted',len(toFit),'runs (',len(runs)-len(toFit),'fits loaded from cache).')
+	return results
+
+def analyseRuns(paths,maxWorkers=None):
+	#Loads and fits all the runs in paths, and prints a report of the fit results. Returns [runs, fit results].
+	runs = loadRuns(paths)
+	results = fitRuns(runs,maxWorkers)
+	for run,result in zip(runs,results):
+		fitString = 'not fitted' if result is None else ', '.join(name+' = %g' % value for name,value in result.items())
+		print(os.path.basename(run.dataFileName),'\t',run.sequence,'\t',fitString)
+	return [runs,results]
+
+if __name__ == "__main__":
+	if len(sys.argv)<2:
+		print('Usage: python analysisControl.py <folder or data file> [<folder or data file> ...]')
+		sys.exit()
+	analyseRuns(sys.argv[1:])
@@ -0,0 +1,72 @@
+# benchmarkCounter.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Photon-counting benchmark
+
+This script runs the photon-counting ('counter') acquisition mode on a simulated counter task (DAQcontrol.SimulatedCounterTask),
+without a DAQ. It first checks that the gate counts decoded from the cumulative counter readings match the simulated ones,
+including when the 32-bit counter rolls over, and then measures the time mainControl.measureScanPoint takes to decode the counts
+of one scan point and split them into signal and background, for each value of Nsamples. Only the software overhead is measured:
+on the setup, the acquisition itself takes 2*Nsamples sequence periods.
+
+To run this script, from a windows command prompt, call:
+ python benchmarkCounter.py [<Nsamples> ...]
+e.g. python benchmarkCounter.py 1000 10000 100000
+"""
+#Imports
+import connectionConfig as conCfg
+import mainControl as mainCtl
+import DAQcontrol as DAQctl
+import numpy as np
+import sys
+import time
+from types import SimpleNamespace
+
+def checkDecoding(Nsamples):
+	#Checks that readDAQcounts recovers the simulated gate counts, with and without counter rollover.
+	for initialCount in [0,2**32-1000]:
+		task = DAQctl.SimulatedCounterTask(initialCount=initialCount,seed=1)
+		gateCounts = DAQctl.readDAQcounts(task,2*Nsamples,1)
+		if not np.array_equal(gateCounts,task.lastGateCounts):
+			print('Error: decoded gate counts do not match the simulated counts (initial count',initialCount,').')
+			sys.exit()
+	print('Decoded gate counts match the simulated counts (with and without counter rollover).')
+
+def timeScanPoint(Nsamples,Nrepeats=20):
+	#Returns the median time (in s) taken by measureScanPoint to read and process one scan point from the simulated counter.
+	task = DAQctl.SimulatedCounterTask(seed=1)
+	expCfg = SimpleNamespace(Nsamples=Nsamples,DAQtimeout=1,shotByShotNormalization=False,contrastMode='ratio_SignalOverReference')
+	times = []
+	for i in range(0,Nrepeats):
+		tStart = time.perf_counter()
+		[meanSignal,meanBackground,contrast] = mainCtl.measureScanPoint(task,expCfg)
+		times.append(time.perf_counter()-tStart)
+	return np.median(times)
+
+if __name__ == "__main__":
+	NsamplesList = [int(argument) for argument in sys.argv[1:]] or [1000,10000,100000]
+	conCfg.DAQ_AcquisitionMode = 'counter'
+	checkDecoding(max(NsamplesList))
+	for Nsamples in NsamplesList:
+		print('Nsamples =',Nsamples,': measureScanPoint takes',timeScanPoint(Nsamples)*1e3,'ms per scan point (including count simulation)')
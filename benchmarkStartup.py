@@ -0,0 +1,104 @@
+# benchmarkStartup.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Startup benchmark
+
+This script measures, in fresh Python processes (i.e. from a cold start), the time taken:
+ *to import mainControl.py,
+ *to import mainControl.py and matplotlib.pyplot (the startup cost of a run which opens plot windows),
+ *from process start to the end of the first DAQ read of a headless run of the given experiment (only if the
+  instruments are connected; the run is stopped straight after the first read).
+Each measurement is repeated Nrepeats times and the median is reported.
+
+To run this script, from a windows command prompt, call:
+ python benchmarkStartup.py [<config>] [<Nrepeats>]
+e.g. python benchmarkStartup.py ESRconfig 5
+"""
+#Imports
+import subprocess
+import sys
+import time
+import json
+import numpy as np
+
+childCodeTemplate = '''
+import time, json
+tStart = time.time()
+result = {'tStart':tStart}
+import mainControl
+result['tImport'] = time.time()
+if %(importPyplot)r:
+	import matplotlib.pyplot
+	result['tPyplot'] = time.time()
+if %(firstRead)r:
+	import DAQcontrol
+	class FirstReadDone(Exception):
+		pass
+	def timed(readFunction):
+		def timedRead(*args):
+			counts = readFunction(*args)
+			result['tFirstRead'] = time.time()
+			raise FirstReadDone
+		return timedRead
+	DAQcontrol.readDAQchannels = timed(DAQcontrol.readDAQchannels)
+	DAQcontrol.readDAQcounts = timed(DAQcontrol.readDAQcounts)
+	try:
+		mainControl.runExperiment(%(expConfigFile)r,headless=True)
+	except FirstReadDone:
+		pass
+	except BaseException as excpt:
+		result['error'] = type(excpt).__name__+': '+str(excpt)
+print('BENCHMARK'+json.dumps(result))
+'''
+
+def timeChildProcess(expConfigFile,importPyplot=False,firstRead=False):
+	#Runs the benchmark code in a new Python process and returns its timings (in s, relative to the process launch).
+	childCode = childCodeTemplate % {'expConfigFile':expConfigFile,'importPyplot':importPyplot,'firstRead':firstRead}
+	tLaunch = time.time()
+	output = subprocess.run([sys.executable,'-c',childCode],stdout=subprocess.PIPE,stderr=subprocess.STDOUT,universal_newlines=True).stdout
+	resultLines = [line for line in output.splitlines() if line.startswith('BENCHMARK')]
+	if not resultLines:
+		return {'error':output.strip().splitlines()[-1] if output.strip() else 'no output'}
+	result = json.loads(resultLines[-1][len('BENCHMARK'):])
+	return {key:(value-tLaunch if key.startswith('t') else value) for key,value in result.items()}
+
+def medianTime(results,key):
+	times = [result[key] for result in results if key in result]
+	return np.median(times) if times else None
+
+def runBenchmark(expConfigFile='ESRconfig',Nrepeats=5):
+	importOnly = [timeChildProcess(expConfigFile) for i in range(0,Nrepeats)]
+	withPyplot = [timeChildProcess(expConfigFile,importPyplot=True) for i in range(0,Nrepeats)]
+	print('Cold start to mainControl imported (headless):',medianTime(importOnly,'tImport'),'s')
+	print('Cold start to mainControl and matplotlib.pyplot imported:',medianTime(withPyplot,'tPyplot'),'s')
+	firstRead = [timeChildProcess(expConfigFile,firstRead=True) for i in range(0,Nrepeats)]
+	if medianTime(firstRead,'tFirstRead') is None:
+		print('Cold start to first DAQ read (headless',expConfigFile,'run): not measured, the run did not reach the first DAQ read (',firstRead[0].get('error'),')')
+	else:
+		print('Cold start to first DAQ read (headless',expConfigFile,'run):',medianTime(firstRead,'tFirstRead'),'s')
+
+if __name__ == "__main__":
+	expConfigFile = sys.argv[1] if len(sys.argv)>1 else 'ESRconfig'
+	Nrepeats = int(sys.argv[2]) if len(sys.argv)>2 else 5
+	runBenchmark(expConfigFile,Nrepeats)
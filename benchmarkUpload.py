@@ -0,0 +1,106 @@
+# benchmarkUpload.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+PulseBlaster upload benchmark
+
+This script measures the time taken per instruction to write XY8-N pulse sequences to the PulseBlaster, with
+PBcontrol.uploadInstructions (the bulk upload path used by PBcontrol.uploadSequence) and with the per-instruction path
+it replaced (a PBcontrol.pb_inst_pbonly call, with new ctypes argument objects, and an errorCatcher check for every
+instruction), for each number of XY8 repeats N. The board is put in programming mode and programmed with each sequence,
+but the sequences are not started.
+With --simulated, no PulseBlaster is needed: the SpinAPI pb_inst_pbonly function is replaced by a ctypes callback which
+does nothing (the measured times then include the cost of the callback, the same for both paths), after checking that
+both paths write the same instructions.
+
+To run this script, from a windows command prompt, call:
+ python benchmarkUpload.py [--simulated] [<N> ...]
+e.g. python benchmarkUpload.py 8 64 256
+"""
+#Imports
+import PBcontrol as PBctl
+from spinapi import *
+from ctypes import CFUNCTYPE,c_int,c_uint,c_double
+import numpy as np
+import sys
+import time
+
+# XY8 sequence parameters (see XY8config.py):
+t_delay = 402*ns
+t_AOM = 3*us
+t_readoutDelay = 2.3*us
+t_pi = 52*ns
+IQpadding = 12*ns
+
+def uploadPerInstruction(instructionArray):
+	#The upload loop replaced by PBcontrol.uploadInstructions: one call and one error check per instruction.
+	for [bitMask,inst,instData,duration] in instructionArray.tolist():
+		PBctl.errorCatcher(PBctl.pb_inst_pbonly(bitMask,inst,instData,duration))
+
+def simulatePBinst(recordedInstructions=None):
+	#Replaces the SpinAPI pb_inst_pbonly function by a ctypes callback which records the instructions written (if recordedInstructions is a list) or does nothing.
+	def PBinst(flags,inst,inst_data,length):
+		if recordedInstructions is not None:
+			recordedInstructions.append((flags,inst,inst_data,length))
+		return 0
+	PBinstFunction = CFUNCTYPE(c_int,c_uint,c_int,c_int,c_double)(PBinst)
+	spinapi.pb_inst_pbonly = PBinstFunction
+	return PBinstFunction
+
+def checkUploads(instructionArray):
+	#Checks that both upload paths write the same instructions, on the simulated pb_inst_pbonly.
+	recorded = [[],[]]
+	for [uploadFunction,recordedInstructions] in zip([uploadPerInstruction,PBctl.uploadInstructions],recorded):
+		simulatePBinst(recordedInstructions)
+		uploadFunction(instructionArray)
+	if recorded[0] != recorded[1]:
+		print('Error: the bulk upload path does not write the same instructions as the per-instruction path.')
+		sys.exit()
+	print('Both upload paths write the same',len(recorded[1]),'instructions.')
+
+def timeUpload(uploadFunction,instructionArray,simulated,Nrepeats=20):
+	#Returns the median time (in s) taken by uploadFunction to write instructionArray.
+	times = []
+	for i in range(0,Nrepeats):
+		if not simulated:
+			PBctl.configurePB()
+			PBctl.errorCatcher(pb_start_programming(PULSE_PROGRAM))
+		tStart = time.perf_counter()
+		uploadFunction(instructionArray)
+		times.append(time.perf_counter()-tStart)
+		if not simulated:
+			PBctl.errorCatcher(pb_stop_programming())
+			PBctl.errorCatcher(pb_close())
+	return np.median(times)
+
+if __name__ == "__main__":
+	simulated = '--simulated' in sys.argv[1:]
+	numbersOfRepeats = [int(argument) for argument in sys.argv[1:] if argument != '--simulated'] or [8,64,256]
+	instructionArrays = [PBctl.compileSequence('XY8seq',[t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding,numberOfRepeats]) for numberOfRepeats in numbersOfRepeats]
+	if simulated:
+		checkUploads(instructionArrays[-1])
+		simulatePBinst()
+	for [numberOfRepeats,instructionArray] in zip(numbersOfRepeats,instructionArrays):
+		perInstruction = timeUpload(uploadPerInstruction,instructionArray,simulated)/len(instructionArray)
+		bulk = timeUpload(PBctl.uploadInstructions,instructionArray,simulated)/len(instructionArray)
+		print('XY8-'+str(numberOfRepeats),'(',len(instructionArray),'instructions ): per-instruction path',round(perInstruction*1e6,3),'us, bulk path',round(bulk*1e6,3),'us per instruction (',round(perInstruction/bulk,1),'x faster)')
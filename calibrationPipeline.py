@@ -0,0 +1,92 @@
+# calibrationPipeline.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Calibration pipeline
+
+This script chains the ESR, Rabi and pulsed experiments so that no manual hand-off is needed between them. It runs the experiment configured in ESRconfig.py, fits a Lorentzian dip to the measured contrast and sets the microwave frequency of the Rabi experiment to the fitted resonance frequency. It then runs the experiment configured in Rabiconfig.py, fits a damped sinusoid to the measured contrast and extracts the pi-pulse length (half the Rabi period). Finally, the fitted microwave frequency and pi-pulse length (rounded to the nearest multiple of 2*t_min, as required by mainControl.validateUserInput) are pushed into the configuration of each of the requested pulsed experiments, which are then run in turn.
+
+All other experimental parameters are taken from the experiment config files, which should be edited as usual before running this script. Plot windows are updated during the experiments but the pipeline does not wait for them to be closed.
+
+To run this script, from a windows command prompt, call:
+ python calibrationPipeline.py <T1config|T2config|XY8config|correlSpecconfig> [<T1config|T2config|XY8config|correlSpecconfig> ...]
+e.g. python calibrationPipeline.py T2config XY8config
+If no pulsed experiment is given, only the ESR and Rabi calibration stages are run. Add the --headless option to run without opening any plot windows (plots are then saved as .png files next to the data files).
+"""
+#Imports
+import mainControl as mainCtl
+import fitControl as fitCtl
+import configControl as cfgCtl
+import numpy as np
+import sys
+
+# Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
+t_min = mainCtl.t_min #in ns
+pulsedConfigFiles = ['T1config','T2config','XY8config','correlSpecconfig']
+
+def calibrateFrequency(ESRdata):
+	#Fits the deepest dip of the ESR spectrum and returns its center frequency (in Hz).
+	[freqs,signal,background,contrast] = ESRdata
+	[f0,gamma,depth,offset] = fitCtl.fitLorentzianDip(freqs,contrast)
+	if (f0<min(freqs)) or (f0>max(freqs)) or depth<=0:
+		print('Error: could not find an ESR resonance in the scanned frequency range. Fitted center frequency:',f0,'Hz, dip depth:',depth,'. Please check the ESR scan parameters in ESRconfig.py.')
+		sys.exit()
+	print('ESR fit: resonance frequency =',f0,'Hz, linewidth (FWHM) =',2*gamma,'Hz, contrast dip depth =',depth)
+	return f0
+
+def calibratePiPulse(RabiData):
+	#Fits the Rabi oscillation and returns the pi-pulse length (in ns), rounded to the nearest multiple of 2*t_min.
+	[t,signal,background,contrast] = RabiData
+	[amplitude,period,decayTime,offset] = fitCtl.fitDampedSinusoid(t,contrast)
+	#The model is even in the period (cos(2*pi*t/period)), so the fit may converge to a negative period:
+	t_pi = abs(period)/2
+	if (t_pi<=0) or (t_pi>max(t)):
+		print('Error: could not find a Rabi oscillation in the scanned pulse-length range. Fitted pi-pulse length:',t_pi,'ns. Please check the Rabi scan parameters in Rabiconfig.py.')
+		sys.exit()
+	roundedT_pi = max(2*t_min,(2*t_min)*round(t_pi/(2*t_min)))
+	print('Rabi fit: pi-pulse length =',t_pi,'ns (rounded to',roundedT_pi,'ns), decay time =',decayTime,'ns')
+	return roundedT_pi
+
+def runCalibration(expConfigFiles,headless=False):
+	#Runs ESR -> Rabi -> each of the pulsed experiments in expConfigFiles, pushing the fitted parameters forward at each stage.
+	#Returns [microwaveFrequency, t_pi].
+	print('Calibration stage 1: ESR')
+	microwaveFrequency = calibrateFrequency(mainCtl.runExperiment('ESRconfig',interactive=False,headless=headless))
+
+	print('Calibration stage 2: Rabi at',microwaveFrequency,'Hz')
+	RabiCfg = cfgCtl.loadConfig('Rabiconfig')._replace(microwaveFrequency=microwaveFrequency)
+	t_pi = calibratePiPulse(mainCtl.runExperiment(RabiCfg,interactive=False,headless=headless))
+
+	for expConfigFile in expConfigFiles:
+		print('Running',expConfigFile,'with microwaveFrequency =',microwaveFrequency,'Hz and t_pi =',t_pi,'ns')
+		expCfg = cfgCtl.loadConfig(expConfigFile)._replace(microwaveFrequency=microwaveFrequency,t_pi=t_pi)
+		mainCtl.runExperiment(expCfg,interactive=False,headless=headless)
+	return [microwaveFrequency,t_pi]
+
+if __name__ == "__main__":
+	expConfigFiles = [argument for argument in sys.argv[1:] if argument != '--headless']
+	for expConfigFile in expConfigFiles:
+		if expConfigFile not in pulsedConfigFiles:
+			print('Usage: python calibrationPipeline.py [<T1config|T2config|XY8config|correlSpecconfig> ...] [--headless]')
+			sys.exit()
+	runCalibration(expConfigFiles,headless='--headless' in sys.argv[1:])
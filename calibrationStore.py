@@ -0,0 +1,75 @@
+# calibrationStore.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Calibration store
+
+Calibrated setup parameters (e.g. the optimum t_readoutDelay found by optimReadoutDelay.py) are saved in a JSON file,
+calibration.json, in the directory of the qdSpectro scripts. The experiment config files read their default values for
+these parameters from this file, so that a new calibration is picked up by all experiments without editing each config
+file. Each entry stores the value, the date and time at which it was calibrated and the data file it was obtained from.
+Each setup profile (see setupProfiles in connectionConfig.py) has its own file, calibration_<setup>.json, so that the
+calibrations of one setup never replace those of another (e.g. when several setups are run by orchestrator.py).
+
+To print the stored calibrations, from a windows command prompt, call:
+ python calibrationStore.py
+"""
+#Imports
+import connectionConfig as conCfg
+import json
+import os
+from time import localtime, strftime
+
+def calibrationFile():
+	#Calibration file of the setup profile in use (see connectionConfig.activeSetup).
+	fileName = 'calibration.json' if conCfg.activeSetup is None else 'calibration_'+conCfg.activeSetup+'.json'
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)),fileName)
+
+def loadCalibrations():
+	#Returns a dictionary of all stored calibrations (empty if none have been stored yet).
+	if not os.path.isfile(calibrationFile()):
+		return {}
+	with open(calibrationFile()) as storeFile:
+		return json.load(storeFile)
+
+def getCalibratedValue(name,default):
+	#Returns the stored value of the calibrated parameter name, or default if it has not been calibrated yet.
+	calibrations = loadCalibrations()
+	if name in calibrations:
+		return calibrations[name]['value']
+	return default
+
+def saveCalibratedValue(name,value,source=''):
+	calibrations = loadCalibrations()
+	calibrations[name] = {'value':value,'dateTime':strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime()),'source':source}
+	# Write to a temporary file first, so that an interrupted write cannot corrupt the store:
+	with open(calibrationFile()+'.tmp','w') as storeFile:
+		json.dump(calibrations,storeFile,indent=1,sort_keys=True)
+	os.replace(calibrationFile()+'.tmp',calibrationFile())
+
+if __name__ == "__main__":
+	calibrations = loadCalibrations()
+	if not calibrations:
+		print('No calibrations stored in',calibrationFile())
+	for name in sorted(calibrations):
+		print(name,'=',calibrations[name]['value'],'(calibrated on',calibrations[name]['dateTime'],'from',calibrations[name]['source'] or 'unknown source',')')
@@ -0,0 +1,276 @@
+# configControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Immutable experiment configuration objects. An ExpConfig holds the user inputs of one experiment (as set in the
+# *config.py files) and computes the derived values (scan points, save file names, sequence arguments, param-file
+# contents) only when they are requested. ExpConfigs can be loaded from the existing *config.py modules or from
+# JSON/YAML files, and copied with modified parameters using _replace(), e.g.
+#    cfg = loadConfig('XY8config')._replace(t_pi=26, N=8)
+# Creating an ExpConfig does not import or modify any module state, so many configs can coexist in one process.
+import connectionConfig as conCfg
+import numpy as np
+import json
+import os
+import sys
+from collections import namedtuple
+from importlib import import_module
+from time import localtime, strftime
+from types import SimpleNamespace
+
+# Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
+t_min = 1e3/conCfg.PBclk #in ns
+us = 1e3
+
+##-------------------- Sequence definitions--------------------
+# For each pulse sequence: the config module it is normally defined in, the user-input names of the scan start and
+# end, the names of the parameters passed to the sequence builder (after the scanned parameter), the PulseBlaster
+# channels used, the [label, parameter, format] entries written to the _PARAMS.txt file, and the names of the padding
+# arguments of the sequence builder, which can be set through the sequencePadding parameter (see shotRateOptimizer.py).
+SequenceInfo = namedtuple('SequenceInfo',['configFile','scanStartName','scanEndName','sequenceArgNames','PBchannelNames','paramFileFields','paddingArgNames'])
+
+def _paramFileFields(N_scanPtsLabel,scanStartName,scanEndName,specificFields):
+	return ([[N_scanPtsLabel,'N_scanPts','%d'],['Navg:','Navg','%d'],['Nsamples:','Nsamples','%d'],
+			[scanStartName+':','scanStart','%f'],[scanEndName+':','scanEnd','%f'],['microwavePower:','microwavePower','%f']]
+			+ specificFields +
+			[['sequencePadding:','sequencePadding','%r'],['shotByShotNormalization:','shotByShotNormalization','%r'],['randomize:','randomize','%r'],['plotPulseSequence:','plotPulseSequence','%r'],
+			['saveSpacing_inScanPts:','saveSpacing_inScanPts','%d'],['saveSpacing_inAverages:','saveSpacing_inAverages','%d'],['dataFileName:','dataFileName','%s']])
+
+_pulsedFields = [['microwaveFrequency','microwaveFrequency','%f'],['t_AOM:','t_AOM','%f'],['t_readoutDelay:','t_readoutDelay','%f']]
+sequenceInfo = {
+	'ESRseq': SequenceInfo('ESRconfig','startFreq','endFreq',['t_duration'],['AOM','uW','DAQ','STARTtrig'],
+		_paramFileFields('N_scanPts:','startFreq','endFreq',[['t_duration:','t_duration','%f']]),['t_readoutBuffer']),
+	'RabiSeq': SequenceInfo('Rabiconfig','startPulseDuration','endPulseDuration',['t_AOM','t_readoutDelay'],['AOM','uW','DAQ','STARTtrig'],
+		_paramFileFields('N_timePts:','startPulseDuration','endPulseDuration',_pulsedFields),['startPadding','uWtoAOM_delay']),
+	'T1seq': SequenceInfo('T1config','start_t','end_t',['t_AOM','t_readoutDelay','t_pi'],['AOM','uW','DAQ','STARTtrig'],
+		_paramFileFields('N_scanPts:','start_t','end_t',_pulsedFields+[['t_pi','t_pi','%f'],['multiplexFactor:','multiplexFactor','%r'],['samplingMode:','samplingMode','%r']]),[]),
+	'T2seq': SequenceInfo('T2config','startTau','endTau',['t_AOM','t_readoutDelay','t_pi','IQpadding','numberOfPiPulses'],['AOM','uW','DAQ','STARTtrig','I','Q'],
+		_paramFileFields('N_scanPts:','startTau','endTau',_pulsedFields+[['t_pi','t_pi','%f'],['numberOfPiPulses','numberOfPiPulses','%f'],['IQpadding','IQpadding','%f']]),['startPadding','uWtoAOM_delay']),
+	'XY8seq': SequenceInfo('XY8config','startTau','endTau',['t_AOM','t_readoutDelay','t_pi','IQpadding','N'],['AOM','uW','DAQ','STARTtrig','I','Q'],
+		_paramFileFields('N_scanPts:','startTau','endTau',_pulsedFields+[['t_pi','t_pi','%f'],['N','N','%f'],['IQpadding','IQpadding','%f']]),['startPadding','uWtoAOM_delay']),
+	'correlSpecSeq': SequenceInfo('correlSpecconfig','start_tcorr','end_tcorr',['tau0','t_AOM','t_readoutDelay','t_pi','IQpadding','N'],['AOM','uW','DAQ','STARTtrig','I','Q'],
+		_paramFileFields('N_scanPts:','start_tcorr','end_tcorr',_pulsedFields+[['t_pi','t_pi','%f'],['N','N','%f'],['IQpadding','IQpadding','%f'],['tau0','tau0','%f'],['samplingMode:','samplingMode','%r']]),['start_delay','uWtoAOM_delay']),
+}
+
+##-------------------- Experiment configuration--------------------
+# User inputs common to all experiments, followed by sequence-specific inputs (None if not used by the sequence):
+configFields = ['sequence','scanStart','scanEnd','N_scanPts','microwavePower','Nsamples','Navg','DAQtimeout','contrastMode',
+				'livePlotUpdate','plotPulseSequence','plotXaxisUnits','xAxisLabel','saveSpacing_inScanPts','saveSpacing_inAverages',
+				'savePath','saveFileName','shotByShotNormalization','randomize','longestPointFirst',
+				'microwaveFrequency','t_duration','t_AOM','t_readoutDelay','t_pi','N','numberOfPiPulses','tau0','IQpadding','sequencePadding','multiplexFactor','spectrumStopSNR',
+				'samplingMode','N_sampledPts',
+				'dateTimeStr']
+ExpConfigBase = namedtuple('ExpConfigBase',configFields)
+ExpConfigBase.__new__.__defaults__ = (None,)*len(configFields)
+
+class ExpConfig(ExpConfigBase):
+	__slots__ = ()
+
+	@property
+	def info(self):
+		return sequenceInfo[self.sequence]
+
+	@property
+	def scanStartName(self):
+		return self.info.scanStartName
+
+	@property
+	def scanEndName(self):
+		return self.info.scanEndName
+
+	@property
+	def T1startShift(self):
+		#In T1 scans, if start_t<(t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi), the scanned time points are shifted by
+		#(t_readoutDelay + 2*t_min*round((1*us)/t_min) + t_pi) to avoid pulse overlap errors (see T1config.py).
+		if self.sequence == 'T1seq':
+			minimumStart = self.t_readoutDelay + 2*t_min*round((1*us)/t_min) + self.t_pi
+			if self.scanStart<minimumStart:
+				return minimumStart
+		return 0
+
+	@property
+	def scannedParam(self):
+		return np.linspace(self.scanStart,self.scanEnd,int(self.N_scanPts),endpoint=True) + self.T1startShift
+
+	@property
+	def sequenceArgs(self):
+		return makeSequenceArgs(self)
+
+	@property
+	def PBchannels(self):
+		return {name:getattr(conCfg,name) for name in self.info.PBchannelNames}
+
+	@property
+	def dataFileName(self):
+		return self.savePath + self.saveFileName + self.timeStamp + ".txt"
+
+	@property
+	def paramFileName(self):
+		return self.savePath + self.saveFileName + self.timeStamp + '_PARAMS' + ".txt"
+
+	@property
+	def timeStamp(self):
+		if self.dateTimeStr is None:
+			return strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
+		return self.dateTimeStr
+
+	@property
+	def formattingSaveString(self):
+		return "".join("%s\t"+fmt+"\n" for [label,name,fmt] in self.info.paramFileFields)
+
+	@property
+	def expParamList(self):
+		return makeExpParamList(self,self.scannedParam,self.dataFileName)
+
+	def stamped(self):
+		#Returns a copy of this config with the save-file time stamp fixed to the current time.
+		return self._replace(dateTimeStr=strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime()))
+
+	def toDict(self):
+		#Returns the user inputs as a dictionary, using the scan start/end names of the config files (e.g. startTau).
+		configDict = {name:value for name,value in self._asdict().items() if value is not None}
+		configDict[self.scanStartName] = configDict.pop('scanStart')
+		configDict[self.scanEndName] = configDict.pop('scanEnd')
+		return configDict
+
+	def makeRunConfig(self):
+		#Returns a mutable copy of this config, with the same attributes and functions as the *config.py modules,
+		#for use by a single run of mainControl.runExperiment. Changes made during the run (e.g. by mainControl.validateUserInput)
+		#do not affect this config or any other run.
+		cfg = self if self.dateTimeStr is not None else self.stamped()
+		if cfg.T1startShift:
+			print('Note: start_t (and all subsequent scan points) have been shifted by ',cfg.T1startShift,'ns to avoid pulse overlap errors. First scan point is hence', cfg.scannedParam[0],'ns.')
+		runCfg = SimpleNamespace(**cfg._asdict())
+		runCfg.scannedParam = cfg.scannedParam
+		runCfg.N_scanPts = len(runCfg.scannedParam)
+		runCfg.scanStartName = cfg.scanStartName
+		runCfg.scanEndName = cfg.scanEndName
+		runCfg.PBchannels = cfg.PBchannels
+		runCfg.dataFileName = cfg.dataFileName
+		runCfg.paramFileName = cfg.paramFileName
+		runCfg.formattingSaveString = cfg.formattingSaveString
+		runCfg.updateSequenceArgs = lambda: makeSequenceArgs(runCfg)
+		runCfg.updateExpParamList = lambda: makeExpParamList(runCfg,runCfg.scannedParam,runCfg.dataFileName)
+		return runCfg
+
+def makeSequenceArgs(values):
+	#Returns the arguments passed to the sequence builder after the scanned parameter, followed by the padding arguments given in sequencePadding (a dictionary of {padding argument name: value in ns}), if any.
+	info = sequenceInfo[values.sequence]
+	sequenceArgs = [getattr(values,name) for name in info.sequenceArgNames]
+	if values.sequencePadding:
+		if sorted(values.sequencePadding.keys()) != sorted(info.paddingArgNames):
+			print('Error: sequencePadding must give a value for each of the padding arguments',info.paddingArgNames,'of the',values.sequence,'sequence.')
+			sys.exit()
+		sequenceArgs.extend([values.sequencePadding[name] for name in info.paddingArgNames])
+	return sequenceArgs
+
+def makeExpParamList(values,scannedParam,dataFileName):
+	#Builds the list written (with formattingSaveString) to the _PARAMS.txt file.
+	expParamList = []
+	for [label,name,fmt] in sequenceInfo[values.sequence].paramFileFields:
+		if name == 'scanStart':
+			value = scannedParam[0]
+		elif name == 'scanEnd':
+			value = scannedParam[-1]
+		elif name == 'dataFileName':
+			value = dataFileName
+		else:
+			value = getattr(values,name)
+		expParamList.extend([label,value])
+	return expParamList
+
+##-------------------- Loading configs--------------------
+def fromModule(expConfigFile):
+	#Reads the user inputs of a *config.py module (e.g. 'XY8config') into an ExpConfig.
+	expCfgModule = import_module(expConfigFile)
+	if expCfgModule.sequence not in sequenceInfo:
+		print('Error: config file',expConfigFile,'defines an unrecognised sequence,',expCfgModule.sequence,'.')
+		sys.exit()
+	info = sequenceInfo[expCfgModule.sequence]
+	userInputs = {name:getattr(expCfgModule,name,None) for name in configFields if name not in ['scanStart','scanEnd','dateTimeStr']}
+	userInputs['scanStart'] = getattr(expCfgModule,info.scanStartName)
+	userInputs['scanEnd'] = getattr(expCfgModule,info.scanEndName)
+	return ExpConfig(**userInputs)
+
+def fromDict(configDict):
+	#Makes an ExpConfig from a dictionary of user inputs. Inputs which are not given are taken from the config module of the
+	#requested sequence (e.g. XY8config.py for 'XY8seq'), so a dictionary only needs to list the parameters which differ from it.
+	configDict = dict(configDict)
+	if 'configFile' in configDict:
+		baseCfg = fromModule(configDict.pop('configFile'))
+	elif configDict.get('sequence') in sequenceInfo:
+		baseCfg = fromModule(sequenceInfo[configDict['sequence']].configFile)
+	else:
+		print('Error: config dictionary must define either a valid sequence (one of',list(sequenceInfo.keys()),') or a configFile.')
+		sys.exit()
+	info = sequenceInfo[configDict.get('sequence',baseCfg.sequence)]
+	if info.scanStartName in configDict:
+		configDict['scanStart'] = configDict.pop(info.scanStartName)
+	if info.scanEndName in configDict:
+		configDict['scanEnd'] = configDict.pop(info.scanEndName)
+	unknownNames = [name for name in configDict if name not in configFields]
+	if unknownNames:
+		print('Error: unrecognised experiment parameters',unknownNames,'in config dictionary.')
+		sys.exit()
+	return baseCfg._replace(**configDict)
+
+def fromFile(configFilePath):
+	#Loads a list of ExpConfigs from a JSON (.json) or YAML (.yaml/.yml) file. The file may contain a single dictionary of
+	#user inputs or a list of them (e.g. for a queue of runs).
+	if configFilePath.endswith('.json'):
+		with open(configFilePath) as configFile:
+			contents = json.load(configFile)
+	elif configFilePath.endswith(('.yaml','.yml')):
+		try:
+			import yaml
+		except ImportError:
+			print('Error: loading YAML config files requires the PyYAML package. Install it by running python -m pip install -U pyyaml, or use a JSON config file instead.')
+			sys.exit()
+		with open(configFilePath) as configFile:
+			contents = yaml.safe_load(configFile)
+	else:
+		print('Error: config file',configFilePath,'is not a .json, .yaml or .yml file.')
+		sys.exit()
+	if isinstance(contents,dict):
+		contents = [contents]
+	return [fromDict(configDict) for configDict in contents]
+
+def isConfigFilePath(expConfigFile):
+	return isinstance(expConfigFile,str) and expConfigFile.endswith(('.json','.yaml','.yml'))
+
+def loadConfig(expConfig):
+	#Returns an ExpConfig given either an ExpConfig, the name of a *config.py module or the path to a JSON/YAML file
+	#containing a single config.
+	if isinstance(expConfig,ExpConfig):
+		return expConfig
+	if isConfigFilePath(expConfig):
+		configs = fromFile(expConfig)
+		if len(configs)!=1:
+			print('Error: config file',expConfig,'contains',len(configs),'configs, but a single config was expected.')
+			sys.exit()
+		return configs[0]
+	return fromModule(expConfig)
+
+def saveConfig(expConfig,configFilePath):
+	#Saves the user inputs of an ExpConfig to a JSON file, which can be loaded again with loadConfig.
+	with open(configFilePath,'w') as configFile:
+		json.dump(expConfig.toDict(),configFile,indent=1)
@@ -24,6 +24,8 @@
 #-------------------------  USER INPUT  ---------------------------------------#
 #PulseBlaster clock frequency (in MHz):
 PBclk = 500
+#PulseBlaster board number (0 if there is only one PulseBlaster board in this PC):
+PBboard = 0
 
 #PulseBlaster Connections ----------------------------------------------
 #Enter below the bit numbers of the PulseBlaster channels to which you connect your instruments, according to the definitions below. Example: If you are using the SP18A ESR-PRO Pulseblaster board and chose bit 2 (corresponding to the BNC2 connector on the PulseBlaster board, as shown in figure 10 of the Septermber/2017 version of the PulseBlasterESR-PRO manual) to output the start trigger pulses, you should enter PB_STARTtrig =2.
@@ -51,24 +53,99 @@ PB_MW = 5
 DAQ_APDInput = "Dev2/ai1"
 DAQ_SampleClk = "PFI0"
 DAQ_StartTrig = "PFI5"
+#DAQ_RefInput is an optional second analog input channel of the DAQ (e.g. "Dev2/ai2"), connected to a reference photodiode monitoring the laser power (or to a second APD). It is sampled together with DAQ_APDInput and used to normalize out laser-intensity noise shot by shot (see calculateContrast in mainControl.py). Set to None if not used.
+DAQ_RefInput = None
+
+#DAQ_AcquisitionMode selects how the photodetector is read: 'analog' samples the photodetector voltage at DAQ_APDInput (e.g. for photodiodes or analog APDs), while 'counter' counts the TTL pulses output by a single-photon-counting APD. In 'counter' mode, the APD's TTL output is connected to the PFI terminal DAQ_CounterSource and counted by the DAQ counter DAQ_CounterInput while the PB_DAQ gate pulses (DAQ_SampleClk) are high. The count in each gate is then used in place of the analog voltage sample.
+DAQ_AcquisitionMode = 'analog'
+DAQ_CounterInput = "Dev2/ctr0"
+DAQ_CounterSource = "PFI8"
 
 #Enter below the maximum sampling rate of your National Instruments DAQ in samples per channel per second:
 DAQ_MaxSamplingRate = 250000
+#Enter below the maximum number of samples read from the DAQ in one read. Longer acquisitions (2*Nsamples samples per scan point) are read in chunks of this size and averaged as they arrive, so that memory use does not grow with Nsamples:
+DAQ_ChunkSize = 100000
 #Set minVoltage and maxVoltage (in Volts) below to match an AI (analog input) voltage range which is supported by your DAQ and which accommodates the range of voltages output by your photodetector (e.g. the ‘Analog Input’ section of chapter 4 of the NI USB-621x manual version from April 2009 includes a table listing the supported input voltage ranges for the NI DAQ USB-621x series).
 minVoltage=-5
 maxVoltage=5
 
+#Pulse sequence latencies--------------------------------------------
+#Enter below the switching latencies of your setup (in ns), which shotRateOptimizer.py uses to calculate the minimum safe padding (dead time) inside the pulse sequences:
+#AOM_FallTime is the time taken by the laser light to switch off at the sample after the end of a PB_AOM pulse, in addition to the AOM propagation delay (which is measured by t_readoutDelay, see optimReadoutDelay.py).
+#uW_SwitchTime is the switching (on/off) time of the microwave switch driven by PB_MW.
+#paddingMargin is a safety margin added to each calculated minimum padding.
+AOM_FallTime = 200
+uW_SwitchTime = 50
+paddingMargin = 100
+
 #SRS Connections-------------------------------------------------------
 # Enter below the GPIB address and model name of your SRS.
 GPIBaddr = 27
 modelName='SG386'
 
+#Live data publishing--------------------------------------------------
+# Enter below the localhost TCP port on which mainControl.runExperiment publishes a record for each scan point and each completed run (see dataPublisher.py), or None to disable publishing.
+dataPublishPort = None
+
+#Shared-memory data plane----------------------------------------------
+# Enter below the name of the shared memory block in which mainControl.runExperiment keeps its data arrays, so that analysis processes can read them while the experiment runs (see sharedData.py), or None to keep the arrays private. Set shareRawShots to True to also share the raw DAQ readings of the last measured scan point.
+sharedMemoryName = None
+shareRawShots = False
+
+#Compiled sequence cache------------------------------------------------
+# Enter below the folder in which compiled pulse sequences are cached across sessions (see sequenceCache.py), or None to disable the cache, and the maximum size of the cache, in MB. A relative folder is taken relative to the folder of this file (not the working directory): the default folder, Sequence_Cache, is created next to the MaGNiFi scripts.
+sequenceCachePath = 'Sequence_Cache'
+sequenceCacheMaxMB = 200
+
+#Multi-setup profiles----------------------------------------------------
+# To run several spectrometers from this PC at the same time (see orchestrator.py), enter below one connection profile per setup. Each profile is a dictionary of the connection settings above (e.g. PBboard, the PB_ bit numbers, DAQ_APDInput, DAQ_SampleClk, DAQ_StartTrig, GPIBaddr, modelName, dataPublishPort, sharedMemoryName) which differ for that setup from the values entered above. When several DAQ devices are connected, give the full terminal names for DAQ_SampleClk and DAQ_StartTrig (e.g. "/Dev1/PFI0").
+# A single experiment can also be run on one of these setups by setting the QDSPECTRO_SETUP environment variable to the name of its profile (e.g., from a windows command prompt: set QDSPECTRO_SETUP=rig2, then python mainControl.py T2config).
+setupProfiles = {
+#	'rig1': {'PBboard':0, 'DAQ_APDInput':"Dev1/ai1", 'DAQ_SampleClk':"/Dev1/PFI0", 'DAQ_StartTrig':"/Dev1/PFI5", 'GPIBaddr':27, 'dataPublishPort':50001},
+#	'rig2': {'PBboard':1, 'DAQ_APDInput':"Dev2/ai1", 'DAQ_SampleClk':"/Dev2/PFI0", 'DAQ_StartTrig':"/Dev2/PFI5", 'GPIBaddr':28, 'dataPublishPort':50002},
+}
+
 #------------------------- END OF USER INPUT ----------------------------------#
 
-#Convert PulseBlaster bit number to PulseBlaster register address:
-I = 2**PB_I
-Q = 2**PB_Q
-STARTtrig = 2**PB_STARTtrig
-DAQ = 2**PB_DAQ
-AOM = 2**PB_AOM
-uW = 2**PB_MW
\ No newline at end of file
+import os
+import sys
+
+profileSettingNames = ['PBclk','PBboard','PB_I','PB_Q','PB_STARTtrig','PB_DAQ','PB_AOM','PB_MW','DAQ_APDInput','DAQ_RefInput','DAQ_AcquisitionMode','DAQ_CounterInput','DAQ_CounterSource','DAQ_SampleClk','DAQ_StartTrig','DAQ_MaxSamplingRate','DAQ_ChunkSize','minVoltage','maxVoltage','AOM_FallTime','uW_SwitchTime','paddingMargin','GPIBaddr','modelName','dataPublishPort','sharedMemoryName','shareRawShots','sequenceCachePath']
+# Name of the setup profile in use (None if the settings above are used unchanged):
+activeSetup = None
+
+def updateRegisterAddresses():
+	#Convert PulseBlaster bit number to PulseBlaster register address:
+	global I,Q,STARTtrig,DAQ,AOM,uW
+	I = 2**PB_I
+	Q = 2**PB_Q
+	STARTtrig = 2**PB_STARTtrig
+	DAQ = 2**PB_DAQ
+	AOM = 2**PB_AOM
+	uW = 2**PB_MW
+
+def profileSettings(setupName):
+	#Returns a dictionary of all the connection settings of setup profile setupName.
+	if setupName not in setupProfiles:
+		print('Error: unknown setup profile',setupName,'. Valid setup profiles (defined in setupProfiles in connectionConfig.py) are:',list(setupProfiles.keys()))
+		sys.exit()
+	unknownNames = [name for name in setupProfiles[setupName] if name not in profileSettingNames]
+	if unknownNames:
+		print('Error: unrecognised connection settings',unknownNames,'in setup profile',setupName,'. Valid settings are:',profileSettingNames)
+		sys.exit()
+	settings = {name:globals()[name] for name in profileSettingNames}
+	settings.update(setupProfiles[setupName])
+	return settings
+
+def applyProfile(setupName):
+	#Replaces the connection settings of this module by those of setup profile setupName. This must be done before any of the
+	#instrument modules (PBcontrol, DAQcontrol, sequenceControl, the experiment config files, etc.) are imported, since they
+	#copy the connection settings when they are imported (from connectionConfig import *).
+	global activeSetup
+	globals().update(profileSettings(setupName))
+	updateRegisterAddresses()
+	activeSetup = setupName
+
+updateRegisterAddresses()
+if os.environ.get('QDSPECTRO_SETUP'):
+	applyProfile(os.environ['QDSPECTRO_SETUP'])
\ No newline at end of file
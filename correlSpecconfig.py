@@ -34,6 +34,12 @@ By default, for each scan point, the script calculates the contrast as a functio
 
 The first time the script scans over the delays, it does so in order from the shortest to the longest delay. If Navg>1, the script then repeats the scan Navg times and averages the results. By default, the order of the scan points is randomized for all but the first scan. If you wish to turn off this randomization, set the randomize option below to False.
 
+-- Spectrum --
+After each averaging run, the script calculates the spectrum of the averaged contrast (the windowed, zero-padded FFT of the contrast versus t_corr, see spectrumControl.py), prints the frequencies and signal-to-noise ratios (SNR) of its largest peaks, plots it (unless run headless) and saves it in a _SPECTRUM.txt file next to the data file whenever the data is saved. If spectrumStopSNR is set to a number, averaging stops (and the data is saved) as soon as the largest spectral peak reaches this SNR (with sparse sampling, not before the second run, since the noise level of the spectrum can only be estimated from the scatter of two or more runs).
+
+-- Sparse sampling --
+With samplingMode set to 'sparse', only N_sampledPts of the N_scanPts scan points are measured: a random subset of the uniform t_corr grid, always including start_tcorr and end_tcorr. After each averaging run, the contrast on the full grid is reconstructed by compressed sensing (the sparsest spectrum consistent with the measured points, see samplingControl.py) before its spectrum is calculated, so the frequency resolution is still set by end_tcorr. This assumes that the spectrum contains only a few frequencies; the saved data file only contains the measured scan points.
+
 -- Plotting options --
 Set livePlotUpdate to True to plot the data as it is acquired. Note that, after the first scan is completed, the plot will only update at the end of every subsequent scan. If livePlotUpdate is set to False, the data will only be plotted at the end of the experiment.
 
@@ -64,7 +70,7 @@ To run this script:
  *tau0: Delay between pi pulses in the XY8 pulse sequence (in ns).
  *Nsamples: number of fluorescence measurement samples to take at each scan point.
  *Navg: number of averaging runs (i.e. number of times the delay scan is repeated).
- *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired)
+ *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired). Set this to 'auto' to derive the timeout of each DAQ read from the period of the compiled pulse sequence (twice the expected acquisition time plus a 1s margin), so that a hang is detected quickly.
  *contrastMode: for this experiment, this should be set to set this to 'ratio_DifferenceOverSum'. Other available contrast modes are 'ratio_SignalOverReference' and 'signalOnly' (see 'Contrast setting' description above).
  *livePlotUpdate: set this to True to update the plot as data is acquired (see 'Plotting options' above).
  *plotPulseSequence: set this to True to plot the pulse sequence at the start of the experiment (see 'Plotting options' above).
@@ -76,14 +82,17 @@ To run this script:
  *saveFileName: file name under which to save the data. This name will later be augmented by the date and time at which the script was run.
  *shotByShotNormalization: set this option to True to do shot by shot contrast normalization (see 'Averaging Options' above).
  *randomize: set this option to True to randomize the order of frequency points in all scans after the first one.
+ *spectrumStopSNR: SNR of the largest spectral peak at which averaging is stopped (see 'Spectrum' above), or None to always run all Navg averaging runs.
+ *samplingMode: set this to 'sparse' to measure a random subset of N_sampledPts scan points and reconstruct the spectrum from them (see 'Sparse sampling' above), or 'uniform' to measure all N_scanPts scan points.
+ *N_sampledPts: number of scan points measured with 'sparse' sampling.
  *IQpadding: delay between the pulse edges which turn on and off the IQ and the pulse edges which turn on and off the microwaves, in ns. 
  """
 #Imports
 from spinapi import ns,us,ms
 import os
 import numpy as np
-from time import localtime, strftime
 from connectionConfig import *
+import calibrationStore as calStore
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/PBclk #in ns
 #-------------------------  USER INPUT  ---------------------------------------#
@@ -106,8 +115,8 @@ microwaveFrequency = 2e9
 # Pulse sequence parameters:----------------------------------------------------
 # AOM pulse duration (in ns)
 t_AOM= 5*us
-# Readout delay (in ns)
-t_readoutDelay = 2.3*us
+# Readout delay (in ns) - by default, the value found by optimReadoutDelay.py (search mode) is read from the calibration store, or 2.3us if no calibration has been stored yet:
+t_readoutDelay = calStore.getCalibratedValue('t_readoutDelay',2.3*us)
 # Pi-pulse duration (in ns)
 t_pi = 24
 # Number of repeats of the block of 8 pi pulses in the XY8 pulse sequence:
@@ -118,8 +127,8 @@ tau0=1500
 Nsamples = 10000
 # Number of averaging runs to do:
 Navg = 4
-#DAQ timeout, in seconds:
-DAQtimeout = 10
+#DAQ timeout, in seconds (or 'auto'):
+DAQtimeout = 'auto'
 # Plotting options--------------------------------------------------------------
 # Contrast mode
 contrastMode ='ratio_DifferenceOverSum'
@@ -145,38 +154,17 @@ saveFileName = "correlationSpec_"
 shotByShotNormalization = False
 # Option to randomize order of scan points
 randomize = True
+# SNR of the largest spectral peak at which to stop averaging (None to run all Navg runs)
+spectrumStopSNR = None
+# Scan point sampling ('uniform' or 'sparse') and number of scan points measured with 'sparse' sampling
+samplingMode = 'uniform'
+N_sampledPts = 60
 #Advanced user options--------------------------------------------------------------
 # IQ padding, in ns (this should be left at t_min*round(30*ns/t_min),unless the user  
 # requires an especially short free precession delay - this parameter should only be 
 # editted with close monitoring of the pulse sequence on the scope.
 IQpadding = t_min*round(30*ns/t_min)
 #------------------------- END OF USER INPUT ----------------------------------#
-
-scannedParam = np.linspace(start_tcorr,end_tcorr, N_scanPts, endpoint=True) 
-#Sequence string:
+#Sequence string (the scan points, save file names, sequence arguments and param file contents are derived from the user
+#inputs above by configControl.py, see configControl.sequenceInfo):
 sequence = 'correlSpecSeq'
-#Scan start Name
-scanStartName = 'start_tcorr'
-#Scan end Name
-scanEndName = 'end_tcorr'
-#PB channels
-PBchannels = {'AOM':AOM,'uW':uW,'DAQ':DAQ,'STARTtrig':STARTtrig,'I':I,'Q':Q}
-#Sequence args
-sequenceArgs = [tau0,t_AOM,t_readoutDelay,t_pi,IQpadding,N]
-#Make save file path
-dateTimeStr = strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
-dataFileName = savePath + saveFileName+ dateTimeStr +".txt"
-#Make param file path
-paramFileName = savePath + saveFileName+dateTimeStr+'_PARAMS'+".txt"
-#Param file save settings
-formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%r\n%s\t%r\n%s\t%d\n%s\t%d\n%s\t%s\n"
-expParamList = ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'start_tcorr:',scannedParam[0],'end_tcorr:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'t_pi',t_pi,'N',N,'IQpadding',IQpadding,'tau0',tau0,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-
-def updateSequenceArgs():
-	sequenceArgs = [tau0,t_AOM,t_readoutDelay,t_pi,IQpadding,N]
-	return sequenceArgs
-	
-def updateExpParamList():
-	expParamList = ['N_scanPts:',N_scanPts,'Navg:',Navg,'Nsamples:',Nsamples,'start_tcorr:',scannedParam[0],'end_tcorr:',scannedParam[-1],'microwavePower:',microwavePower,'microwaveFrequency',microwaveFrequency,'t_AOM:',t_AOM, 't_readoutDelay:',t_readoutDelay,'t_pi',t_pi,'N',N,'IQpadding',IQpadding,'tau0',tau0,'shotByShotNormalization:',shotByShotNormalization,'randomize:',randomize,'plotPulseSequence:',plotPulseSequence,'saveSpacing_inScanPts:',saveSpacing_inScanPts,'saveSpacing_inAverages:',saveSpacing_inAverages,'dataFileName:',dataFileName]
-	return expParamList
- 
\ No newline at end of file
@@ -0,0 +1,176 @@
+# dataCatalog.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Data catalog
+
+The experiments saved in a save directory (savePath) are indexed in an SQLite database, catalog.sqlite, in that
+directory, with one row per data file and typed columns for the sequence, scan range and main experiment parameters
+(see catalogColumns below), so that runs can be found without parsing every _PARAMS.txt file.
+
+Rows are added in two ways:
+ *mainControl.runExperiment records each run in the catalog every time it saves it (see recordSave), together with its
+  completion state: 'incomplete' while it is running (or if it was interrupted) and 'complete' after the last averaging
+  run has been saved.
+ *updateCatalog scans a save directory and (re-)indexes only the data files which are new or whose modification time or
+  size has changed since they were last indexed, e.g. to index data saved before the catalog existed. The completion
+  state of these runs is 'unknown' (note that, in this case, Navg is the value in the _PARAMS.txt file, which
+  mainControl.py overwrites with the number of completed averaging runs).
+Rows of data files which no longer exist are removed by updateCatalog.
+
+Runs are found with query, which takes an SQL condition on the catalog columns and returns catalog entries whose data is
+only loaded (see analysisControl.loadRun) when their load() method is called, e.g. for all XY8 runs with t_pi=24 and
+N>=4 taken since the 1st of September 2026:
+ query('Saved_Data',"sequence='XY8seq' AND t_pi=24 AND N>=4 AND dateTime>=?",['2026-09-01'])
+
+To run this script (which updates the catalog of a save directory and prints the runs matching an optional condition),
+from a windows command prompt, call:
+ python dataCatalog.py <save directory> [<SQL condition>]
+e.g. python dataCatalog.py Saved_Data "sequence='XY8seq' AND N>=4"
+"""
+#Imports
+import analysisControl as anCtl
+import configControl as cfgCtl
+import os
+import sqlite3
+import sys
+from time import localtime, strftime, strptime
+
+catalogFileName = 'catalog.sqlite'
+# Typed columns of the catalog, after the key (dataFileName). The experiment parameters are filled in from the _PARAMS.txt file (NULL if the sequence does not use them):
+catalogColumns = [['paramFileName','TEXT'],['sequence','TEXT'],['dateTime','TEXT'],['scanStart','REAL'],['scanEnd','REAL'],['N_scanPts','INTEGER'],
+				['Navg','INTEGER'],['Nsamples','INTEGER'],['microwaveFrequency','REAL'],['microwavePower','REAL'],['t_duration','REAL'],['t_AOM','REAL'],
+				['t_readoutDelay','REAL'],['t_pi','REAL'],['N','REAL'],['numberOfPiPulses','REAL'],['tau0','REAL'],['IQpadding','REAL'],
+				['pointsSaved','INTEGER'],['runsCompleted','INTEGER'],['state','TEXT'],['mtime','REAL'],['size','INTEGER']]
+parameterColumns = [name for [name,columnType] in catalogColumns[3:18]]
+
+def openCatalog(savePath):
+	#Opens (and creates, if needed) the catalog of a save directory.
+	connection = sqlite3.connect(os.path.join(savePath,catalogFileName),timeout=10)
+	connection.row_factory = sqlite3.Row
+	connection.execute('CREATE TABLE IF NOT EXISTS runs (dataFileName TEXT PRIMARY KEY, '+', '.join(name+' '+columnType for [name,columnType] in catalogColumns)+')')
+	connection.execute('CREATE INDEX IF NOT EXISTS runsBySequence ON runs (sequence, dateTime)')
+	return connection
+
+def fileState(dataFileName,paramFileName):
+	#Returns [modification time, size] of a run, combining its data and parameter files.
+	[dataStat,paramStat] = [os.stat(dataFileName),os.stat(paramFileName)]
+	return [max(dataStat.st_mtime,paramStat.st_mtime),dataStat.st_size+paramStat.st_size]
+
+def runDateTime(dataFileName,mtime):
+	#Returns the date and time at which a run was started, from the time stamp at the end of its file name (see configControl.ExpConfig.timeStamp), or from mtime if there is none.
+	try:
+		return strftime('%Y-%m-%d %H:%M:%S',strptime(os.path.basename(dataFileName)[-len('YYYY-mm-dd_HHhMMmSSs.txt'):-len('.txt')],'%Y-%m-%d_%Hh%Mm%Ss'))
+	except ValueError:
+		return strftime('%Y-%m-%d %H:%M:%S',localtime(mtime))
+
+def makeRow(dataFileName,state,Navg=None,runsCompleted=None):
+	#Parses the _PARAMS.txt file of a data file into a catalog row (a {column: value} dictionary).
+	paramFileName = dataFileName[:-len('.txt')]+'_PARAMS.txt'
+	params = anCtl.readParamFile(paramFileName)
+	sequence = anCtl.identifySequence(params)
+	row = {name:None for [name,columnType] in catalogColumns}
+	if sequence is not None:
+		#Map the labels of the _PARAMS.txt file to parameter names:
+		for [label,name,fmt] in cfgCtl.sequenceInfo[sequence].paramFileFields:
+			if (name in parameterColumns) and (label in params):
+				row[name] = params[label]
+	[mtime,size] = fileState(dataFileName,paramFileName)
+	with open(dataFileName) as dataFile:
+		pointsSaved = len([line for line in dataFile if line.strip()])
+	row.update({'dataFileName':os.path.abspath(dataFileName),'paramFileName':os.path.abspath(paramFileName),'sequence':sequence,'dateTime':runDateTime(dataFileName,mtime),
+				'pointsSaved':pointsSaved,'runsCompleted':runsCompleted,'state':state,'mtime':mtime,'size':size})
+	if Navg is not None:
+		row['Navg'] = Navg
+	return row
+
+def writeRow(connection,row):
+	names = list(row.keys())
+	connection.execute('INSERT OR REPLACE INTO runs ('+', '.join(names)+') VALUES ('+', '.join(['?']*len(names))+')',[row[name] for name in names])
+
+def recordSave(dataFileName,Navg,runsCompleted,complete):
+	#Called by mainControl.runExperiment each time it saves a run: records the run in the catalog of its save directory. Catalog errors (e.g. a locked database) only print a warning, so that they never stop an experiment.
+	try:
+		connection = openCatalog(os.path.dirname(os.path.abspath(dataFileName)))
+		with connection:
+			writeRow(connection,makeRow(dataFileName,'complete' if complete else 'incomplete',Navg,runsCompleted))
+		connection.close()
+	except (sqlite3.Error,OSError) as excpt:
+		print('Warning: could not record',dataFileName,'in the data catalog. Exception details:', type(excpt).__name__,'.',excpt)
+
+def updateCatalog(savePath):
+	#Indexes the data files of savePath which are new or have changed since they were last indexed, and removes the rows of deleted files. Returns the number of (re-)indexed files.
+	connection = openCatalog(savePath)
+	indexed = {row['dataFileName']:[row['mtime'],row['size'],row['state'],row['Navg'],row['runsCompleted']] for row in connection.execute('SELECT dataFileName, mtime, size, state, Navg, runsCompleted FROM runs')}
+	dataFileNames = [os.path.abspath(name) for name in anCtl.findDataFiles([savePath])]
+	Nindexed = 0
+	with connection:
+		for dataFileName in dataFileNames:
+			paramFileName = dataFileName[:-len('.txt')]+'_PARAMS.txt'
+			if not os.path.isfile(paramFileName):
+				continue
+			previous = indexed.get(dataFileName)
+			if (previous is not None) and (previous[0:2] == fileState(dataFileName,paramFileName)):
+				continue
+			if previous is None:
+				writeRow(connection,makeRow(dataFileName,'unknown'))
+			else:
+				#Keep the completion state recorded by mainControl.py:
+				writeRow(connection,makeRow(dataFileName,previous[2],previous[3] if previous[2]!='unknown' else None,previous[4]))
+			Nindexed += 1
+		for dataFileName in set(indexed.keys())-set(dataFileNames):
+			connection.execute('DELETE FROM runs WHERE dataFileName = ?',[dataFileName])
+	connection.close()
+	return Nindexed
+
+class CatalogEntry:
+	#A row of the catalog, with the columns as attributes. The data of the run is only loaded when load() is called.
+	def __init__(self,row):
+		self.__dict__.update(dict(row))
+		self._run = None
+
+	def load(self):
+		#Returns the run as an analysisControl.Run (loaded on the first call only).
+		if self._run is None:
+			self._run = anCtl.loadRun(self.dataFileName)
+		return self._run
+
+	def __repr__(self):
+		return 'CatalogEntry('+os.path.basename(self.dataFileName)+', '+str(self.sequence)+', '+str(self.dateTime)+', '+str(self.state)+')'
+
+def query(savePath,condition=None,parameters=(),update=True):
+	#Returns the catalog entries of savePath matching the SQL condition (on the catalog columns, with ? placeholders for parameters), in order of date and time. The catalog is first brought up to date if update is True.
+	if update:
+		updateCatalog(savePath)
+	connection = openCatalog(savePath)
+	rows = connection.execute('SELECT * FROM runs'+(' WHERE '+condition if condition else '')+' ORDER BY dateTime',list(parameters)).fetchall()
+	connection.close()
+	return [CatalogEntry(row) for row in rows]
+
+if __name__ == "__main__":
+	if len(sys.argv) not in [2,3]:
+		print('Usage: python dataCatalog.py <save directory> [<SQL condition>]')
+		sys.exit()
+	print('Indexed',updateCatalog(sys.argv[1]),'new or modified runs.')
+	for entry in query(sys.argv[1],sys.argv[2] if len(sys.argv)==3 else None,update=False):
+		print(entry.dateTime,'\t',entry.sequence,'\t',entry.state,'\t',os.path.basename(entry.dataFileName))
@@ -0,0 +1,175 @@
+# dataPublisher.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Live data publishing
+
+mainControl.runExperiment publishes a record for every scan point and every completed averaging run on a localhost TCP
+port (set dataPublishPort in connectionConfig.py to enable this). Any number of viewers, fitters or loggers can connect to
+this port and receive the records as they are acquired.
+
+Records are sent as binary frames: a 12-byte header (struct format '<4sBBHI': the magic bytes b'QDSP', the framing
+version, the record type, a reserved field and the payload length in bytes), followed by the payload:
+ *point record (record type 1), struct format '<IIIdddddd': run index, scan point index, number of scan points, scan
+  value, mean signal, mean background, contrast, time stamp (s since the epoch) and point duration (s).
+ *run record (record type 2), struct format '<IIdd' (run index, number of scan points N, time stamp and run duration),
+  followed by 4*N little-endian float64 values: the sorted scan values, and the signal, background and contrast
+  averaged over all runs completed so far.
+
+Publishing never blocks the acquisition: sockets are non-blocking, each subscriber has a bounded queue of frames waiting
+to be sent, from which the oldest frames are dropped (i.e. coalesced into the most recent ones) if the subscriber falls
+behind, and subscribers which accept no data for subscriberTimeout seconds are disconnected.
+
+To print the records published by a running experiment, from a windows command prompt, call:
+ python dataPublisher.py [<port>]
+"""
+#Imports
+import numpy as np
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+frameHeader = struct.Struct('<4sBBHI')
+frameMagic = b'QDSP'
+framingVersion = 1
+POINT_RECORD = 1
+RUN_RECORD = 2
+pointRecord = struct.Struct('<IIIdddddd')
+runRecordHeader = struct.Struct('<IIdd')
+
+def makeFrame(recordType,payload):
+	return frameHeader.pack(frameMagic,framingVersion,recordType,0,len(payload)) + payload
+
+class DataPublisher:
+	#Publishes point and run records to all connected subscribers (see description above).
+	def __init__(self,port,host='127.0.0.1',maxQueuedFrames=1000,subscriberTimeout=5):
+		self.maxQueuedFrames = maxQueuedFrames
+		self.subscriberTimeout = subscriberTimeout
+		self.server = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+		self.server.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+		self.server.bind((host,port))
+		self.server.listen(16)
+		self.server.setblocking(False)
+		# Each subscriber is [socket, unsent bytes of the frame being sent, queue of frames waiting to be sent, time of last successful send]:
+		self.subscribers = []
+
+	def acceptSubscribers(self):
+		while True:
+			try:
+				[connection,address] = self.server.accept()
+			except (BlockingIOError,InterruptedError):
+				return
+			connection.setblocking(False)
+			self.subscribers.append([connection,b'',deque(maxlen=self.maxQueuedFrames),time.time()])
+
+	def flush(self):
+		#Sends as much queued data as each subscriber will accept without blocking, and drops stalled subscribers.
+		now = time.time()
+		for subscriber in list(self.subscribers):
+			[connection,unsentBytes,queue,lastSendTime] = subscriber
+			try:
+				while unsentBytes or queue:
+					if not unsentBytes:
+						unsentBytes = queue.popleft()
+					nSent = connection.send(unsentBytes)
+					unsentBytes = unsentBytes[nSent:]
+					lastSendTime = now
+			except (BlockingIOError,InterruptedError):
+				pass
+			except OSError:
+				self.dropSubscriber(subscriber)
+				continue
+			subscriber[1] = unsentBytes
+			subscriber[3] = lastSendTime
+			if (unsentBytes or queue) and (now-lastSendTime>self.subscriberTimeout):
+				self.dropSubscriber(subscriber)
+
+	def dropSubscriber(self,subscriber):
+		subscriber[0].close()
+		self.subscribers.remove(subscriber)
+
+	def publish(self,frame):
+		self.acceptSubscribers()
+		for subscriber in self.subscribers:
+			if not (subscriber[1] or subscriber[2]):
+				#Nothing waiting: start the stall timer from now.
+				subscriber[3] = time.time()
+			subscriber[2].append(frame)
+		self.flush()
+
+	def publishPoint(self,i_run,i_scanPoint,N_scanPts,scanValue,meanSignal,meanBackground,contrast,pointDuration):
+		self.publish(makeFrame(POINT_RECORD,pointRecord.pack(i_run,i_scanPoint,N_scanPts,scanValue,meanSignal,meanBackground,contrast,time.time(),pointDuration)))
+
+	def publishRun(self,i_run,scannedParam,signal,background,contrast,runDuration):
+		arrays = np.ascontiguousarray([scannedParam,signal,background,contrast],dtype='<f8')
+		self.publish(makeFrame(RUN_RECORD,runRecordHeader.pack(i_run,arrays.shape[1],time.time(),runDuration)+arrays.tobytes()))
+
+	def close(self):
+		for subscriber in list(self.subscribers):
+			self.dropSubscriber(subscriber)
+		self.server.close()
+
+##-------------------- Subscriber side--------------------
+def receiveExactly(connection,nBytes):
+	data = b''
+	while len(data)<nBytes:
+		chunk = connection.recv(nBytes-len(data))
+		if not chunk:
+			raise ConnectionError('Publisher closed the connection.')
+		data += chunk
+	return data
+
+def subscribe(port,host='127.0.0.1'):
+	#Connects to a DataPublisher and yields [recordType, record] for each record received, where record is a dictionary.
+	connection = socket.create_connection((host,port))
+	try:
+		while True:
+			[magic,version,recordType,reserved,payloadLength] = frameHeader.unpack(receiveExactly(connection,frameHeader.size))
+			if magic != frameMagic or version != framingVersion:
+				raise ValueError('Unrecognised frame received from data publisher.')
+			payload = receiveExactly(connection,payloadLength)
+			if recordType == POINT_RECORD:
+				yield [recordType,dict(zip(['i_run','i_scanPoint','N_scanPts','scanValue','meanSignal','meanBackground','contrast','timeStamp','pointDuration'],pointRecord.unpack(payload)))]
+			elif recordType == RUN_RECORD:
+				[i_run,N,timeStamp,runDuration] = runRecordHeader.unpack(payload[0:runRecordHeader.size])
+				arrays = np.frombuffer(payload[runRecordHeader.size:],dtype='<f8').reshape(4,N)
+				yield [recordType,{'i_run':i_run,'timeStamp':timeStamp,'runDuration':runDuration,'scannedParam':arrays[0],'signal':arrays[1],'background':arrays[2],'contrast':arrays[3]}]
+	finally:
+		connection.close()
+
+if __name__ == "__main__":
+	import connectionConfig as conCfg
+	port = int(sys.argv[1]) if len(sys.argv)>1 else conCfg.dataPublishPort
+	if port is None:
+		print('Usage: python dataPublisher.py <port> (or set dataPublishPort in connectionConfig.py)')
+		sys.exit()
+	try:
+		for [recordType,record] in subscribe(port):
+			if recordType == POINT_RECORD:
+				print('Run',record['i_run']+1,'point',record['i_scanPoint']+1,'of',record['N_scanPts'],': scan value',record['scanValue'],', contrast',record['contrast'])
+			else:
+				print('Run',record['i_run']+1,'completed in',record['runDuration'],'s')
+	except KeyboardInterrupt:
+		print('User keyboard interrupt. Quitting...')
@@ -0,0 +1,132 @@
+# eventLog.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Structured event log of an experiment. mainControl.runExperiment records the start and end of each scan point, the
+# instrument calls (SRS frequency changes, PulseBlaster programming and DAQ reads, with their durations), and all warnings
+# and errors in an _EVENTS.jsonl file next to the data file, one JSON object per line, e.g.:
+#  {"t": 12.503117, "event": "pointEnd", "i_run": 0, "i_scanPoint": 41, "signal": 0.1503, "background": 0.1421, "contrast": 0.0280}
+# where t is the time (in s) since the log was opened. Recording an event only appends it to an in-memory ring buffer of
+# ringBufferSize events; the buffer is written to the file by a background thread every flushInterval seconds, so no file
+# (or console) I/O happens in the acquisition loop. If the buffer fills up between two flushes, the oldest events are
+# overwritten and the number of lost events is recorded in a 'dropped' event.
+# The log file can be read back with readEvents.
+import collections
+import json
+import threading
+import time
+
+ringBufferSize = 65536
+flushInterval = 1.0 #in s
+# Minimum interval (in s) between the progress lines printed by ProgressDisplay:
+progressInterval = 0.5
+
+# The log of the experiment currently running (see mainControl.runExperiment), used by log and report:
+activeLog = None
+
+def jsonValue(value):
+	#Converts the NumPy values of event fields (e.g. np.int64) to Python values, and anything else to a string.
+	return value.item() if hasattr(value,'item') else str(value)
+
+class EventLog:
+	def __init__(self,fileName,capacity=ringBufferSize,flushInterval=flushInterval):
+		self.fileName = fileName
+		self.capacity = capacity
+		self.events = collections.deque(maxlen=capacity)
+		self.Ndropped = 0
+		self.t0 = time.perf_counter()
+		self.file = open(fileName,'w')
+		self.fileLock = threading.Lock()
+		self.stopFlushing = threading.Event()
+		self.log('logStart',dateTime=time.strftime('%Y-%m-%d %H:%M:%S'))
+		self.flushThread = threading.Thread(target=self.flushLoop,args=(flushInterval,),daemon=True)
+		self.flushThread.start()
+
+	def log(self,kind,**fields):
+		#Records an event: appends (time, kind, fields) to the ring buffer (the fields are only serialized when the buffer is flushed).
+		if len(self.events) == self.capacity:
+			self.Ndropped += 1
+		self.events.append((time.perf_counter()-self.t0,kind,fields))
+
+	def flush(self):
+		#Writes the buffered events to the log file.
+		with self.fileLock:
+			lines = []
+			while self.events:
+				[t,kind,fields] = self.events.popleft()
+				event = {'t':round(t,6),'event':kind}
+				event.update(fields)
+				lines.append(json.dumps(event,default=jsonValue)+'\n')
+			if self.Ndropped:
+				lines.append(json.dumps({'t':round(time.perf_counter()-self.t0,6),'event':'dropped','Nevents':self.Ndropped})+'\n')
+				self.Ndropped = 0
+			self.file.write(''.join(lines))
+			self.file.flush()
+
+	def flushLoop(self,interval):
+		while not self.stopFlushing.wait(interval):
+			self.flush()
+
+	def close(self):
+		#Stops the flush thread, writes the remaining events and closes the log file.
+		self.stopFlushing.set()
+		self.flushThread.join()
+		self.log('logEnd')
+		self.flush()
+		self.file.close()
+
+def log(kind,**fields):
+	#Records an event in the active log, if any.
+	if activeLog is not None:
+		activeLog.log(kind,**fields)
+
+def report(*args):
+	#Prints a message (exactly as print would) and records it in the active log as a 'warning', 'error' or 'message' event, depending on its 'Warning:' or 'Error:' prefix.
+	print(*args)
+	if activeLog is not None:
+		text = ' '.join(str(arg) for arg in args)
+		kind = 'warning' if text.startswith('Warning') else ('error' if text.startswith('Error') else 'message')
+		activeLog.log(kind,text=text)
+		if kind == 'error':
+			#Errors are usually followed by sys.exit(), so write the log out straight away:
+			activeLog.flush()
+
+def readEvents(fileName,kinds=None):
+	#Returns the events of a log file as a list of dictionaries (only those of the given kinds, if kinds is given).
+	with open(fileName) as logFile:
+		events = [json.loads(line) for line in logFile if line.strip()]
+	return [event for event in events if (kinds is None) or (event['event'] in kinds)]
+
+class ProgressDisplay:
+	#Throttled progress display: prints a 'Scan point i of N' line (preceded by 'Run r of R,' if the run is given) at most every interval seconds (and always for the last scan point), instead of one line per scan point.
+	def __init__(self,interval=progressInterval):
+		self.interval = interval
+		self.lastPrintTime = None
+
+	def update(self,i_scanPoint,N_scanPts,detail='',i_run=None,Navg=None):
+		now = time.perf_counter()
+		if (self.lastPrintTime is None) or (now-self.lastPrintTime>=self.interval) or (i_scanPoint==N_scanPts):
+			if i_run is None:
+				print('Scan point ',i_scanPoint,' of ',N_scanPts,detail)
+			else:
+				print('Run ',i_run,' of ',Navg,', scan point ',i_scanPoint,' of ',N_scanPts,detail)
+			self.lastPrintTime = now
@@ -0,0 +1,158 @@
+# fitControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Model functions and a small least-squares fitter (NumPy only, so no extra dependencies are needed) used to
+# extract calibration parameters from the data arrays produced by mainControl.runExperiment.
+import numpy as np
+
+##-------------------- Model functions--------------------
+def lorentzianDip(f,f0,gamma,depth,offset):
+	#Lorentzian dip centered at f0, with half width at half maximum gamma.
+	return offset - depth*(gamma**2)/((f-f0)**2 + gamma**2)
+
+def dampedSinusoid(t,amplitude,period,decayTime,offset):
+	#Rabi oscillation: cosine starting at its maximum at t=0 (no rotation), decaying exponentially.
+	return offset + amplitude*np.exp(-t/decayTime)*np.cos(2*np.pi*t/period)
+
+def stretchedExponential(t,amplitude,decayTime,stretch,offset):
+	#Stretched-exponential decay (e.g. of T1, T2 and XY8 contrast). stretch=1 is a simple exponential decay.
+	return offset + amplitude*np.exp(-np.abs(t/decayTime)**stretch)
+
+##-------------------- Least-squares fitting--------------------
+def leastSquaresFit(model,x,y,p0,maxIterations=200,tolerance=1e-10):
+	#Levenberg-Marquardt fit of model(x,*p) to y, starting from the initial guess p0.
+	#Returns [bestFitParams, residualSumOfSquares].
+	x = np.asarray(x,dtype=float)
+	y = np.asarray(y,dtype=float)
+	p = np.array(p0,dtype=float)
+	residuals = y - model(x,*p)
+	cost = np.dot(residuals,residuals)
+	damping = 1e-3
+	for iteration in range(0,maxIterations):
+		#Numerical Jacobian (forward differences, step scaled to each parameter):
+		steps = 1e-6*np.maximum(np.abs(p),1e-12)
+		jacobian = np.empty((len(x),len(p)))
+		for i in range(0,len(p)):
+			pStep = p.copy()
+			pStep[i] += steps[i]
+			jacobian[:,i] = (model(x,*pStep)-model(x,*p))/steps[i]
+		JtJ = np.dot(jacobian.T,jacobian)
+		Jtr = np.dot(jacobian.T,residuals)
+		improved = False
+		while damping<1e10:
+			try:
+				dp = np.linalg.solve(JtJ + damping*np.diag(np.diag(JtJ)+1e-30),Jtr)
+			except np.linalg.LinAlgError:
+				damping *= 10
+				continue
+			newResiduals = y - model(x,*(p+dp))
+			newCost = np.dot(newResiduals,newResiduals)
+			if np.isfinite(newCost) and newCost<cost:
+				improved = True
+				break
+			damping *= 10
+		if not improved:
+			break
+		converged = (cost-newCost)<=tolerance*cost
+		p = p + dp
+		residuals = newResiduals
+		cost = newCost
+		damping = max(damping/10,1e-12)
+		if converged:
+			break
+	return [p,cost]
+
+##-------------------- Initial guesses and fits--------------------
+# Each model has 4 parameters: the initial guesses below (which use the spacing of the first scan points, the last 10% of the scan, etc.) need at least as many scan points:
+minFitPoints = 4
+
+def checkFitPoints(x):
+	#Raises a ValueError if a scan has too few points to be fitted.
+	if len(x)<minFitPoints:
+		raise ValueError('a fit needs at least '+str(minFitPoints)+' scan points, but the scan has '+str(len(x)))
+
+def fitLorentzianDip(f,contrast):
+	#Fits the deepest dip in an ESR spectrum. Returns [f0,gamma,depth,offset].
+	f = np.asarray(f,dtype=float)
+	contrast = np.asarray(contrast,dtype=float)
+	checkFitPoints(f)
+	sortingIndices = np.argsort(f)
+	f = f[sortingIndices]
+	contrast = contrast[sortingIndices]
+	offset = np.median(contrast)
+	i_min = np.argmin(contrast)
+	depth = offset-contrast[i_min]
+	#Estimate the half width from the points which lie below half the dip depth, around the minimum:
+	belowHalfDepth = contrast<(offset-depth/2)
+	i_left = i_min
+	while i_left>0 and belowHalfDepth[i_left-1]:
+		i_left -= 1
+	i_right = i_min
+	while i_right<len(f)-1 and belowHalfDepth[i_right+1]:
+		i_right += 1
+	gamma = max((f[i_right]-f[i_left])/2,f[1]-f[0])
+	#Only fit the region around the deepest dip, so that a second resonance does not pull the fit:
+	window = (f>f[i_min]-10*gamma) & (f<f[i_min]+10*gamma)
+	[p,cost] = leastSquaresFit(lorentzianDip,f[window],contrast[window],[f[i_min],gamma,depth,offset])
+	p[1] = abs(p[1])
+	return list(p)
+
+def fitDampedSinusoid(t,contrast):
+	#Fits a Rabi oscillation. Returns [amplitude,period,decayTime,offset].
+	t = np.asarray(t,dtype=float)
+	contrast = np.asarray(contrast,dtype=float)
+	checkFitPoints(t)
+	sortingIndices = np.argsort(t)
+	t = t[sortingIndices]
+	contrast = contrast[sortingIndices]
+	offset = np.mean(contrast)
+	#Estimate the oscillation period from the dominant Fourier component (interpolating onto a uniform grid first,
+	#since scan points may have been removed, e.g. the 8ns point of Rabi scans):
+	tUniform = np.linspace(t[0],t[-1],len(t))
+	spectrum = np.abs(np.fft.rfft(np.interp(tUniform,t,contrast)-offset))
+	frequencies = np.fft.rfftfreq(len(tUniform),tUniform[1]-tUniform[0])
+	i_peak = 1+np.argmax(spectrum[1:])
+	period = 1/frequencies[i_peak]
+	amplitude = contrast[0]-offset
+	[p,cost] = leastSquaresFit(dampedSinusoid,t,contrast,[amplitude,period,t[-1]-t[0],offset])
+	#Keep the period (the model is even in it) and the decay time positive, and the sign convention of a cosine starting at its maximum:
+	p[1] = abs(p[1])
+	p[2] = abs(p[2])
+	return list(p)
+
+def fitStretchedExponential(t,contrast):
+	#Fits a stretched-exponential decay. Returns [amplitude,decayTime,stretch,offset].
+	t = np.asarray(t,dtype=float)
+	contrast = np.asarray(contrast,dtype=float)
+	checkFitPoints(t)
+	sortingIndices = np.argsort(t)
+	t = t[sortingIndices]
+	contrast = contrast[sortingIndices]
+	#Estimate the offset from the last points of the scan and the decay time from the point where the decay falls below 1/e of its initial amplitude:
+	offset = np.mean(contrast[-max(1,len(t)//10):])
+	amplitude = contrast[0]-offset
+	belowOneOverE = np.nonzero(np.abs(contrast-offset)<np.abs(amplitude)/np.e)[0]
+	decayTime = t[belowOneOverE[0]] if len(belowOneOverE) else t[-1]
+	[p,cost] = leastSquaresFit(stretchedExponential,t,contrast,[amplitude,max(decayTime,t[1]-t[0]),1,offset])
+	p[1] = abs(p[1])
+	return list(p)
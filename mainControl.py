@@ -23,235 +23,337 @@
 
 
 #Imports
+# Plotting (matplotlib) and instrument-driver modules (SRScontrol, DAQcontrol, PBcontrol, sequenceControl) are imported
+# inside the functions which use them, so that validation and headless runs do not pay their import cost at startup.
 import connectionConfig as conCfg
-import sequenceControl as seqCtl
-import SRScontrol as SRSctl
-import DAQcontrol as DAQctl
-import PBcontrol as PBctl
-import matplotlib.pyplot as plt
+import configControl as cfgCtl
+import samplingControl as sampCtl
+import scanGrid
+import eventLog as evLog
 import numpy as np
-from spinapi import ms,us,ns
 from random import shuffle
 from os.path import isdir 
 from os import makedirs
 import sys
 import math
-from importlib import import_module
+import time
 
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/conCfg.PBclk #in ns
+# Time units (in ns), as in spinapi.py, defined here so that importing mainControl does not load the SpinAPI driver:
+ns = 1.0
+us = 1e3
+ms = 1e6
+# Time (in s) added to the expected acquisition time of each DAQ read to obtain its timeout when DAQtimeout is set to 'auto' (covers the wait for the start trigger and the DAQ start-up time):
+DAQchunkTimeoutMargin = 1
+# DAQ timeout (in s) used when DAQtimeout is set to 'auto' but the pulse sequence period is not known:
+defaultDAQtimeout = 10
+# Estimated times (in s) taken to reprogram the PulseBlaster and to change the SRS frequency, used to estimate experiment durations:
+PBreprogramTime = 0.1
+SRSfrequencySwitchTime = 0.02
+# Maximum number of invalid scan points listed individually by reportScanGridViolations:
+maxReportedViolations = 10
 def validateUserInput(expCfg):
 # This function validates the user inputs in the experiment config file (e.g. ESRconfig, Rabiconfig, etc).
 	
+	# Check that DAQtimeout is 'auto' or a positive number:
+	if (expCfg.DAQtimeout != 'auto') and ((not isinstance(expCfg.DAQtimeout,(int,float))) or (expCfg.DAQtimeout<=0)):
+		evLog.report('Error: DAQtimeout must be \'auto\' or a positive number of seconds.')
+		sys.exit()
+	# Check that multiplexFactor, if set, is a positive integer and is only used in T1 experiments:
+	if expCfg.multiplexFactor is not None:
+		if (not isinstance(expCfg.multiplexFactor,int)) or (expCfg.multiplexFactor<1):
+			evLog.report('Error: multiplexFactor must be a positive integer.')
+			sys.exit()
+		if (expCfg.multiplexFactor>1) and (expCfg.sequence != 'T1seq'):
+			evLog.report('Error: multiplexed acquisition (multiplexFactor>1) is only available for T1 experiments.')
+			sys.exit()
+	# Check that spectrumStopSNR, if set, is a positive number:
+	if (expCfg.spectrumStopSNR is not None) and ((not isinstance(expCfg.spectrumStopSNR,(int,float))) or (expCfg.spectrumStopSNR<=0)):
+		evLog.report('Error: spectrumStopSNR must be None or a positive number.')
+		sys.exit()
+	# Check the non-uniform sampling options (see samplingControl.py): 'sparse' sampling is only available for correlation spectroscopy and 'log' sampling for T1 experiments:
+	if expCfg.samplingMode not in [None]+list(sampCtl.samplingModes.keys()):
+		evLog.report('Error: samplingMode must be one of',list(sampCtl.samplingModes.keys()),'.')
+		sys.exit()
+	if expCfg.samplingMode in ['sparse','log']:
+		if expCfg.sequence != sampCtl.samplingModes[expCfg.samplingMode]:
+			evLog.report('Error:',expCfg.samplingMode,'sampling is only available for',sampCtl.samplingModes[expCfg.samplingMode],'experiments.')
+			sys.exit()
+		if (not isinstance(expCfg.N_sampledPts,int)) or (expCfg.N_sampledPts<2) or (expCfg.N_sampledPts>expCfg.N_scanPts):
+			evLog.report('Error: N_sampledPts must be an integer >=2 and <= N_scanPts.')
+			sys.exit()
+		#The decay measured with log sampling is fitted after each run (see fitControl.py), which needs at least minFitPoints delays:
+		import fitControl as fitCtl
+		if (expCfg.samplingMode == 'log') and (expCfg.N_sampledPts<fitCtl.minFitPoints):
+			evLog.report('Error: N_sampledPts must be >=',fitCtl.minFitPoints,'with log sampling, so that the measured decay can be fitted.')
+			sys.exit()
 	# Check that N_scanPts, Nsamples, Navg are all integers and Nsamples>=1, Navg>= 1, N_scanPts>=2
 	if (not isinstance(expCfg.Nsamples, int)) or (expCfg.Nsamples<1):
-		print('Error: Nsamples must be an integer >= 1.')
+		evLog.report('Error: Nsamples must be an integer >= 1.')
 		sys.exit()
 	if (not isinstance(expCfg.Navg, int)) or (expCfg.Navg<1):
-		print('Error: Navg must be an integer >= 1.')
+		evLog.report('Error: Navg must be an integer >= 1.')
 		sys.exit()
 	if (not isinstance(expCfg.N_scanPts, int)) or (expCfg.N_scanPts<2):
-		print('Error: N_scanPts must be an integer >= 2.')
+		evLog.report('Error: N_scanPts must be an integer >= 2.')
 		sys.exit()
 	
 	#Pulse-sequence parameter checks:
 	#Check that IQpadding is a multiple of t_min and >5*t_min:
 	if expCfg.sequence in ['T2seq','XY8seq','correlSpecSeq']:
 		if (expCfg.IQpadding<(5*t_min)) or (expCfg.IQpadding%t_min):
-			print('Error: IQpadding is set to', expCfg.IQpadding,'which is either <',5*t_min,'or not a multiple of',t_min,'. Please edit IQpadding to ensure that it is >',5*t_min,'ns and a multiple of',t_min,'.')
+			evLog.report('Error: IQpadding is set to', expCfg.IQpadding,'which is either <',5*t_min,'or not a multiple of',t_min,'. Please edit IQpadding to ensure that it is >',5*t_min,'ns and a multiple of',t_min,'.')
 	#Check t_duration in ESRseq is a multiple of (2*t_min):
 	if expCfg.sequence == 'ESRseq':
 		if expCfg.t_duration%(2*t_min):
-			print('Warning: t_duration set to ', expCfg.t_duration,'ns, which is not an integer multiple of ',(2*t_min),'ns. Rounding t_duration to nearest multiple of ',(2*t_min),'ns...')
-			expCfg.t_duration = (2*t_min)*round(t_duration_ns/(2*t_min))
-			print('t_duration now set to ', expCfg.t_duration,'ns')
+			evLog.report('Warning: t_duration set to ', expCfg.t_duration,'ns, which is not an integer multiple of ',(2*t_min),'ns. Rounding t_duration to nearest multiple of ',(2*t_min),'ns...')
+			expCfg.t_duration = (2*t_min)*round(expCfg.t_duration/(2*t_min))
+			evLog.report('t_duration now set to ', expCfg.t_duration,'ns')
 	
 	#Check that t_readoutDelay and t_AOM are multiples of t_min: 
 	if expCfg.sequence in ['RabiSeq','T2seq','XY8seq', 'correlSpecSeq', 'T1seq']:
 		if expCfg.t_readoutDelay%t_min:
-			print('Error: t_readoutDelay is set to ', expCfg.t_readoutDelay,'ns, which is not a multiple of ',t_min,'ns. Please set t_readoutDelay to an integer multiple of ',t_min,'ns.')
+			evLog.report('Error: t_readoutDelay is set to ', expCfg.t_readoutDelay,'ns, which is not a multiple of ',t_min,'ns. Please set t_readoutDelay to an integer multiple of ',t_min,'ns.')
 			sys.exit()
 		if expCfg.t_AOM%t_min:
-			print('Error: t_AOM is set to ', expCfg.t_AOM,'ns, which is not a multiple of ',t_min,'ns. Please set t_AOM to an integer multiple of ',t_min,'ns.')
+			evLog.report('Error: t_AOM is set to ', expCfg.t_AOM,'ns, which is not a multiple of ',t_min,'ns. Please set t_AOM to an integer multiple of ',t_min,'ns.')
 			sys.exit()
 		#Check that t_readoutDelay and t_AOM are >5*t_min:
 		if expCfg.t_AOM<(5*t_min):
-			print('Error: t_AOM must be >',(5*t_min),'ns!')
+			evLog.report('Error: t_AOM must be >',(5*t_min),'ns!')
 			sys.exit()
 		if expCfg.t_readoutDelay<(5*t_min):
-			print('Error: t_readoutDelay must be >',(5*t_min),'ns!')
+			evLog.report('Error: t_readoutDelay must be >',(5*t_min),'ns!')
 			sys.exit()
 	#Check that tau0 in the correlation spectroscopy sequence is an integer multiple of 2*t_min:
 	if expCfg.sequence == 'correlSpecSeq':
 		if expCfg.tau0%(2*t_min):
-			print('Error: tau0 is set to ', expCfg.tau0,'ns, which is not a multiple of ',(2*t_min),'ns. Please set tau0 to an integer multiple of ',(2*t_min),'ns.')
+			evLog.report('Error: tau0 is set to ', expCfg.tau0,'ns, which is not a multiple of ',(2*t_min),'ns. Please set tau0 to an integer multiple of ',(2*t_min),'ns.')
 			sys.exit()
 	#Number of XY8 repeats check:
 	if expCfg.sequence in ['XY8seq', 'correlSpecSeq']:
 		if expCfg.N<1 or (not isinstance(expCfg.N, int)):
-			print('Error: number of XY8 repeats, N, must be an integer >=1.')
+			evLog.report('Error: number of XY8 repeats, N, must be an integer >=1.')
 			sys.exit()
 	
 	#Pi-pulse length checks:
 	if expCfg.sequence == 'T1seq':
 		if expCfg.t_pi<t_min or expCfg.t_pi%t_min:
-			print('Error: requested pi pulse length ',expCfg.t_pi,'ns is either <',t_min,'ns or not an integer multiple of ',t_min,'ns.')
+			evLog.report('Error: requested pi pulse length ',expCfg.t_pi,'ns is either <',t_min,'ns or not an integer multiple of ',t_min,'ns.')
 			sys.exit()
 	if expCfg.sequence in ['T2seq','XY8seq','correlSpecSeq']:
 		# Check if the user has input a pi-pulse length which is shorter than (2*t_min) or not a multiple of 2*t_min:
 		if expCfg.t_pi<(2*t_min):
-			print('Error: requested pi pulse length=',expCfg.t_pi,'ns is <',(2*t_min),'ns. t_pi must be set to at least',(2*t_min),'ns.')
+			evLog.report('Error: requested pi pulse length=',expCfg.t_pi,'ns is <',(2*t_min),'ns. t_pi must be set to at least',(2*t_min),'ns.')
 			sys.exit()
 		if expCfg.t_pi%(2*t_min):
-			print('Warning: t_pi set to ', expCfg.t_pi,'ns, which is not an integer multiple of ',(2*t_min),'ns. Rounding t_pi to nearest multiple of ',(2*t_min),'ns...')
+			evLog.report('Warning: t_pi set to ', expCfg.t_pi,'ns, which is not an integer multiple of ',(2*t_min),'ns. Rounding t_pi to nearest multiple of ',(2*t_min),'ns...')
 			expCfg.t_pi = (2*t_min)*round(float(expCfg.t_pi)/(2*t_min))
-			print('t_pi now set to ', expCfg.t_pi,'ns')
+			evLog.report('t_pi now set to ', expCfg.t_pi,'ns')
 			
-	# Scan step-size checks:
-	stepSize = expCfg.scannedParam[1]-expCfg.scannedParam[0]
-	if (expCfg.sequence == 'ESRseq'):
-		#If requested frequency stepsize is smaller than the SRS frequency resolution (1uHz), round step to 1uHz:
-		if ((stepSize*1e6)%1):
-			roundedFreqStepSize = (1e-6)*round((1e6)*stepSize)
-			expCfg.scannedParam[-1] = (expCfg.N_scanPts-1)*roundedFreqStepSize + expCfg.scannedParam[0] 
-			print('Warning: Requested frequency step is ',stepSize,'Hz, which is not an integer multiple of the SRS frequency resolution, 1uHz. Rounding step size to the nearest multiple of 1uHz.\nStep size is now',roundedFreqStepSize,'\n',expCfg.scanStartName,'= ',expCfg.scannedParam[0],' and \n',expCfg.scanEndName,'= ',expCfg.scannedParam[-1])
-			expCfg.scannedParam = np.linspace(expCfg.scannedParam[0],expCfg.scannedParam[-1], expCfg.N_scanPts,endpoint= True)
-	if (expCfg.sequence in ['RabiSeq', 'T1seq']) or (expCfg.sequence == 'T2seq' and expCfg.numberOfPiPulses==1):
-		if stepSize<t_min:
-			print('Error: requested time step is ',stepSize,'ns, which is shorter than ',t_min,'ns. Please change N_scanPts, or ',expCfg.scanStartName,' and ',expCfg.scanEndName,' to increase time step size.')
+	if expCfg.sequence == 'T2seq':
+		if (not isinstance(expCfg.numberOfPiPulses, int)) or (expCfg.numberOfPiPulses<1):
+			evLog.report('Error: numberOfPiPulses must be a positive integer!')
 			sys.exit()
-		# If requested step size is >t_min but not a multiple of t_min:
-		if (stepSize%t_min):
-			roundedStepSize = t_min*round(stepSize/t_min)
-			expCfg.scannedParam[-1] = (expCfg.N_scanPts-1)*roundedStepSize + expCfg.scannedParam[0] 
-			print('Warning: requested time step is ',stepSize,'ns, which is not an integer multiple of ',t_min,'ns. Rounding step size to the nearest multiple of ',t_min,':\nStep size is now',roundedStepSize,'\n',expCfg.scanStartName,'= ',expCfg.scannedParam[0],' and \n',expCfg.scanEndName,'= ',expCfg.scannedParam[-1])
-			expCfg.scannedParam = np.linspace(expCfg.scannedParam[0],expCfg.scannedParam[-1], expCfg.N_scanPts,endpoint= True)
-			
+	
+	# Scan grid checks: every scan point is snapped to the grid of values which the pulse sequence can produce and checked against the shortest value the sequence allows (see scanGrid.py).
+	# In the T2, XY8 and correlation spectroscopy sequences, the spacing between the rising edge of a pi or pi/2 pulse and the rising edge of the subsequent pi or pi/2 pulse has to be an integer
+	# multiple of t_min. The user-input free precession time is defined as the time between the centres of subsequent pulses, so, for T2 and XY8 scans, the grid is offset such that
+	# the edge-to-edge time of every scan point is a multiple of t_min.
+	grid = scanGrid.snapScanGrid(expCfg.scannedParam,*scanGrid.gridRule(expCfg))
+	reportScanGridViolations(expCfg,grid)
+	expCfg.scannedParam = grid.values
+	
 	if expCfg.sequence =='RabiSeq':
 		# Pulseblaster bug - our PulseBlaster boards do not seem to be able to output 8ns pulses. So, check if we asked for 8ns and remove this point:
 		if 8 in expCfg.scannedParam:
 			expCfg.scannedParam = list(expCfg.scannedParam)
 			expCfg.scannedParam.remove(8)				
 			expCfg.N_scanPts = len(expCfg.scannedParam)
-			print('Warning: will not collect data at 8ns scan point due to unofficial reports of a possible issue with some PB boards whereby the instruction for outputting 8ns pulses generates 10ns pulses. Removing the 8ns scan point from the list of scan points.')	
-	
-	if (expCfg.sequence == 'XY8seq') or (expCfg.sequence=='T2seq' and expCfg.numberOfPiPulses > 1):
-		#Check if requested scan step is too short or not a multiple of 2*t_min:
-		if stepSize<(2*t_min):
-			print('Error: requested time step is ',stepSize,'ns, which is shorter than ', (2*t_min),'ns. Please change N_scanPts, or ',expCfg.scanStartName,' and ',expCfg.scanEndName,' to increase time step size.')
-			sys.exit()
-		# If requested step size is >2*t_min but not a multiple of t_min, round to nearest multiple of (2*t_min) and warn user:
-		if (stepSize%(2*t_min)):
-			roundedStepSize = (2*t_min)*round(stepSize/(2*t_min))
-			expCfg.scannedParam[-1] =  (expCfg.N_scanPts-1)*roundedStepSize + expCfg.scannedParam[0] 
-			print('Warning: requested time step is ',stepSize,'ns, which is not an integer multiple of ',(2*t_min),'ns. Rounding step size to the nearest multiple of ',(2*t_min),':\n Step size is now ',roundedStepSize,'\n ',expCfg.scanStartName,'= ',expCfg.scannedParam[0],' and \n',expCfg.scanEndName,'= ',expCfg.scannedParam[-1])
-			expCfg.scannedParam = np.linspace(expCfg.scannedParam[0],expCfg.scannedParam[-1], expCfg.N_scanPts,endpoint= True)
-	
-	# Scan-start (minimum delay duration) checks:
-	if (expCfg.sequence in ['RabiSeq', 'correlSpecSeq']) or (expCfg.sequence == 'T2seq' and expCfg.numberOfPiPulses==1):
-	# Check if requested start delay/pulse length is positive and a multiple of t_min:
-		if expCfg.scannedParam[0]<0:
-			print('Error: requested ',expCfg.scanStartName,' = ',expCfg.scannedParam[0],'is <0. ',expCfg.scanStartName,' must be >=0.')
-			sys.exit()
-		if expCfg.scannedParam[0]%t_min:
-			print('Error: ',expCfg.scanStartName,' is set to ', expCfg.scannedParam[0],', which is not a multiple of ',t_min,'ns. Please set', expCfg.scanStartName,' to an integer multiple of ',t_min,'ns.')
-			sys.exit()
-	
-	if (expCfg.sequence == 'XY8seq') or (expCfg.sequence=='T2seq' and expCfg.numberOfPiPulses > 1):
-	# Check if requested start delay/pulse length is a multiple of 2*t_min:
-		if expCfg.scannedParam[0]%(2*t_min):
-			print('Error: ',expCfg.scanStartName,' is set to ', expCfg.scannedParam[0],', which is not a multiple of ',(2*t_min),'ns. Please set', expCfg.scanStartName,' to an integer multiple of ',(2*t_min),'ns.')
-			sys.exit()
-		
-	if expCfg.sequence == 'T1seq':
-		if expCfg.scannedParam[0]<(expCfg.t_readoutDelay + t_min*round((1*us)/t_min)):
-			print('Error: requested ',expCfg.scanStartName,' is too short.', expCfg.scanStartName,' must be >=0.')
-			sys.exit()
-		if expCfg.scannedParam[0]%t_min:
-			print('Error: ',expCfg.scanStartName,' is set to ', expCfg.scannedParam[0],', which is not a multiple of ',t_min,'ns. Please set', expCfg.scanStartName,' to an integer multiple of',t_min,'ns.')
-			sys.exit()
-	
-	if expCfg.sequence in ['T2seq','XY8seq']:
-		# Check if requested start delay is shorter than 3*(5*t_min):
-		if expCfg.scannedParam[0]<3*(5*t_min):
-			print('Error: requested ',expCfg.scanStartName,' of ',expCfg.scannedParam[0],'ns is too short. For this pulse sequence, ',expCfg.scanStartName,' must be set to at least',3*(5*t_min),'ns')
-			sys.exit()
-	
-	if expCfg.sequence == 'T2seq':
-		if (not isinstance(expCfg.numberOfPiPulses, int)) or (expCfg.numberOfPiPulses<1):
-			print('Error: numberOfPiPulses must be a positive integer!')
-			sys.exit()
-		if expCfg.numberOfPiPulses == 1:
-			if expCfg.scannedParam[0]<(2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min)):
-				# Check if start delay is too short to allow for PB timing resolution:
-				print('Error: ',expCfg.scanStartName,' too short. For your pi_pulse length, ',expCfg.scanStartName,' must be at least', (2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min)),'ns.')
-				sys.exit()
-		else: #number of pi pulses>1
-			if expCfg.scannedParam[0]<(2*(2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min))):
-				print('Error: ',expCfg.scanStartName,' too short. For your pi_pulse length, ',expCfg.scanStartName,' must be at least', (2*(2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min))),'ns.')
-				sys.exit()
-				
-	if expCfg.sequence == 'XY8seq':
-		if expCfg.scannedParam[0]<(2*(2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min))):
-			print('Error: ',expCfg.scanStartName,' too short. For your pi_pulse length, ',expCfg.scanStartName,' must be at least', (2*(2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min))),'ns.')
-			sys.exit()
-		
-	# Free precession time checks. The spacing between the rising edge of a pi or pi/2 pulse and the rising edge of the subsequent pi
-	# or pi/2 pulse in the T2, XY8 and correlation spectroscopy sequences has to be an integer multiple of t_min. The user-input 
-	# free precession time is defined as the time between the center of subsequent pulses. Hence, for a given pi-pulse length, 
-	# we check that the user has selected a starting free precession time which produces an edge-to-edge time that is a multiple of t_min.
-	# If not, we shift the free precession time vector by t_min/2 and warn the user.
-	if (expCfg.sequence=='T2seq' and expCfg.numberOfPiPulses == 1):
-		if (expCfg.scannedParam[0]-(expCfg.t_pi/4))%t_min:
-			expCfg.scannedParam = [x+(t_min/2) for x in expCfg.scannedParam]
-			print('Warning: Each element of the scanned time vector has been shifted by ',t_min/2,'ns so that the rising-edge-to-rising-edge spacing between microwave pulses is a multiple of ',t_min,'ns.\
-\nDetails: The spacing between the rising edge of a pi or pi/2 pulse and the rising edge of the subsequent pi or pi/2 pulse in the T2 and XY8 sequences \
-has to be an integer multiple of ',t_min,'ns. The user-input free-precession time is defined as the time between the center of subsequent pulses.\
-Your pi pulse length,',expCfg.t_pi,'ns, produces an edge-to-edge time of', (expCfg.scannedParam[0]-(expCfg.t_pi/4)),'ns (at the start of the scan), which is not a multiple of ',t_min,'ns.\
-Hence, we shift the times by ',t_min/2,'ns.')	
-	if (expCfg.sequence =='XY8seq') or (expCfg.sequence=='T2seq' and expCfg.numberOfPiPulses > 1):
-		half_t_delay = expCfg.scannedParam[0]/2
-		if (half_t_delay-(expCfg.t_pi/4))%t_min:
-			expCfg.scannedParam = [x+(t_min/2) for x in expCfg.scannedParam]
-			print('Warning: Each element of the scanned time vector has been shifted by ',t_min/2,'ns so that the rising-edge-to-rising-edge spacing between microwave pulses is a multiple of ',t_min,'ns.\
-\nDetails: The spacing between the rising edge of a pi or pi/2 pulse and the rising edge of the subsequent pi or pi/2 pulse in the T2 and XY8 sequences \
-has to be an integer multiple of ',t_min,'ns. The user-input free-precession time is defined as the time between the center of subsequent pulses.\
-Your pi pulse length,',expCfg.t_pi,'ns, produces an edge-to-edge time of', (half_t_delay-(expCfg.t_pi/4)),'ns (at the start of the scan), which is not a multiple of ',t_min,'ns.\
-Hence, we shift the times by ',t_min/2,'ns.')
+			evLog.report('Warning: will not collect data at 8ns scan point due to unofficial reports of a possible issue with some PB boards whereby the instruction for outputting 8ns pulses generates 10ns pulses. Removing the 8ns scan point from the list of scan points.')	
+
 	if expCfg.sequence == 'correlSpecSeq':
 		half_t_delay = expCfg.tau0/2
 		if (half_t_delay-(expCfg.t_pi/4))%t_min:
 			expCfg.tau0 = expCfg.tau0 +(t_min/2)*ns
-			print('Warning: tau0 has been shifted by ',t_min/2,'ns so that the rising-edge-to-rising-edge spacing between microwave pulses is a multiple of ',t_min,'ns. tau0 is now set to', expCfg.tau0,'\
+			evLog.report('Warning: tau0 has been shifted by ',t_min/2,'ns so that the rising-edge-to-rising-edge spacing between microwave pulses is a multiple of ',t_min,'ns. tau0 is now set to', expCfg.tau0,'\
 \nDetails: The spacing between the rising edge of a pi or pi/2 pulse and the rising edge of the subsequent pi or pi/2 pulse in the XY8 sequence \
 has to be an integer multiple of ',t_min,'ns. The user-input tau0 is defined as the time between the center of subsequent pi pulses in the XY8 sequence.\
 For your pi pulse length,',expCfg.t_pi,'ns, your chose tau0 produces an edge-to-edge time of', half_t_delay-(expCfg.t_pi/4),'ns, which is not a multiple of ',t_min,'ns.\
 Hence, we shift the tau0 by ',t_min/2,'ns.')
 					
-def calculateContrast(contrastMode,signal,background):
+def reportScanGridViolations(expCfg,grid):
+# Reports the scan points which are not on the scan grid of the sequence (see scanGrid.snapScanGrid): points which were snapped to the grid are reported in a warning, and points
+# which are shorter than the sequence allows or which snap onto the same grid value as another point are reported in an error, which stops the experiment.
+	for severity in ['error','warning']:
+		violations = [violation for violation in grid.violations if violation[2]==severity]
+		if not violations:
+			continue
+		if severity == 'error':
+			evLog.report('Error:',len(violations),'of the',len(grid.values),'requested scan points are invalid for the',expCfg.sequence,'sequence. Please edit',expCfg.scanStartName,',',expCfg.scanEndName,'and N_scanPts:')
+		else:
+			evLog.report('Warning:',len(violations),'of the',len(grid.values),'requested scan points are not on the scan grid of the',expCfg.sequence,'sequence and have been snapped to it:')
+		for [i,value,severity,reason] in violations[0:maxReportedViolations]:
+			evLog.report('   scan point',i+1,'(',value,'):',reason)
+		if len(violations)>maxReportedViolations:
+			evLog.report('   ...and',len(violations)-maxReportedViolations,'more.')
+		if severity == 'error':
+			sys.exit()
+		evLog.report(expCfg.scanStartName,'is now',grid.values[0],'and',expCfg.scanEndName,'is now',grid.values[-1])
+
+def calculateContrast(contrastMode,signal,background,signalReference=None,backgroundReference=None):
 # Calculates contrast based on the user's chosen contrast mode (configured in the experiment config file e.g. ESRconfig, Rabiconfig, etc)
+# If reference-channel readings (DAQ_RefInput in connectionConfig.py) are given, the signal and background are first divided element-wise by the reference readings taken at the same time, so that laser-intensity noise is normalized out.
+	if signalReference is not None:
+		signal = np.divide(signal,signalReference)
+		background = np.divide(background,backgroundReference)
 	if contrastMode =='ratio_SignalOverReference':
 		contrast = np.divide(signal,background)
 	elif contrastMode =='ratio_DifferenceOverSum':
-		contrast = np.divide(np.subtract(signal,background),np.add(signal,background))
+		contrast = np.divide(np.subtract(signal,background,dtype=np.float64),np.add(signal,background,dtype=np.float64)) #float64, so that photon counts (uint32) do not wrap around when subtracted
 	elif contrastMode == 'signalOnly':
 		contrast = signal
 	else:
-		print('Error: Unrecognised contrast mode. Valid contrast modes are: \'ratio_SignalOverReference\',\'ratio_DifferenceOverSum\' or \'signalOnly\'. Please edit contrastMode variable in config script to match a valid contrast mode.')
+		evLog.report('Error: Unrecognised contrast mode. Valid contrast modes are: \'ratio_SignalOverReference\',\'ratio_DifferenceOverSum\' or \'signalOnly\'. Please edit contrastMode variable in config script to match a valid contrast mode.')
 		sys.exit()
 	return contrast
 	
-def runExperiment(expConfigFile):
+def importPyplot(headless=False):
+# Imports matplotlib.pyplot on first use. In headless mode, the non-interactive Agg backend is selected, so that no plot windows are opened and plots are only rendered to files.
+	import matplotlib
+	if headless:
+		matplotlib.use('Agg')
+	import matplotlib.pyplot as plt
+	return plt
+
+def measureScanPoint(DAQtask,expCfg,samplePeriod=None,Npoints=None,rawShots=None):
+# Reads 2*Nsamples samples from the DAQ at the current scan point and returns [mean signal, mean background, contrast].
+# If rawShots (an array of at least 2*Npoints*Nsamples values) is given, the raw readings of the (first) DAQ input are also copied into it.
+# If Npoints is given (multiplexed sequences, see sequenceControl.makeMultiplexedT1Seq), each sequence repetition gives a signal and a background sample for each of Npoints scan points in turn: 2*Npoints*Nsamples samples are then read and demultiplexed, and [mean signal, mean background, contrast] are returned as arrays of Npoints values.
+# The samples are read in chunks of at most DAQ_ChunkSize samples (see connectionConfig.py) into a reused buffer, and are folded into running sums as they arrive, so that memory use does not depend on Nsamples.
+# If expCfg.DAQtimeout is 'auto' and samplePeriod (the time between DAQ samples in ns, see sequenceControl.DAQsamplePeriod) is given, each chunk read times out after twice its expected acquisition time plus DAQchunkTimeoutMargin, so that a hang (e.g. miswiring) is detected quickly. Otherwise, each chunk read times out after expCfg.DAQtimeout (or defaultDAQtimeout).
+	import DAQcontrol as DAQctl
+	K = 1 if Npoints is None else Npoints
+	NsampsTotal = 2*K*expCfg.Nsamples
+	chunkSize = min(NsampsTotal,2*K*max(1,conCfg.DAQ_ChunkSize//(2*K))) #a whole number of sequence repetitions, so that each chunk starts with the signal sample of the first scan point
+	counterMode = (conCfg.DAQ_AcquisitionMode == 'counter')
+	useReference = (conCfg.DAQ_RefInput is not None) and not counterMode
+	# Running sums of signal, background, signal reference, background reference and shot-by-shot contrast:
+	[sumSignal,sumBackground,sumSignalRef,sumBackgroundRef,sumContrast] = [np.zeros(K) for i in range(0,5)]
+	buffer = None
+	previousCount = None
+	DAQctl.startDAQ(DAQtask)
+	try:
+		NsampsRead = 0
+		while NsampsRead < NsampsTotal:
+			N = min(chunkSize,NsampsTotal-NsampsRead)
+			if expCfg.DAQtimeout != 'auto':
+				timeout = expCfg.DAQtimeout
+			elif samplePeriod is None:
+				timeout = defaultDAQtimeout
+			else:
+				timeout = 2*N*samplePeriod*1e-9 + DAQchunkTimeoutMargin
+			if counterMode:
+				#Photon counts in each gate, as a uint32 array:
+				if (buffer is None) or (buffer.shape[0] != N):
+					buffer = np.zeros(N,dtype=np.uint32)
+				cts = DAQctl.readDAQcounts(DAQtask,N,timeout,buffer,previousCount)[np.newaxis,:]
+				previousCount = buffer[N-1]
+			else:
+				#Read the APD (and reference) channels into a (channels, samples) array:
+				if (buffer is None) or (buffer.shape[1] != N):
+					buffer = np.zeros((2 if useReference else 1,N))
+				cts = DAQctl.readDAQchannels(DAQtask,N,timeout,buffer)
+			if rawShots is not None:
+				rawShots[NsampsRead:NsampsRead+N] = cts[0]
+			NsampsRead += N
+			
+			#Extract signal and background counts, as (repetitions, scan points) arrays
+			[sig,bkgnd] = [cts[0,0::2].reshape(-1,K),cts[0,1::2].reshape(-1,K)]
+			sumSignal += np.sum(sig,axis=0,dtype=np.float64)
+			sumBackground += np.sum(bkgnd,axis=0,dtype=np.float64)
+			if useReference:
+				[sigRef,bkgndRef] = [cts[1,0::2].reshape(-1,K),cts[1,1::2].reshape(-1,K)]
+				sumSignalRef += np.sum(sigRef,axis=0)
+				sumBackgroundRef += np.sum(bkgndRef,axis=0)
+			else:
+				sigRef = bkgndRef = None
+			if expCfg.shotByShotNormalization:
+				sumContrast += np.sum(calculateContrast(expCfg.contrastMode,sig,bkgnd,sigRef,bkgndRef),axis=0)
+	finally:
+		DAQctl.stopDAQ(DAQtask)
+	
+	#Take average of counts
+	meanSignal = sumSignal/expCfg.Nsamples
+	meanBackground = sumBackground/expCfg.Nsamples
+	if expCfg.shotByShotNormalization:
+		contrast = sumContrast/expCfg.Nsamples
+	elif useReference:
+		contrast = calculateContrast(expCfg.contrastMode,meanSignal,meanBackground,sumSignalRef/expCfg.Nsamples,sumBackgroundRef/expCfg.Nsamples)
+	else:
+		contrast = calculateContrast(expCfg.contrastMode,meanSignal,meanBackground)
+	if Npoints is None:
+		return [meanSignal[0],meanBackground[0],contrast[0]]
+	return [meanSignal,meanBackground,contrast]
+	
+def estimatePointDurations(expCfg,plan):
+# Returns the expected duration (in s) of each scan point, in the order of expCfg.scannedParam, from the compiled pulse sequences of the scan plan (see scanPlan.py):
+# the exact acquisition time of its 2*Nsamples DAQ samples, given by the sequence period, plus the time taken to reprogram the PulseBlaster (or, for ESR, to change the SRS frequency).
+# In multiplexed T1 experiments, the PulseBlaster is reprogrammed once per multiplexFactor scan points.
+	if expCfg.sequence == 'ESRseq':
+		overhead = SRSfrequencySwitchTime
+	else:
+		overhead = PBreprogramTime/(expCfg.multiplexFactor or 1)
+	return [acquisitionTime + overhead for acquisitionTime in plan.acquisitionTimes()]
+
+def formatDuration(seconds):
+	[minutes,seconds] = divmod(int(round(seconds)),60)
+	[hours,minutes] = divmod(minutes,60)
+	return '%dh%02dm%02ds' % (hours,minutes,seconds)
+
+def runExperiment(expConfigFile, interactive=True, headless=False):
 # This function runs the experiment with input parameters configured by the user in the experiment config file (e.g. ESRconfig, Rabiconfig, etc) and plots and saves the data.
+# expConfigFile can be the name of a config module (e.g. 'XY8config'), the path to a JSON/YAML config file or a configControl.ExpConfig.
+# If interactive is False, the function does not wait for plot windows to be closed (e.g. when experiments are chained by calibrationPipeline.py).
+# If headless is True, no plot windows are opened: the pulse sequence plot (if plotPulseSequence is set) and the final data plot are saved as .png files next to the data file instead.
+# Returns [scannedParam, signal, background, contrast], sorted by scan parameter and averaged over all runs.
+	interactive = interactive and not headless
 	try:
 		'''Runs the experiment.'''
-		expCfg = import_module(expConfigFile)
-		expCfg.N_scanPts = len(expCfg.scannedParam) #protection against non-integer user inputs for N_scanPts.
-		validateUserInput(expCfg)
+		import SRScontrol as SRSctl
+		import DAQcontrol as DAQctl
+		import PBcontrol as PBctl
+		import sequenceControl as seqCtl
+		import dataCatalog
+		import spectrumControl as specCtl
+		import fitControl as fitCtl
+		import sharedData as shData
+		import scanPlan
+		# Work on a private copy of the config, so that changes made during this run (e.g. rounding by validateUserInput, shuffling of scan points) do not affect later runs:
+		expCfg = cfgCtl.loadConfig(expConfigFile).makeRunConfig() #makeRunConfig also sets N_scanPts = len(scannedParam), as protection against non-integer user inputs for N_scanPts.
 		#Check if save directory exists, and, if not, creates a "Saved Data" folder in the current directory, where all data will be saved.
-		if not (isdir(expCfg.savePath)):
+		savePathCreated = not isdir(expCfg.savePath)
+		if savePathCreated:
 			 makedirs(expCfg.savePath)
-			 print('Warning: Save directory did not exist, creating folder named Saved_Data in the working directory. Data will be saved to this directory.')
+		#Record the events of this run (scan points, instrument calls, warnings and errors) in an _EVENTS.jsonl file next to the data file (see eventLog.py):
+		evLog.activeLog = evLog.EventLog(expCfg.dataFileName[:-len('.txt')]+'_EVENTS.jsonl')
+		if savePathCreated:
+			 evLog.report('Warning: Save directory did not exist, creating folder named Saved_Data in the working directory. Data will be saved to this directory.')
+		validateUserInput(expCfg)
+		fullScannedParam = np.array(expCfg.scannedParam)
+		if expCfg.samplingMode in ['sparse','log']:
+			#Only measure a subset of the scan points (see samplingControl.py). fullScannedParam keeps the uniform scan grid, on which sparse spectroscopy data is reconstructed:
+			expCfg.scannedParam = sampCtl.selectScanPoints(expCfg,t_min)
+			expCfg.N_scanPts = len(expCfg.scannedParam)
+		
+		#Compile the pulse sequences of all scan points before acquisition starts (see scanPlan.py), and estimate the duration of each scan point from its compiled sequence:
+		plan = scanPlan.compileScanPlan(expCfg)
+		pointDurations = estimatePointDurations(expCfg,plan)
+		expectedPointDuration = dict(zip(expCfg.scannedParam,pointDurations))
+		expectedRunDuration = sum(pointDurations)
+		print('Estimated experiment duration:',formatDuration(expCfg.Navg*expectedRunDuration),'(',formatDuration(expectedRunDuration),'per run)')
+		evLog.log('experimentStart',sequence=expCfg.sequence,N_scanPts=expCfg.N_scanPts,Navg=expCfg.Navg,Nsamples=expCfg.Nsamples,dataFileName=expCfg.dataFileName,expectedDuration=expCfg.Navg*expectedRunDuration)
 		
 		#Initialise SRS and program PulseBlaster
 		SRS = SRSctl.initSRS(conCfg.GPIBaddr,conCfg.modelName)
@@ -259,24 +361,37 @@ def runExperiment(expConfigFile):
 		SRSctl.setupSRSmodulation(SRS,expCfg.sequence)
 		sequenceArgs = expCfg.updateSequenceArgs()
 		expParamList = expCfg.updateExpParamList()
-		if expCfg.sequence is not 'ESRseq':
+		if expCfg.longestPointFirst:
+			#Measure the scan points in order of decreasing duration in the first run (after expParamList, which records the scan start and end, has been made):
+			expCfg.scannedParam = np.array([scanValue for [pointDuration,scanValue] in sorted(zip(pointDurations,expCfg.scannedParam),reverse=True)])
+		if expCfg.sequence != 'ESRseq':
 			SRSctl.setSRS_Freq(SRS, expCfg.microwaveFrequency)
 			#Program PB
 			seqArgList = [expCfg.scannedParam[-1]]
 			seqArgList.extend(sequenceArgs)
-			instructionArray=PBctl.programPB(expCfg.sequence,seqArgList)
+			instructionArray=PBctl.uploadSequence(plan.instructionArray(expCfg.scannedParam[-1]))
 		else:
 			SRSctl.setSRS_Freq(SRS, expCfg.scannedParam[0])
 			#Program PB
-			instructionArray=PBctl.programPB(expCfg.sequence,sequenceArgs)
+			instructionArray=PBctl.uploadSequence(plan.instructionArray(expCfg.scannedParam[0]))
 		SRSctl.enableSRS_RFOutput(SRS)
 					
-		#Configure DAQ
+		#Configure DAQ (in multiplexed T1 experiments, each DAQ read covers multiplexFactor scan points)
+		multiplexFactor = expCfg.multiplexFactor or 1
 		DAQclosed = False
-		DAQtask = DAQctl.configureDAQ(expCfg.Nsamples)
+		DAQtask = DAQctl.configureDAQ(multiplexFactor*expCfg.Nsamples)
+		DAQtaskNpoints = multiplexFactor
+		
+		#Start publishing live data to subscribers (see dataPublisher.py), if enabled in connectionConfig.py:
+		if conCfg.dataPublishPort is not None:
+			import dataPublisher
+			publisher = dataPublisher.DataPublisher(conCfg.dataPublishPort)
+		else:
+			publisher = None
 			
 		if expCfg.plotPulseSequence:
 		# Plot sequence
+			plt = importPyplot(headless)
 			plt.figure(0)
 			[t_us,channelPulses,yTicks]=seqCtl.plotSequence(instructionArray,expCfg.PBchannels)
 			for channel in channelPulses:
@@ -289,47 +404,94 @@ def runExperiment(expConfigFile):
 					plt.title('Pulse Sequence plot (at last scan point). Close to proceed with experiment...\n(note: we plot the instructions sent to the PulseBlaster (PB) for each channel. For microwave pulses<',5*t_min,'ns, the microwave\nchannel (PB_MW) is instructed to pulse for',5*t_min,'ns, but the short-pulse flags of the PB are pulsed simultaneously (not shown) to\nproduce the desired output pulse length at PB_MW. This can be verified on an oscilloscope.)', fontsize=7)
 				else:
 					plt.title('Pulse Sequence plot (at last scan point)\n close to proceed with experiment...')
-			plt.show()
+			if headless:
+				plt.savefig(expCfg.dataFileName[:-len('.txt')]+'_SEQUENCE.png')
+				plt.close(0)
+			elif interactive:
+				plt.show()
 		
-		#Initialize data arrays
-		meanSignalCurrentRun = np.zeros(expCfg.N_scanPts)
-		meanBackgroundCurrentRun = np.zeros(expCfg.N_scanPts)
-		contrastCurrentRun = np.zeros(expCfg.N_scanPts)
-		signal = np.zeros([expCfg.N_scanPts,expCfg.Navg])
-		background = np.zeros([expCfg.N_scanPts,expCfg.Navg])
-		contrast = np.zeros([expCfg.N_scanPts,expCfg.Navg])
+		#Initialize data arrays, in shared memory if a shared memory block is configured in connectionConfig.py (see sharedData.py), so that other processes can read them while the experiment runs:
+		rawLength = 2*multiplexFactor*expCfg.Nsamples if conCfg.shareRawShots else 0
+		if conCfg.sharedMemoryName is not None:
+			dataPlane = shData.DataPlane.create(conCfg.sharedMemoryName,expCfg.N_scanPts,expCfg.Navg,rawLength)
+			dataArrays = dataPlane.arrays
+		else:
+			dataPlane = None
+			dataArrays = shData.allocateArrays(expCfg.N_scanPts,expCfg.Navg,rawLength)
+		[scanOrder,meanSignalCurrentRun,meanBackgroundCurrentRun,contrastCurrentRun] = [dataArrays[name] for name in ['scanOrder','signalCurrentRun','backgroundCurrentRun','contrastCurrentRun']]
+		[signal,background,contrast] = [dataArrays[name] for name in ['signal','background','contrast']]
+		rawShots = dataArrays['rawShots'] if rawLength else None
+		#The raw readings are read into a private buffer, and copied into the (shared) rawShots array together with the rawScanPoint and rawCount header update, so that a reader never sees the readings of two scan points mixed:
+		rawShotBuffer = np.zeros(rawLength) if rawLength else None
 
 		#Run experiment
+		spectrum = None
+		stopAveraging = False
+		experimentStartTime = time.perf_counter()
+		expectedElapsedTime = 0
+		remainingTimeString = ''
+		progress = evLog.ProgressDisplay()
 		for i_run in range (0,expCfg.Navg):
-			print('Run ',i_run+1,' of ',expCfg.Navg)
+			evLog.log('runStart',i_run=i_run)
+			runStartTime = time.perf_counter()
 			if expCfg.randomize:
 				if i_run>0:
 					shuffle(expCfg.scannedParam)
+			with shData.writing(dataPlane,i_run=i_run,i_scanPoint=-1):
+				scanOrder[:] = expCfg.scannedParam
+			if multiplexFactor>1:
+				#The groups of multiplexFactor consecutive scan points change from run to run (if the scan points are shuffled), so the group sequences are compiled at the start of each run, with the scan plan compiler (see scanPlan.compileSequences: sequences already in the sequence cache are loaded from it, the others are compiled in parallel):
+				groupDelaysList = [list(expCfg.scannedParam[i:i+multiplexFactor]) for i in range(0,expCfg.N_scanPts,multiplexFactor)]
+				groupSequences = scanPlan.compileSequences('T1multiplexSeq',[[groupDelays]+sequenceArgs for groupDelays in groupDelaysList])
 			for i_scanPoint in range (0, expCfg.N_scanPts):
+				pointStartTime = time.perf_counter()
+				evLog.log('pointStart',i_run=i_run,i_scanPoint=i_scanPoint,scanValue=expCfg.scannedParam[i_scanPoint])
 				#setup next scan iteration (e.g. for ESR experiment, change microwave frequency; for T2 experiment, reprogram pulseblaster with new delay)
 				if expCfg.sequence == 'ESRseq':
 					SRSctl.setSRS_Freq(SRS, expCfg.scannedParam[i_scanPoint])
+					evLog.log('instrument',call='setSRS_Freq',duration=time.perf_counter()-pointStartTime)
+				elif multiplexFactor>1:
+					if i_scanPoint%multiplexFactor == 0:
+						#Program the delays of the next multiplexFactor scan points into a single sequence (see sequenceControl.makeMultiplexedT1Seq) and measure them together:
+						groupDelays = groupDelaysList[i_scanPoint//multiplexFactor]
+						instructionArray= PBctl.uploadSequence(groupSequences[i_scanPoint//multiplexFactor])
+						evLog.log('instrument',call='uploadSequence',duration=time.perf_counter()-pointStartTime)
+						if len(groupDelays) != DAQtaskNpoints:
+							#The last group is shorter if N_scanPts is not a multiple of multiplexFactor:
+							DAQctl.closeDAQTask(DAQtask)
+							DAQtask = DAQctl.configureDAQ(len(groupDelays)*expCfg.Nsamples)
+							DAQtaskNpoints = len(groupDelays)
+						DAQstartTime = time.perf_counter()
+						groupData = measureScanPoint(DAQtask,expCfg,seqCtl.DAQsamplePeriod(instructionArray),len(groupDelays),rawShotBuffer)
+						evLog.log('instrument',call='readDAQ',duration=time.perf_counter()-DAQstartTime,Npoints=len(groupDelays))
 				else:
 					seqArgList[0] = expCfg.scannedParam[i_scanPoint]
-					instructionArray= PBctl.programPB(expCfg.sequence,seqArgList)
-				print('Scan point ',i_scanPoint+1,' of ',expCfg.N_scanPts)
+					instructionArray= PBctl.uploadSequence(plan.instructionArray(seqArgList[0]))
+					evLog.log('instrument',call='uploadSequence',duration=time.perf_counter()-pointStartTime)
+				progress.update(i_scanPoint+1,expCfg.N_scanPts,remainingTimeString,i_run+1,expCfg.Navg)
 				
-				#read DAQ
-				cts=DAQctl.readDAQ(DAQtask,2*expCfg.Nsamples,expCfg.DAQtimeout)
-		
-				#Extract signal and background counts
-				sig = cts[0::2]
-				bkgnd = cts[1::2]
-							
-				#Take average of counts
-				meanSignalCurrentRun[i_scanPoint] = np.mean(sig)
-				meanBackgroundCurrentRun[i_scanPoint] = np.mean(bkgnd)
-				if expCfg.shotByShotNormalization:
-					contrastCurrentRun[i_scanPoint] = np.mean(calculateContrast(expCfg.contrastMode,sig,bkgnd))
+				#read DAQ and take average of counts
+				if multiplexFactor>1:
+					pointValues = [values[i_scanPoint%multiplexFactor] for values in groupData]
 				else:
-					contrastCurrentRun[i_scanPoint] = calculateContrast(expCfg.contrastMode,meanSignalCurrentRun[i_scanPoint],meanBackgroundCurrentRun[i_scanPoint])
+					DAQstartTime = time.perf_counter()
+					pointValues = measureScanPoint(DAQtask,expCfg,plan.samplePeriod(expCfg.scannedParam[i_scanPoint]),rawShots=rawShotBuffer)
+					evLog.log('instrument',call='readDAQ',duration=time.perf_counter()-DAQstartTime)
+				rawHeader = {'rawScanPoint':i_scanPoint-i_scanPoint%multiplexFactor,'rawCount':2*DAQtaskNpoints*expCfg.Nsamples} if rawShots is not None else {}
+				with shData.writing(dataPlane,i_scanPoint=i_scanPoint,**rawHeader):
+					[meanSignalCurrentRun[i_scanPoint],meanBackgroundCurrentRun[i_scanPoint],contrastCurrentRun[i_scanPoint]] = pointValues
+					if rawShots is not None:
+						rawShots[:] = rawShotBuffer
+				evLog.log('pointEnd',i_run=i_run,i_scanPoint=i_scanPoint,signal=meanSignalCurrentRun[i_scanPoint],background=meanBackgroundCurrentRun[i_scanPoint],contrast=contrastCurrentRun[i_scanPoint])
+				#Update the estimate of the remaining time, scaling the expected duration of the remaining scan points by the ratio of the actual to expected time so far:
+				expectedElapsedTime += expectedPointDuration[expCfg.scannedParam[i_scanPoint]]
+				remainingTime = (expCfg.Navg*expectedRunDuration-expectedElapsedTime)*(time.perf_counter()-experimentStartTime)/expectedElapsedTime
+				remainingTimeString = '(remaining time: ~'+formatDuration(remainingTime)+')'
+				if publisher:
+					publisher.publishPoint(i_run,i_scanPoint,expCfg.N_scanPts,expCfg.scannedParam[i_scanPoint],meanSignalCurrentRun[i_scanPoint],meanBackgroundCurrentRun[i_scanPoint],contrastCurrentRun[i_scanPoint],time.perf_counter()-pointStartTime)
 				if i_run==0:
-					if expCfg.livePlotUpdate:
+					if expCfg.livePlotUpdate and not headless:
+						plt = importPyplot()
 						xValues=expCfg.scannedParam[0:i_scanPoint+1]
 						plt.plot([x/expCfg.plotXaxisUnits for x in xValues],contrastCurrentRun[0:i_scanPoint+1], 'b-')
 						plt.ylabel('Contrast')
@@ -351,6 +513,7 @@ def runExperiment(expConfigFile):
 						paramFile.write(expCfg.formattingSaveString % tuple(expParamList))
 						dataFile.close()
 						paramFile.close()
+						dataCatalog.recordSave(expCfg.dataFileName,expCfg.Navg,0,False)
 					
 			#Sort current run counts in order of increasing delay
 			dataCurrentRun = np.transpose(np.array([expCfg.scannedParam,meanSignalCurrentRun,meanBackgroundCurrentRun,contrastCurrentRun]))
@@ -358,26 +521,68 @@ def runExperiment(expConfigFile):
 			dataCurrentRun = dataCurrentRun[sortingIndices]
 			#Fill in current run data:
 			sortedScanParam = dataCurrentRun[:,0]
-			signal[:,i_run] = dataCurrentRun[:,1]
-			background[:,i_run] = dataCurrentRun[:,2]
-			contrast[:,i_run] = dataCurrentRun[:,3]
+			with shData.writing(dataPlane,runsCompleted=i_run+1):
+				dataArrays['scannedParam'][:] = sortedScanParam
+				signal[:,i_run] = dataCurrentRun[:,1]
+				background[:,i_run] = dataCurrentRun[:,2]
+				contrast[:,i_run] = dataCurrentRun[:,3]
 			
 			#Update quantities for plotting
 			updatedSignal = np.mean(signal[:,0:i_run+1],1)
 			updatedBackground = np.mean(background[:,0:i_run+1],1)
 			updatedContrast = np.mean(contrast[:,0:i_run+1],1)
+			if publisher:
+				publisher.publishRun(i_run,sortedScanParam,updatedSignal,updatedBackground,updatedContrast,time.perf_counter()-runStartTime)
+			
+			if expCfg.sequence == 'correlSpecSeq':
+				#Update the spectrum of the averaged contrast (see spectrumControl.py) and report its peaks. With sparse sampling, the contrast of the run is first reconstructed on the full scan grid:
+				if expCfg.samplingMode == 'sparse':
+					if spectrum is None:
+						spectrum = specCtl.StreamingSpectrum(fullScannedParam)
+					spectrum.addRun(sampCtl.reconstructSparse(fullScannedParam,sortedScanParam,contrast[:,i_run]))
+				else:
+					if spectrum is None:
+						spectrum = specCtl.StreamingSpectrum(sortedScanParam)
+					spectrum.addRun(contrast[:,i_run])
+				peaks = spectrum.peaks()
+				print('Spectrum peaks after',i_run+1,'run(s):',', '.join('%.1f kHz (SNR %.1f)' % (frequency*1e-3,SNR) for [frequency,amplitude,SNR] in peaks))
+				#With sparse sampling, the reconstruction of a single run is denoised, so that the noise level of the spectrum after the first run (its median amplitude, see spectrumControl.StreamingSpectrum.noiseLevel) is far too low: averaging is only stopped once the noise level can be estimated from the scatter of two or more runs.
+				SNRknown = (expCfg.samplingMode != 'sparse') or (spectrum.Nruns>=2)
+				if (expCfg.spectrumStopSNR is not None) and SNRknown and peaks and (peaks[0][2]>=expCfg.spectrumStopSNR):
+					print('The largest spectral peak has reached SNR',round(peaks[0][2],1),'>= spectrumStopSNR. Stopping averaging after',i_run+1,'run(s).')
+					stopAveraging = True
+				if not headless:
+					plt = importPyplot()
+					dataFigure = plt.gcf()
+					plt.figure(2)
+					plt.clf()
+					plt.plot(spectrum.frequencies*1e-3,spectrum.amplitude(),'r-')
+					plt.xlabel('Frequency (kHz)')
+					plt.ylabel('FFT amplitude')
+					plt.draw()
+					plt.pause(0.001)
+					plt.figure(dataFigure.number)
+			if expCfg.samplingMode == 'log':
+				#Fit the decay directly on the log-spaced delays (a failed fit, e.g. if fewer than minFitPoints distinct delays are left after rounding, does not stop the experiment):
+				try:
+					[amplitude,decayTime,stretch,offset] = fitCtl.fitStretchedExponential(sortedScanParam,updatedContrast)
+					print('Fitted decay after',i_run+1,'run(s): T1 = %.4g us (stretch %.2f)' % (decayTime/us,stretch))
+				except Exception as excpt:
+					evLog.report('Warning: could not fit the decay after',i_run+1,'run(s). Exception details:', type(excpt).__name__,'.',excpt)
 			
 			#Update plot:
-			if expCfg.livePlotUpdate: 
-				plt.clf()
-			plt.plot([x/expCfg.plotXaxisUnits for x in sortedScanParam] ,updatedContrast,'b-')
-			plt.ylabel('Contrast')
-			plt.xlabel(expCfg.xAxisLabel)
-			plt.draw()
-			plt.pause(0.001)
+			if not headless:
+				plt = importPyplot()
+				if expCfg.livePlotUpdate: 
+					plt.clf()
+				plt.plot([x/expCfg.plotXaxisUnits for x in sortedScanParam] ,updatedContrast,'b-')
+				plt.ylabel('Contrast')
+				plt.xlabel(expCfg.xAxisLabel)
+				plt.draw()
+				plt.pause(0.001)
 			
 			# Save data at intervals dictated by saveSpacing_inAverages and after final scan
-			if (i_run%expCfg.saveSpacing_inAverages == 0) or (i_run==expCfg.Navg-1):
+			if (i_run%expCfg.saveSpacing_inAverages == 0) or (i_run==expCfg.Navg-1) or stopAveraging:
 				data = np.zeros([expCfg.N_scanPts,3])
 				data[:,0] = sortedScanParam
 				data[:,1] = updatedSignal
@@ -390,6 +595,13 @@ def runExperiment(expConfigFile):
 				paramFile.write(expCfg.formattingSaveString % tuple(expParamList))
 				dataFile.close()
 				paramFile.close()
+				if spectrum is not None:
+					spectrum.save(expCfg.dataFileName[:-len('.txt')]+'_SPECTRUM.txt')
+				dataCatalog.recordSave(expCfg.dataFileName,expCfg.Navg,i_run+1,(i_run==expCfg.Navg-1) or stopAveraging)
+			evLog.log('runEnd',i_run=i_run,duration=time.perf_counter()-runStartTime)
+			if stopAveraging:
+				break
+		evLog.log('experimentEnd',duration=time.perf_counter()-experimentStartTime,runsCompleted=i_run+1)
 		
 		#Turn off SRS output
 		SRSctl.disableSRS_RFOutput(SRS)
@@ -397,10 +609,25 @@ def runExperiment(expConfigFile):
 		#Close DAQ task:
 		DAQctl.closeDAQTask(DAQtask)
 		DAQclosed=True
-		plt.show()
+		if headless:
+			#Render the final data plot to a file:
+			plt = importPyplot(headless)
+			plt.figure(1)
+			plt.plot([x/expCfg.plotXaxisUnits for x in sortedScanParam] ,updatedContrast,'b-')
+			plt.ylabel('Contrast')
+			plt.xlabel(expCfg.xAxisLabel)
+			plt.savefig(expCfg.dataFileName[:-len('.txt')]+'_PLOT.png')
+			plt.close(1)
+		elif interactive:
+			plt.show()
+		return [sortedScanParam, updatedSignal, updatedBackground, updatedContrast]
 	except	KeyboardInterrupt:
 		print('User keyboard interrupt. Quitting...')
+		evLog.log('interrupted')
 		sys.exit()
+	except Exception as excpt:
+		evLog.log('error',text=type(excpt).__name__+': '+str(excpt))
+		raise
 	finally:
 		if 'SRS' in vars():	
 			#Turn off SRS output
@@ -409,11 +636,23 @@ def runExperiment(expConfigFile):
 			#Close DAQ task:
 			DAQctl.closeDAQTask(DAQtask)
 			DAQclosed=True
+		if ('publisher' in vars()) and publisher:
+			publisher.close()
+		if ('dataPlane' in vars()) and dataPlane:
+			dataPlane.close()
+		if evLog.activeLog is not None:
+			evLog.activeLog.close()
+			evLog.activeLog = None
 	
 if __name__ == "__main__":
+	# With the --headless option, no plot windows are opened and plots are saved to files instead (e.g. for batch runs):
+	headless = '--headless' in sys.argv[2:]
 	if len(sys.argv)>1 and (sys.argv[1] in ['ESRconfig','Rabiconfig','T1config','T2config','XY8config','correlSpecconfig']):
-		expConfigFile=sys.argv[1]
+		runExperiment(sys.argv[1],headless=headless)
+	elif len(sys.argv)>1 and cfgCtl.isConfigFilePath(sys.argv[1]):
+		# Run each of the configs in the JSON/YAML file in turn:
+		for expCfg in cfgCtl.fromFile(sys.argv[1]):
+			runExperiment(expCfg,headless=headless)
 	else:
-		print('Usage: python mainControl.py <ESRconfig|Rabiconfig|T1config|T2config|XY8config|correlSpecconfig>')
-		sys.exit()
-	runExperiment(expConfigFile)
\ No newline at end of file
+		print('Usage: python mainControl.py <ESRconfig|Rabiconfig|T1config|T2config|XY8config|correlSpecconfig|path to .json/.yaml config file> [--headless]')
+		sys.exit()
\ No newline at end of file
@@ -26,6 +26,9 @@ Optmize Readout Delay script
 
 This script can be used to find the optimum delay between the start of the AOM pulse and the start of the DAQ pulse (see step 54 of the protocol). The script plots fluorescence emitted by an NV diamond sample as a function of the scanned delay, and saves the data as a tabulated text file (see below for saving options). 
 
+-- Search mode --
+If searchMode is set to True, the script finds the optimum delay automatically, instead of leaving the user to pick it from a uniform sweep. It first measures a coarse sweep of N_scanPts delays from startDelay to endDelay. The optimum delay is taken to be the rising edge of the fluorescence transient, i.e. the shortest delay at which the fluorescence has risen by a fraction edgeFraction of the way from its level at startDelay to its maximum. The script then repeatedly measures N_refinePts delays (on the t_min grid) between the last coarse/refined delay below this level and the first one above it, until these are no more than searchPrecision apart. If saveCalibration is also set to True, the optimum delay is saved in the calibration store (see calibrationStore.py), from which it is read by the pulsed experiment config files (Rabiconfig.py, T1config.py, T2config.py, XY8config.py and correlSpecconfig.py): the previously stored and the new values are printed. Otherwise, the calibration store is left unchanged.
+
 To run this script:
  1) Edit connectionConfig.py to define the PulseBlaster and DAQ channel connections being used in your setup.
  2) Edit the user inputs section below.
@@ -39,6 +42,12 @@ To run this script:
  *t_AOM: duration of AOM pulse, in ns.
  *Nsamples: number of fluorescence measurement samples to take at each delay point.
  *DAQtimeout: amount of time (in seconds) for which the DAQ will wait for the requested number of samples to become available (ie. to be acquired)
+ *singleShot: if set to True, the whole delay sweep is acquired in one go: the PulseBlaster is programmed once with a sequence which steps through all the delays (one AOM pulse and one DAQ sample-clock pulse per delay), all the samples are read from the DAQ in a single read and are then sorted by delay. This takes seconds instead of the minutes needed to reprogram the PulseBlaster and read the DAQ separately at each delay point (singleShot = False).
+ *searchMode: if set to True, the optimum delay is found automatically (see above). If set to False, a uniform sweep is measured and the optimum delay should be read from the plot.
+ *saveCalibration: (search mode only) if set to True, the optimum delay is saved in the calibration store, and is then used as t_readoutDelay by all the pulsed experiment config files (see above).
+ *edgeFraction: (search mode only) fraction of the rise of the fluorescence transient at which the optimum delay is taken.
+ *N_refinePts: (search mode only) number of delays measured at each refinement step.
+ *searchPrecision: (search mode only) precision, in ns, to which the optimum delay is located (at best t_min).
  *plotPulseSequence: if set to True, this script will generate a plot of the pulse sequence ouput by the PulseBlaster
  *savePath: path to folder where data will be saved. By default, data is saved in a folder called Saved_Data in the directory where this script is saved
  *saveFileName: file name under which to save the data. This name will later be augmented by the date and time at which the script was run.
@@ -54,6 +63,8 @@ import SRScontrol as SRSctl
 import DAQcontrol as DAQctl
 import PBcontrol as PBctl
 import sequenceControl as seqCtl
+import calibrationStore as calStore
+import eventLog as evLog
 import random
 import matplotlib.pyplot as plt
 import numpy as np
@@ -77,6 +88,19 @@ t_AOM= 5*us
 Nsamples = 1000
 #DAQ timeout, in seconds:
 DAQtimeout = 10
+# Single-shot sweep option - set to True to acquire all the delay points with a single PulseBlaster program and a single DAQ read:
+singleShot = True
+# Automatic search options------------------------------------------------------
+# Search mode option - set to True to find the optimum delay automatically:
+searchMode = False
+# Save calibration option - set to True to save the optimum delay found in search mode in the calibration store (this changes t_readoutDelay for all the pulsed experiment config files):
+saveCalibration = False
+# Fraction of the rise of the fluorescence transient at which the optimum delay is taken:
+edgeFraction = 0.9
+# Number of delays measured at each refinement step:
+N_refinePts = 10
+# Precision to which the optimum delay is located (in ns):
+searchPrecision = 2*t_min
 # Plotting options--------------------------------------------------------------
 # Plot pulse sequence option  - set to true to plot the pulse sequence
 plotPulseSequence = True
@@ -86,18 +110,106 @@ savePath = os.getcwd()+"\\Saved_Data\\"
 # File name for data file
 saveFileName = "optimizeReadoutDelay_"
 #------------------------- END OF USER INPUT ----------------------------------#
+#PB channels
+PBchannels = {'AOM':AOM,'DAQ':DAQ,'STARTtrig':STARTtrig}
+
+def readFluorescence(DAQtask,N,timeout,countBuffer=None):
+	#Reads N samples of the APD input. In the photon-counting mode (DAQ_AcquisitionMode = 'counter'), returns the number of counts in each gate (the counter task returns cumulative counts, read into the uint32 countBuffer, if given).
+	#In the analog mode, if a reference input (DAQ_RefInput) is configured, the task has two channels: only the APD readings (row 0) are returned, as the readout delay is located on the APD signal.
+	if DAQ_AcquisitionMode == 'counter':
+		#The acquisition is started explicitly for each read, so that the cumulative count restarts from 0 (as in mainControl.measureScanPoint):
+		DAQctl.startDAQ(DAQtask)
+		try:
+			return DAQctl.readDAQcounts(DAQtask,N,timeout,countBuffer)
+		finally:
+			DAQctl.stopDAQ(DAQtask)
+	return DAQctl.readDAQchannels(DAQtask,N,timeout)[0]
+
+def measureFluorescence(delays):
+	#Measures the mean fluorescence at each of the given delays (in ns), either with a single PulseBlaster program and DAQ read, or point by point (see the singleShot option above).
+	N_delays = len(delays)
+	fluorescence = np.zeros(N_delays)
+	if singleShot:
+		#All the delay points are acquired in a single DAQ read of 2*Nsamples samples per delay point:
+		DAQtask = DAQctl.configureDAQ(N_delays*Nsamples)
+	else:
+		DAQtask = DAQctl.configureDAQ(Nsamples)
+	try:
+		if singleShot:
+			#Program PB once, with a sequence stepping through all the delays:
+			instructionArray= PBctl.programPB('optimReadoutSingleShotSeq', [delays,t_AOM])
+			sweepPeriod = seqCtl.sequencePeriod(instructionArray)
+			timeout = DAQtimeout
+			if timeout < 2*Nsamples*sweepPeriod*1e-9:
+				timeout = 2*(2*Nsamples*sweepPeriod*1e-9)
+				print('Warning: DAQtimeout is shorter than the time needed to acquire the whole sweep. Increasing the DAQ timeout to',timeout,'s.')
+			#Read all the delay points at once. Samples are acquired in the order of the delays in the sweep, which is repeated 2*Nsamples times:
+			print('Acquiring ',N_delays,' delay points...')
+			sig=readFluorescence(DAQtask,2*N_delays*Nsamples,timeout)
+			#Sort the samples by delay and take the average at each delay:
+			fluorescence = np.mean(np.reshape(sig,(2*Nsamples,N_delays)),0)
+			evLog.log('sweepEnd',Ndelays=N_delays,timeout=timeout)
+		else:
+			countBuffer = np.zeros(2*Nsamples,dtype=np.uint32) if DAQ_AcquisitionMode == 'counter' else None
+			progress = evLog.ProgressDisplay()
+			for i in range (0, N_delays):
+				#Program PB
+				PBctl.programPB('optimReadoutSeq', [delays[i],t_AOM])
+				progress.update(i+1,N_delays)
+				#read DAQ
+				sig=readFluorescence(DAQtask,2*Nsamples,DAQtimeout,countBuffer)
+				#Take average of counts
+				fluorescence[i] = np.mean(sig)
+				evLog.log('pointEnd',delay=delays[i],fluorescence=fluorescence[i])
+	finally:
+		#Close DAQ task:
+		DAQctl.closeDAQTask(DAQtask)
+	return fluorescence
+
+def searchReadoutDelay(coarseDelays):
+	#Coarse-to-fine search for the rising edge of the fluorescence transient (see search mode description above).
+	#Returns [optimum delay, all measured delays, fluorescence at all measured delays].
+	measuredDelays = list(coarseDelays)
+	measuredFluorescence = list(measureFluorescence(coarseDelays))
+	#Fluorescence level defining the edge, fixed by the coarse sweep:
+	edgeLevel = measuredFluorescence[0] + edgeFraction*(max(measuredFluorescence)-measuredFluorescence[0])
+	i_edge = int(np.argmax(np.array(measuredFluorescence)>=edgeLevel))
+	if i_edge == 0:
+		print('Error: the fluorescence has already risen at startDelay. Please decrease startDelay (or increase t_AOM) and try again.')
+		sys.exit()
+	[lowerDelay,upperDelay] = [coarseDelays[i_edge-1],coarseDelays[i_edge]]
+	while (upperDelay-lowerDelay) > max(searchPrecision,t_min):
+		#Measure N_refinePts new delays on the t_min grid, strictly between lowerDelay and upperDelay:
+		refineDelays = np.unique(t_min*np.round(np.linspace(lowerDelay,upperDelay,N_refinePts+2,endpoint=True)/t_min))
+		refineDelays = refineDelays[(refineDelays>lowerDelay)&(refineDelays<upperDelay)]
+		if len(refineDelays) == 0:
+			break
+		print('Refining optimum delay between',lowerDelay,'ns and',upperDelay,'ns...')
+		refineFluorescence = measureFluorescence(refineDelays)
+		measuredDelays.extend(refineDelays)
+		measuredFluorescence.extend(refineFluorescence)
+		aboveEdge = refineDelays[refineFluorescence>=edgeLevel]
+		if len(aboveEdge):
+			upperDelay = min(aboveEdge)
+		belowEdge = refineDelays[(refineFluorescence<edgeLevel)&(refineDelays<upperDelay)]
+		if len(belowEdge):
+			lowerDelay = max(belowEdge)
+	sortingIndices = np.argsort(measuredDelays)
+	return [float(upperDelay),np.array(measuredDelays)[sortingIndices],np.array(measuredFluorescence)[sortingIndices]]
+
 try:
-	t_readoutDelay = np.linspace(startDelay,endDelay, N_scanPts, endpoint=True) 
-	#PB channels
-	PBchannels = {'AOM':AOM,'DAQ':DAQ,'STARTtrig':STARTtrig}
+	t_readoutDelay = np.linspace(startDelay,endDelay, N_scanPts, endpoint=True)
 	#Make save file path
 	dateTimeStr = strftime("%Y-%m-%d_%Hh%Mm%Ss", localtime())
 	dataFileName = savePath + saveFileName+ dateTimeStr +".txt"
 	#Make param file path
 	paramFileName = savePath + saveFileName+dateTimeStr+'_PARAMS'+".txt"
 	#Param file save settings
-	formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%s\n"
-	expParamList = ['N_scanPts:',N_scanPts,'Nsamples:',Nsamples,'startDelay:',startDelay,'endDelay:',endDelay,'t_AOM:',t_AOM,'plotPulseSequence:',plotPulseSequence,'dataFileName:',dataFileName]
+	formattingSaveString = "%s\t%d\n%s\t%d\n%s\t%f\n%s\t%f\n%s\t%f\n%s\t%r\n%s\t%r\n%s\t%r\n%s\t%s\n"
+	expParamList = ['N_scanPts:',N_scanPts,'Nsamples:',Nsamples,'startDelay:',startDelay,'endDelay:',endDelay,'t_AOM:',t_AOM,'plotPulseSequence:',plotPulseSequence,'singleShot:',singleShot,'searchMode:',searchMode,'dataFileName:',dataFileName]
+	if searchMode:
+		formattingSaveString = formattingSaveString + "%s\t%f\n%s\t%d\n%s\t%f\n%s\t%f\n"
+		expParamList.extend(['edgeFraction:',edgeFraction,'N_refinePts:',N_refinePts,'searchPrecision:',searchPrecision])
 
 
 	#Validate user input:
@@ -107,21 +219,25 @@ try:
 	if startDelay%(t_min):
 		startDelay = t_min*round(startDelay/t_min)
 		print('Warning: startDelay is not a multiple of',t_min,'ns. Rounding...\nstartDelay now set to:',startDelay,'ns.')
-		t_readoutDelay = np.linspace(startDelay,endDelay, N_scanPts, endpoint=True) 
+		t_readoutDelay = np.linspace(startDelay,endDelay, N_scanPts, endpoint=True)
 	stepSize = t_readoutDelay[1]-t_readoutDelay[0]
 	if (stepSize%t_min):
 				roundedStepSize = t_min*round(stepSize/t_min)
-				endDelay  = (N_scanPts-1)*roundedStepSize + startDelay 
+				endDelay  = (N_scanPts-1)*roundedStepSize + startDelay
 				print('Warning: requested time step is ',stepSize,'ns, which is not an integer multiple of ',t_min,'ns. Rounding step size to the nearest multiple of ',t_min,':\nStep size is now',roundedStepSize,'.\nstartDelay=',startDelay,' and \nendDelay=',endDelay)
 				t_readoutDelay = np.linspace(startDelay,endDelay, N_scanPts, endpoint=True)
+	if searchMode and ((edgeFraction<=0) or (edgeFraction>1)):
+		print('Error: edgeFraction must be >0 and <=1.')
+		sys.exit()
+	if searchMode and ((not isinstance(N_refinePts, int)) or (N_refinePts<1)):
+		print('Error: N_refinePts must be an integer >= 1.')
+		sys.exit()
 
-	#Configure DAQ
-	DAQclosed = False
-	DAQtask = DAQctl.configureDAQ(Nsamples)
-
-	fluorescence = np.zeros(N_scanPts)
 	if plotPulseSequence:
-		instructionArray= PBctl.programPB('optimReadoutSeq', [t_readoutDelay[-1],t_AOM])
+		if singleShot:
+			instructionArray= PBctl.programPB('optimReadoutSingleShotSeq', [t_readoutDelay,t_AOM])
+		else:
+			instructionArray= PBctl.programPB('optimReadoutSeq', [t_readoutDelay[-1],t_AOM])
 		[t_us,channelPulses,yTicks]=seqCtl.plotSequence(instructionArray,PBchannels)
 		plt.figure(0)
 		for channel in channelPulses:
@@ -129,41 +245,52 @@ try:
 		plt.yticks(yTicks)
 		plt.xlabel('time (us)')
 		plt.ylabel('channel')
-		plt.title('Pulse Sequence plot (at last scan point)')
-
-	#Run readout delay scan:
-	for i in range (0, N_scanPts):
-		#Program PB
-		instructionArray= PBctl.programPB('optimReadoutSeq', [t_readoutDelay[i],t_AOM])
-		print('Scan point ', i+1, ' of ', N_scanPts)
-		#read DAQ
-		sig=DAQctl.readDAQ(DAQtask,2*Nsamples,DAQtimeout)
-		#Take average of counts
-		fluorescence[i] = np.mean(sig)
-
-	#Close DAQ task:
-	DAQctl.closeDAQTask(DAQtask)
-	DAQclosed = True
+		if singleShot:
+			plt.title('Pulse Sequence plot (single-shot sweep through all delays)')
+		else:
+			plt.title('Pulse Sequence plot (at last scan point)')
 
-	#Save data:
 	#Check if save directory exists, and, if not, creates a "Saved Data" folder in the current directory, where all data will be saved.
 	if not (os.path.isdir(savePath)):
 		 os.makedirs(savePath)
 		 print('Warning: Save directory did not exist, creating folder named Saved_Data in the working directory. Data will be saved to this directory.')
+	#Record the delay points measured in an _EVENTS.jsonl file next to the data file (see eventLog.py):
+	evLog.activeLog = evLog.EventLog(savePath + saveFileName + dateTimeStr + '_EVENTS.jsonl')
 
+	#Run readout delay scan:
+	if searchMode:
+		[optimumDelay,t_readoutDelay,fluorescence] = searchReadoutDelay(t_readoutDelay)
+		evLog.log('searchEnd',optimumDelay=optimumDelay,Ndelays=len(t_readoutDelay))
+		print('Optimum readout delay:',optimumDelay,'ns, located to within',max(searchPrecision,t_min),'ns using',len(t_readoutDelay),'delay points (a uniform sweep with this precision would need',int(round((endDelay-startDelay)/max(searchPrecision,t_min)))+1,'points).')
+	else:
+		fluorescence = measureFluorescence(t_readoutDelay)
+
+	#Save data:
 	data = np.array([t_readoutDelay,fluorescence])
 	data = data.T
 	dataFile = open(dataFileName, 'w')
 	for item in data:
 		dataFile.write("%.0f\t%f\n" % tuple(item))
 	paramFile = open(paramFileName, 'w')
+	if searchMode:
+		expParamList.extend(['optimumDelay:',optimumDelay])
 	paramFile.write(formattingSaveString % tuple(expParamList))
 	dataFile.close()
 	paramFile.close()
+	if searchMode and saveCalibration:
+		#Save optimum delay in the calibration store, from which the pulsed experiment config files read t_readoutDelay:
+		previousDelay = calStore.getCalibratedValue('t_readoutDelay',None)
+		calStore.saveCalibratedValue('t_readoutDelay',optimumDelay,dataFileName)
+		print('t_readoutDelay =',optimumDelay,'ns saved in the calibration store',calStore.calibrationFile(),'(previous value:',('none stored' if previousDelay is None else str(previousDelay)+' ns')+')')
+	elif searchMode:
+		print('Optimum delay:',optimumDelay,'ns (not saved in the calibration store: set saveCalibration = True to use it as t_readoutDelay in the pulsed experiment config files)')
 
 	#Plot results
 	plt.figure(1)
-	plt.plot(t_readoutDelay, fluorescence)
+	plt.plot(t_readoutDelay, fluorescence,'.-')
+	if searchMode:
+		plt.axvline(optimumDelay,color='r')
+		plt.title('Optimum readout delay: '+str(optimumDelay)+' ns')
 	plt.xlabel('Delay (ns)')
 	plt.ylabel('APD Voltage (V)')
 	plt.show()
@@ -171,10 +298,9 @@ except KeyboardInterrupt:
 		print('User keyboard interrupt. Quitting...')
 		sys.exit()
 finally:
-		if 'SRS' in vars():	
+		if 'SRS' in vars():
 			#Turn off SRS output
 			SRSctl.disableSRS_RFOutput(SRS)
-		if ('DAQtask' in vars()) and  (not DAQclosed):
-			#Close DAQ task:
-			DAQctl.closeDAQTask(DAQtask)
-			DAQclosed=True
\ No newline at end of file
+		if evLog.activeLog is not None:
+			evLog.activeLog.close()
+			evLog.activeLog = None
@@ -0,0 +1,183 @@
+# orchestrator.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Multi-setup orchestrator
+
+This script runs experiments on several spectrometers connected to the same PC at the same time. Each setup is run by its
+own worker process, which uses the connection profile of that setup (PulseBlaster board, DAQ channels, GPIB address, etc.,
+defined in setupProfiles in connectionConfig.py), so that the setups never share any instrument or module state. Each worker
+runs its list of experiments one after the other, in headless mode (plots are saved as .png files next to the data files),
+and the setup name is prepended to the saved file names.
+
+The supervisor (i.e. this script) prints the status of all the workers as they start and finish experiments and, for setups
+whose profile sets a dataPublishPort, subscribes to their live data streams (see dataPublisher.py) to report their progress.
+runOrchestrator returns the data of all the experiments, as returned by mainControl.runExperiment.
+
+To run this script, from a windows command prompt, call:
+ python orchestrator.py <setup>:<config>[,<config>...] [<setup>:<config>[,<config>...] ...]
+e.g. python orchestrator.py rig1:ESRconfig,Rabiconfig rig2:T2config
+where the configs are the names of experiment config files or paths to JSON/YAML config files.
+"""
+#Imports
+# Only modules which do not copy the connection settings are imported here: each worker applies its setup profile before
+# importing the instrument modules.
+import connectionConfig as conCfg
+import dataPublisher
+import multiprocessing
+import queue
+import threading
+import sys
+import time
+
+# Interval (in s) between the progress lines printed by the supervisor:
+statusPrintInterval = 5
+
+def runWorker(setupName,expConfigFiles,statusQueue):
+	#Worker process: runs the experiments in expConfigFiles in turn on setup setupName, reporting their status to the supervisor.
+	conCfg.applyProfile(setupName)
+	import configControl as cfgCtl
+	import mainControl as mainCtl
+	for expConfigFile in expConfigFiles:
+		statusQueue.put([setupName,'started',expConfigFile,None])
+		try:
+			expCfg = cfgCtl.loadConfig(expConfigFile)
+			expCfg = expCfg._replace(saveFileName=setupName+'_'+expCfg.saveFileName)
+			result = mainCtl.runExperiment(expCfg,interactive=False,headless=True)
+		except BaseException as excpt:
+			#Errors in mainControl (e.g. invalid user inputs, instrument errors) exit with sys.exit(), so SystemExit is caught here too:
+			statusQueue.put([setupName,'failed',expConfigFile,type(excpt).__name__+' '+str(excpt)])
+			break
+		statusQueue.put([setupName,'finished',expConfigFile,result])
+	statusQueue.put([setupName,'done',None,None])
+
+def forwardDataStream(setupName,port,statusQueue,stopEvent):
+	#Subscribes to the live data published by a worker (reconnecting for each of its experiments) and forwards the records to the supervisor.
+	while not stopEvent.is_set():
+		try:
+			for [recordType,record] in dataPublisher.subscribe(port):
+				statusQueue.put([setupName,'data',recordType,record])
+		except OSError:
+			#Worker is not publishing (yet, or any more):
+			time.sleep(0.5)
+
+# Connection settings which must differ between setups run at the same time. The counter settings are only checked for the
+# setups which use them (DAQ_AcquisitionMode = 'counter'), and the DAQ terminals only when they are given as full terminal
+# names (e.g. "/Dev1/PFI0"), since a bare terminal name (e.g. "PFI0") refers to a terminal of each setup's own DAQ:
+exclusiveSettingNames = ['PBboard','DAQ_APDInput','DAQ_RefInput','GPIBaddr','dataPublishPort','sharedMemoryName']
+counterSettingNames = ['DAQ_CounterInput','DAQ_CounterSource']
+terminalSettingNames = ['DAQ_SampleClk','DAQ_StartTrig','DAQ_CounterSource']
+
+def usesSetting(setupSettings,name):
+	#Returns True if a setup with connection settings setupSettings uses setting name exclusively (see exclusiveSettingNames).
+	if setupSettings[name] is None:
+		return False
+	if (name in counterSettingNames) and (setupSettings['DAQ_AcquisitionMode'] != 'counter'):
+		return False
+	if name in terminalSettingNames:
+		return str(setupSettings[name]).startswith('/')
+	return True
+
+def checkProfiles(setupNames):
+	#Checks that no two setups share a PulseBlaster board, DAQ input, counter or terminal, SRS, data publishing port or shared memory block.
+	settings = {setupName:conCfg.profileSettings(setupName) for setupName in setupNames}
+	for name in exclusiveSettingNames+counterSettingNames+['DAQ_SampleClk','DAQ_StartTrig']:
+		values = [settings[setupName][name] for setupName in setupNames if usesSetting(settings[setupName],name)]
+		if len(values) != len(set(values)):
+			print('Error: several of the setups',setupNames,'have the same',name,'. Please edit their profiles (setupProfiles in connectionConfig.py) so that each setup uses its own instruments.')
+			sys.exit()
+	return settings
+
+def runOrchestrator(setupRuns):
+	#Runs the experiments of each setup in a separate worker process. setupRuns is a dictionary of {setup name: list of experiment configs}.
+	#Returns a dictionary of {setup name: list of [config, data]}, where data is as returned by mainControl.runExperiment.
+	settings = checkProfiles(list(setupRuns.keys()))
+	context = multiprocessing.get_context('spawn')
+	statusQueue = context.Queue()
+	workers = {setupName:context.Process(target=runWorker,args=(setupName,expConfigFiles,statusQueue),name=setupName) for setupName,expConfigFiles in setupRuns.items()}
+	stopEvent = threading.Event()
+	for setupName in setupRuns:
+		if settings[setupName]['dataPublishPort'] is not None:
+			threading.Thread(target=forwardDataStream,args=(setupName,settings[setupName]['dataPublishPort'],statusQueue,stopEvent),daemon=True).start()
+	for worker in workers.values():
+		worker.start()
+	results = {setupName:[] for setupName in setupRuns}
+	progress = {setupName:'starting' for setupName in setupRuns}
+	running = set(setupRuns.keys())
+	lastStatusPrintTime = time.time()
+	try:
+		while running:
+			try:
+				[setupName,event,detail,payload] = statusQueue.get(timeout=1)
+			except queue.Empty:
+				#Check for workers which have stopped without reporting it (e.g. crashed):
+				for setupName in list(running):
+					if not workers[setupName].is_alive():
+						print('['+setupName+'] Error: worker stopped unexpectedly (exit code',workers[setupName].exitcode,').')
+						progress[setupName] = 'stopped'
+						running.discard(setupName)
+				continue
+			if event == 'data':
+				if detail == dataPublisher.POINT_RECORD:
+					progress[setupName] = 'run '+str(payload['i_run']+1)+', point '+str(payload['i_scanPoint']+1)+'/'+str(payload['N_scanPts'])
+				else:
+					print('['+setupName+'] Run',payload['i_run']+1,'completed in',round(payload['runDuration'],1),'s')
+			elif event == 'started':
+				print('['+setupName+'] Started',detail)
+				progress[setupName] = detail
+			elif event == 'finished':
+				print('['+setupName+'] Finished',detail)
+				results[setupName].append([detail,payload])
+			elif event == 'failed':
+				print('['+setupName+'] Failed',detail,'(',payload,'). Skipping the remaining experiments of this setup.')
+			elif event == 'done':
+				progress[setupName] = 'done'
+				running.discard(setupName)
+			if time.time()-lastStatusPrintTime > statusPrintInterval:
+				print('Status: '+', '.join([setupName+': '+progress[setupName] for setupName in setupRuns]))
+				lastStatusPrintTime = time.time()
+	except KeyboardInterrupt:
+		print('User keyboard interrupt. Quitting...')
+		sys.exit()
+	finally:
+		stopEvent.set()
+		for worker in workers.values():
+			worker.join()
+	return results
+
+def parseSetupRuns(arguments):
+	#Parses command line arguments of the form <setup>:<config>[,<config>...].
+	setupRuns = {}
+	for argument in arguments:
+		if ':' not in argument:
+			print('Usage: python orchestrator.py <setup>:<config>[,<config>...] [<setup>:<config>[,<config>...] ...]')
+			sys.exit()
+		[setupName,expConfigFiles] = argument.split(':',1)
+		setupRuns.setdefault(setupName,[]).extend(expConfigFiles.split(','))
+	return setupRuns
+
+if __name__ == "__main__":
+	if len(sys.argv)<2:
+		print('Usage: python orchestrator.py <setup>:<config>[,<config>...] [<setup>:<config>[,<config>...] ...]')
+		sys.exit()
+	runOrchestrator(parseSetupRuns(sys.argv[1:]))
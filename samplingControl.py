@@ -0,0 +1,90 @@
+# samplingControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Non-uniform sampling of long scans (see the samplingMode option of correlSpecconfig.py and T1config.py). Instead of the
+# N_scanPts uniformly spaced scan points, only N_sampledPts points are measured:
+#  *'sparse' (correlation spectroscopy): a random subset of the uniform scan grid (always including its first and last
+#   points). The contrast on the full grid is then reconstructed by compressed sensing (reconstructSparse), assuming that the
+#   spectrum contains only a few frequencies, and its spectrum is calculated as for a uniform scan (see spectrumControl.py).
+#  *'log' (T1): delays spaced logarithmically from the first to the last scan point (rounded to the PulseBlaster time
+#   resolution), which sample every decade of a decay equally. The decay is then fitted directly on these points (see
+#   fitControl.fitStretchedExponential), which needs no reconstruction.
+import numpy as np
+
+samplingModes = {'uniform':None,'sparse':'correlSpecSeq','log':'T1seq'}
+
+def sparseScanPoints(gridPoints,N_sampledPts,seed=None):
+	#Returns N_sampledPts points chosen at random from gridPoints, including the first and last points, in increasing order.
+	gridPoints = np.sort(np.asarray(gridPoints,dtype=float))
+	rng = np.random.default_rng(seed)
+	i_inner = rng.choice(np.arange(1,len(gridPoints)-1),N_sampledPts-2,replace=False)
+	return gridPoints[np.sort(np.concatenate(([0,len(gridPoints)-1],i_inner)))]
+
+def logScanPoints(start,end,N_sampledPts,t_min):
+	#Returns up to N_sampledPts delays spaced logarithmically from start to end, rounded to multiples of t_min (points which round to the same delay are merged).
+	points = t_min*np.round(np.geomspace(start,end,N_sampledPts)/t_min)
+	return np.unique(points)
+
+def selectScanPoints(expCfg,t_min):
+	#Returns the scan points to measure with the samplingMode of expCfg, chosen from its (validated, uniform) scannedParam.
+	if expCfg.samplingMode == 'sparse':
+		points = sparseScanPoints(expCfg.scannedParam,expCfg.N_sampledPts)
+	else:
+		points = logScanPoints(expCfg.scannedParam[0],expCfg.scannedParam[-1],expCfg.N_sampledPts,t_min)
+		if len(points)<expCfg.N_sampledPts:
+			print('Warning: only',len(points),'of the',expCfg.N_sampledPts,'log-spaced delays are distinct multiples of',t_min,'ns. Measuring',len(points),'delays.')
+	print('Note:',expCfg.samplingMode,'sampling - measuring',len(points),'of the',len(expCfg.scannedParam),'scan points.')
+	return points
+
+def reconstructSparse(tGrid,tSampled,ySampled,oversampling=2,lambdaFraction=0.05,Niterations=300):
+	#Reconstructs a signal on the uniform grid tGrid from its values ySampled at the points tSampled (a subset of tGrid), by finding the sparsest
+	#spectrum consistent with the samples: the signal is expanded on an oversampled Fourier basis (oversampling*len(tGrid) frequencies), and the
+	#coefficients minimizing |samples - model|^2/2 + lambda*sum(|coefficients|) are found with the FISTA algorithm, with lambda set to
+	#lambdaFraction times the largest correlation between the samples and a basis function. Returns the reconstructed signal on tGrid.
+	tGrid = np.asarray(tGrid,dtype=float)
+	M = len(tGrid)
+	P = oversampling*M
+	i_sampled = np.searchsorted(tGrid,tSampled)
+	mean = np.mean(ySampled)
+	y = np.asarray(ySampled,dtype=float)-mean
+	def forward(x):
+		#Basis expansion of the coefficients x, at the sampled points:
+		return np.real(np.fft.ifft(x)[0:M][i_sampled])*np.sqrt(P)
+	def adjoint(residual):
+		zeroFilled = np.zeros(P)
+		zeroFilled[i_sampled] = residual
+		return np.fft.fft(zeroFilled)/np.sqrt(P)
+	correlation = adjoint(y)
+	threshold = lambdaFraction*np.max(np.abs(correlation))
+	# The forward operator has a norm <=1, so a unit step size is used:
+	x = np.zeros(P,dtype=complex)
+	z = x
+	step = 1.0
+	for i in range(0,Niterations):
+		gradientStep = z + adjoint(y-forward(z))
+		magnitude = np.abs(gradientStep)
+		xNew = gradientStep*np.maximum(1-threshold/np.maximum(magnitude,1e-300),0)
+		stepNew = (1+np.sqrt(1+4*step**2))/2
+		z = xNew + ((step-1)/stepNew)*(xNew-x)
+		[x,step] = [xNew,stepNew]
+	return np.real(np.fft.ifft(x)[0:M])*np.sqrt(P) + mean
@@ -0,0 +1,322 @@
+# scanControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Multidimensional scan engine
+
+This script runs an experiment over an N-dimensional grid of parameters (e.g. ESR versus microwavePower, XY8 versus
+tau and N, Rabi versus microwaveFrequency) in a single session, initialising the SRS, PulseBlaster and DAQ only once.
+Each scan axis is a parameter of the experiment config (see configControl.configFields), or 'scannedParam' for the
+parameter which is normally scanned by the experiment (e.g. the frequency in an ESR experiment or tau in an XY8 experiment).
+
+-- Axis ordering --
+Changing a parameter which is set on the SRS (microwaveFrequency, microwavePower, or the scanned frequency of an ESR
+experiment) costs a GPIB transaction, while changing a pulse-sequence parameter costs a PulseBlaster reprogram. The loop
+order is chosen to minimise the total estimated transition cost, using the per-transition costs SRStransitionCost and
+PBtransitionCost defined below.
+
+Two orderings are available:
+ *'nested': for each combination of the outer-axis values, the innermost axis is scanned Navg times (as if a separate
+  experiment were run for each outer point).
+ *'interleaved': each averaging run sweeps the whole grid, so that slow drifts are spread evenly over all axes.
+Axes flagged for randomization are visited in random order in every run after the first, as in mainControl.py. The outer
+axes of a nested scan are only swept once (for all the runs), so their values are always visited in random order if they
+are flagged for randomization.
+
+-- Saving --
+Results are stored as dense N-D arrays of shape (n_1,...,n_k,Navg), indexed in the order the axes were given, and are
+saved (as a NumPy .npz file, alongside a _PARAMS.txt file) at the end of every run (interleaved ordering) or after each
+outer point (nested ordering). Points which have not been measured yet are stored as NaN.
+
+To run this script, from a windows command prompt, call:
+ python scanControl.py <config> <axis> [<axis> ...] [--interleaved] [--randomize=<name>,<name>...] [--headless]
+where each axis is given as name=start:stop:numberOfPoints or name=value1,value2,..., e.g.
+ python scanControl.py ESRconfig microwavePower=-20:0:5 scannedParam
+ python scanControl.py XY8config N=2,4,8 scannedParam=300:480:46
+An axis named without values (e.g. scannedParam) takes its values from the config file. If no scannedParam axis is
+given, it is added as the innermost axis, with the scan points and randomization setting of the config file.
+With --headless, no plot windows are opened and the final plot is saved as a _PLOT.png file next to the data file.
+"""
+#Imports
+import connectionConfig as conCfg
+import configControl as cfgCtl
+import mainControl as mainCtl
+import eventLog as evLog
+import sequenceControl as seqCtl
+import numpy as np
+from collections import namedtuple
+from itertools import permutations, product
+from os.path import isdir
+from os import makedirs
+import sys
+
+# Estimated cost (in seconds) of changing a parameter on each instrument between consecutive scan points (the same estimates as mainControl's experiment duration estimate):
+SRStransitionCost = mainCtl.SRSfrequencySwitchTime
+PBtransitionCost = mainCtl.PBreprogramTime
+
+ScanAxis = namedtuple('ScanAxis',['name','values','randomize'])
+
+def axisInstrument(cfg,axisName):
+	#Returns 'SRS' if changing this axis requires an SRS command, or 'PB' if it requires reprogramming the PulseBlaster.
+	if axisName == 'scannedParam':
+		return 'SRS' if cfg.sequence == 'ESRseq' else 'PB'
+	if axisName in ['microwaveFrequency','microwavePower']:
+		return 'SRS'
+	if axisName in cfg.info.sequenceArgNames:
+		return 'PB'
+	print('Error: parameter',axisName,'cannot be scanned. Scan axes must be microwaveFrequency, microwavePower, scannedParam or one of the pulse-sequence parameters',cfg.info.sequenceArgNames,'.')
+	sys.exit()
+
+def transitionCost(cfg,axes,loopOrder):
+	#Estimated total cost of the instrument changes made when looping over the axes in loopOrder (outermost first), per averaging run.
+	#An instrument is updated whenever any of its axes changes, i.e. prod(n_j) times for all axes j up to (and including) its innermost axis.
+	costPerChange = {'SRS':SRStransitionCost,'PB':PBtransitionCost}
+	cost = 0
+	for instrument in costPerChange:
+		levels = [level for level,i_axis in enumerate(loopOrder) if axisInstrument(cfg,axes[i_axis].name) == instrument]
+		if levels:
+			cost += costPerChange[instrument]*np.prod([len(axes[i_axis].values) for i_axis in loopOrder[0:max(levels)+1]])
+	return cost
+
+def chooseLoopOrder(cfg,axes):
+	#Returns the order (list of axis indices, outermost first) which minimises the total transition cost.
+	return list(min(permutations(range(0,len(axes))),key=lambda loopOrder: transitionCost(cfg,axes,loopOrder)))
+
+def visitingOrder(axis,i_run,sweptOnce=False):
+	#Order in which the values of an axis are visited in a given averaging run. Randomized axes are shuffled in every run after the
+	#first, or always if the axis is only swept once (sweptOnce=True, the outer axes of nested scans).
+	indices = np.arange(0,len(axis.values))
+	if axis.randomize and (i_run>0 or sweptOnce):
+		np.random.shuffle(indices)
+	return indices
+
+def scanPoints(axes,loopOrder,Navg,ordering):
+	#Generates [i_run, index tuple] for each point of the scan, where the index tuple is in the order the axes were given.
+	def gridPoints(i_run,loopAxes,fixedIndices,sweptOnce=False):
+		for loopIndices in product(*[visitingOrder(axes[i_axis],i_run,sweptOnce) for i_axis in loopAxes]):
+			indices = dict(fixedIndices)
+			indices.update(zip(loopAxes,loopIndices))
+			yield indices
+	if ordering == 'interleaved':
+		for i_run in range(0,Navg):
+			for indices in gridPoints(i_run,loopOrder,{}):
+				yield [i_run,tuple(indices[i_axis] for i_axis in range(0,len(axes)))]
+	else:
+		for outerIndices in gridPoints(0,loopOrder[:-1],{},sweptOnce=True):
+			for i_run in range(0,Navg):
+				for indices in gridPoints(i_run,loopOrder[-1:],outerIndices):
+					yield [i_run,tuple(indices[i_axis] for i_axis in range(0,len(axes)))]
+
+def validateScan(cfg,axes):
+	#Validates the experiment at every combination of the non-scannedParam axis values (using mainControl.validateUserInput)
+	#and returns [axes, runConfigs], where runConfigs maps each combination to its validated run config. The scannedParam axis
+	#values are replaced with their validated values, which must be the same for all combinations.
+	i_scan = [axis.name for axis in axes].index('scannedParam')
+	otherAxes = [i_axis for i_axis in range(0,len(axes)) if i_axis != i_scan]
+	runConfigs = {}
+	validatedScan = None
+	for otherIndices in product(*[range(0,len(axes[i_axis].values)) for i_axis in otherAxes]):
+		pointCfg = cfg._replace(**{axes[i_axis].name:axes[i_axis].values[i_value] for i_axis,i_value in zip(otherAxes,otherIndices)})
+		runCfg = pointCfg.makeRunConfig()
+		runCfg.scannedParam = np.array(axes[i_scan].values,dtype=float)
+		runCfg.N_scanPts = len(runCfg.scannedParam)
+		mainCtl.validateUserInput(runCfg)
+		if validatedScan is None:
+			validatedScan = np.array(runCfg.scannedParam)
+		elif not np.array_equal(validatedScan,np.array(runCfg.scannedParam)):
+			print('Error: the scannedParam values are adjusted differently by the input validation at different points of the scan grid. Please choose scan values which are valid for all values of the other scan axes.')
+			sys.exit()
+		runConfigs[otherIndices] = runCfg
+	axes = list(axes)
+	axes[i_scan] = axes[i_scan]._replace(values=validatedScan)
+	return [axes,runConfigs]
+
+def saveScanData(cfg,axes,signal,background,contrast,runsCompleted):
+	#Saves the N-D data arrays and axis values to <savePath><saveFileName><date>_<N>D.npz.
+	scanData = {'axisNames':np.array([axis.name for axis in axes]),'signal':signal,'background':background,'contrast':contrast,'runsCompleted':runsCompleted}
+	for i_axis,axis in enumerate(axes):
+		scanData['axis'+str(i_axis)] = np.array(axis.values,dtype=float)
+	np.savez(cfg.savePath + cfg.saveFileName + cfg.dateTimeStr + '_' + str(len(axes)) + 'D.npz',**scanData)
+
+def plotScanData(axes,contrast,headless=False,plotFileName=None):
+	#Plots the averaged contrast: as a line for 1D scans, and as a colour map for 2D scans. In headless mode, the plot is saved to plotFileName instead of being shown.
+	plt = mainCtl.importPyplot(headless)
+	meanContrast = np.nanmean(contrast,axis=-1)
+	plt.clf()
+	if len(axes) == 1:
+		plt.plot(axes[0].values,meanContrast,'b-')
+		plt.xlabel(axes[0].name)
+	elif len(axes) == 2:
+		plt.pcolormesh(axes[1].values,axes[0].values,meanContrast,shading='auto')
+		plt.colorbar(label='Contrast')
+		plt.xlabel(axes[1].name)
+		plt.ylabel(axes[0].name)
+	if headless:
+		plt.savefig(plotFileName)
+	else:
+		plt.draw()
+		plt.pause(0.001)
+
+def runScan(expConfigFile,axes,ordering='nested',interactive=True,headless=False):
+	#Runs the experiment configured by expConfigFile (config module name, JSON/YAML path or ExpConfig) over the grid defined by axes
+	#(a list of ScanAxis). Returns [axes, signal, background, contrast], with data arrays of shape (n_1,...,n_k,Navg).
+	#If headless is True, no plot windows are opened: the final data plot is saved as a .png file next to the data file instead.
+	#The instrument drivers are only imported here, so that the scan planning functions above can be used without them:
+	import SRScontrol as SRSctl
+	import DAQcontrol as DAQctl
+	import PBcontrol as PBctl
+	try:
+		cfg = cfgCtl.loadConfig(expConfigFile).stamped()
+		if ordering not in ['nested','interleaved']:
+			print('Error: unrecognised scan ordering',ordering,'. Valid orderings are \'nested\' and \'interleaved\'.')
+			sys.exit()
+		if 'scannedParam' not in [axis.name for axis in axes]:
+			axes = list(axes) + [ScanAxis('scannedParam',cfg.scannedParam,cfg.randomize)]
+		axes = [axis._replace(values=cfg.scannedParam) if (axis.name == 'scannedParam' and axis.values is None) else axis for axis in axes]
+		for axis in axes:
+			axisInstrument(cfg,axis.name)
+		[axes,runConfigs] = validateScan(cfg,axes)
+		i_scan = [axis.name for axis in axes].index('scannedParam')
+		loopOrder = chooseLoopOrder(cfg,axes)
+		print('Scan axes (outermost first):',[axes[i_axis].name for i_axis in loopOrder],', ordering:',ordering,', estimated instrument transition time per run:',transitionCost(cfg,axes,loopOrder),'s')
+		if not (isdir(cfg.savePath)):
+			makedirs(cfg.savePath)
+			print('Warning: Save directory did not exist, creating folder named Saved_Data in the working directory. Data will be saved to this directory.')
+		#Record the events of the scan in an _EVENTS.jsonl file next to the data file (see eventLog.py):
+		evLog.activeLog = evLog.EventLog(cfg.savePath + cfg.saveFileName + cfg.dateTimeStr + '_' + str(len(axes)) + 'D_EVENTS.jsonl')
+		evLog.log('scanStart',sequence=cfg.sequence,axes=[axis.name for axis in axes],shape=[len(axis.values) for axis in axes],ordering=ordering,Navg=cfg.Navg)
+
+		#Initialise SRS and DAQ
+		SRS = SRSctl.initSRS(conCfg.GPIBaddr,conCfg.modelName)
+		SRSctl.setupSRSmodulation(SRS,cfg.sequence)
+		DAQclosed = False
+		DAQtask = DAQctl.configureDAQ(cfg.Nsamples)
+
+		#Initialize data arrays
+		shape = tuple(len(axis.values) for axis in axes)
+		signal = np.full(shape+(cfg.Navg,),np.nan)
+		background = np.full(shape+(cfg.Navg,),np.nan)
+		contrast = np.full(shape+(cfg.Navg,),np.nan)
+		runsCompleted = np.zeros(shape,dtype=int)
+
+		#Run scan
+		currentSRSsettings = {}
+		currentSeqArgList = None
+		SRSenabled = False
+		nPoints = int(np.prod(shape))*cfg.Navg
+		progress = evLog.ProgressDisplay()
+		for i_point,[i_run,indices] in enumerate(scanPoints(axes,loopOrder,cfg.Navg,ordering)):
+			runCfg = runConfigs[tuple(indices[i_axis] for i_axis in range(0,len(axes)) if i_axis != i_scan)]
+			scanValue = axes[i_scan].values[indices[i_scan]]
+			#Update SRS settings which have changed since the last point:
+			SRSsettings = {'microwavePower':runCfg.microwavePower,'microwaveFrequency':scanValue if cfg.sequence == 'ESRseq' else runCfg.microwaveFrequency}
+			if SRSsettings['microwavePower'] != currentSRSsettings.get('microwavePower'):
+				SRSctl.setSRS_RFAmplitude(SRS,SRSsettings['microwavePower'])
+			if SRSsettings['microwaveFrequency'] != currentSRSsettings.get('microwaveFrequency'):
+				SRSctl.setSRS_Freq(SRS,SRSsettings['microwaveFrequency'])
+			currentSRSsettings = SRSsettings
+			#Reprogram the PulseBlaster if the sequence has changed since the last point:
+			if cfg.sequence == 'ESRseq':
+				seqArgList = runCfg.updateSequenceArgs()
+			else:
+				seqArgList = [scanValue] + runCfg.updateSequenceArgs()
+			if seqArgList != currentSeqArgList:
+				instructionArray = PBctl.programPB(cfg.sequence,seqArgList)
+				samplePeriod = seqCtl.DAQsamplePeriod(instructionArray)
+				currentSeqArgList = seqArgList
+			if not SRSenabled:
+				SRSctl.enableSRS_RFOutput(SRS)
+				SRSenabled = True
+			progress.update(i_point+1,nPoints)
+
+			#read DAQ and take average of counts
+			[signal[indices+(i_run,)],background[indices+(i_run,)],contrast[indices+(i_run,)]] = mainCtl.measureScanPoint(DAQtask,runCfg,samplePeriod)
+			runsCompleted[indices] = i_run+1
+			evLog.log('pointEnd',i_run=i_run,indices=[int(index) for index in indices],signal=signal[indices+(i_run,)],background=background[indices+(i_run,)],contrast=contrast[indices+(i_run,)])
+
+			#Save and plot at the end of each run (interleaved) or each outer point (nested):
+			nextPoints = i_point+1
+			if (ordering == 'interleaved' and nextPoints%int(np.prod(shape)) == 0) or (ordering == 'nested' and nextPoints%(len(axes[loopOrder[-1]].values)*cfg.Navg) == 0):
+				saveScanData(cfg,axes,signal,background,contrast,runsCompleted)
+				if cfg.livePlotUpdate and not headless:
+					plotScanData(axes,contrast)
+
+		#Save the run parameters of the base config:
+		paramFile = open(cfg.paramFileName,'w')
+		paramFile.write(cfg.formattingSaveString % tuple(cfg.expParamList))
+		paramFile.write('scanAxes:\t%s\nscanOrdering:\t%s\n' % ([axis.name for axis in axes],ordering))
+		paramFile.close()
+
+		#Turn off SRS output
+		SRSctl.disableSRS_RFOutput(SRS)
+
+		#Close DAQ task:
+		DAQctl.closeDAQTask(DAQtask)
+		DAQclosed=True
+		evLog.log('scanEnd',Npoints=nPoints)
+		plotScanData(axes,contrast,headless,cfg.savePath + cfg.saveFileName + cfg.dateTimeStr + '_' + str(len(axes)) + 'D_PLOT.png')
+		if interactive and not headless:
+			mainCtl.importPyplot().show()
+		return [axes,signal,background,contrast]
+	except	KeyboardInterrupt:
+		print('User keyboard interrupt. Quitting...')
+		sys.exit()
+	finally:
+		if 'SRS' in vars():
+			#Turn off SRS output
+			SRSctl.disableSRS_RFOutput(SRS)
+		if ('DAQtask' in vars()) and  (not DAQclosed):
+			#Close DAQ task:
+			DAQctl.closeDAQTask(DAQtask)
+			DAQclosed=True
+		if evLog.activeLog is not None:
+			evLog.activeLog.close()
+			evLog.activeLog = None
+
+def parseAxis(axisString,randomizedAxes):
+	#Parses an axis given on the command line as name, name=start:stop:numberOfPoints or name=value1,value2,...
+	if '=' not in axisString:
+		return ScanAxis(axisString,None,axisString in randomizedAxes)
+	[name,valueString] = axisString.split('=',1)
+	if ':' in valueString:
+		[start,stop,numberOfPoints] = valueString.split(':')
+		values = np.linspace(float(start),float(stop),int(numberOfPoints),endpoint=True)
+	else:
+		values = [float(value) if ('.' in value or 'e' in value) else int(value) for value in valueString.split(',')]
+	return ScanAxis(name,values,name in randomizedAxes)
+
+if __name__ == "__main__":
+	arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+	options = [argument for argument in sys.argv[1:] if argument.startswith('--')]
+	if len(arguments)<2:
+		print('Usage: python scanControl.py <config> <axis> [<axis> ...] [--interleaved] [--randomize=<name>,<name>...] [--headless]\n where each axis is name, name=start:stop:numberOfPoints or name=value1,value2,...')
+		sys.exit()
+	randomizedAxes = []
+	for option in options:
+		if option.startswith('--randomize='):
+			randomizedAxes = option[len('--randomize='):].split(',')
+	axes = [parseAxis(axisString,randomizedAxes) for axisString in arguments[1:]]
+	if ('scannedParam' in [axis.name for axis in axes]) and ('--randomize=' not in ''.join(options)):
+		#By default, the scannedParam axis follows the randomize option of the config file:
+		axes = [axis._replace(randomize=cfgCtl.loadConfig(arguments[0]).randomize) if axis.name == 'scannedParam' else axis for axis in axes]
+	runScan(arguments[0],axes,'interleaved' if '--interleaved' in options else 'nested',headless='--headless' in options)
@@ -0,0 +1,89 @@
+# scanGrid.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Scan grid validation: every scan point of an experiment must lie on the grid of values its pulse sequence can produce,
+# offset + k*unit for an integer k (the tick), and must be at least the shortest value the sequence allows (see gridRule):
+#  *ESR: frequencies on the 1uHz resolution grid of the SRS.
+#  *Rabi, T1 and correlation spectroscopy: multiples of t_min (the PulseBlaster time resolution).
+#  *T2 with one pi pulse: the free precession time is defined between pulse centres, so the edge-to-edge time, scanned
+#   value - t_pi/4, must be a multiple of t_min.
+#  *T2 with several pi pulses, and XY8: the edge-to-edge time between pulses, scanned value/2 - t_pi/4, must be a
+#   multiple of t_min, i.e. the scanned value is on a 2*t_min grid offset by t_pi/2.
+# snapScanGrid checks and snaps all the scan points at once. Uniformly spaced scans (e.g. from scanStart, scanEnd and
+# N_scanPts) keep a uniform step: their start is snapped to the grid and their step is rounded to a multiple of the grid
+# unit, as the scan points of a uniform scan must remain uniformly spaced. Other scans (e.g. log-spaced or randomized
+# points) are snapped point by point. Each point which violates the grid is reported with the reason.
+import connectionConfig as conCfg
+import numpy as np
+from collections import namedtuple
+
+t_min = 1e3/conCfg.PBclk #in ns
+us = 1e3
+
+# values: the snapped scan points, ticks: their integer grid indices (values = offset + ticks*unit), violations: a list of [index, requested value, severity ('warning' or 'error'), reason]
+ScanGrid = namedtuple('ScanGrid',['values','ticks','unit','offset','violations'])
+# Relative tolerance (in grid units) below which a point is considered to be on the grid (points are also considered to be on the grid if they are within a few floating-point
+# rounding steps of it, as e.g. the 1uHz grid of GHz frequencies is finer than float64 resolution):
+gridTolerance = 1e-6
+roundingTolerance = 4
+
+def gridRule(expCfg):
+	#Returns [unit, offset, minimum, minimum description] of the scan grid of an experiment (see above). Call after t_pi and IQpadding have been validated.
+	if expCfg.sequence == 'ESRseq':
+		return [1e-6,0,0,'frequencies must be positive']
+	if expCfg.sequence in ['RabiSeq','correlSpecSeq']:
+		return [t_min,0,0,expCfg.scanStartName+' must be >=0']
+	if expCfg.sequence == 'T1seq':
+		return [t_min,0,expCfg.t_readoutDelay + t_min*round((1*us)/t_min),'delays must be at least t_readoutDelay + 1us']
+	pulseMinimum = 2*expCfg.IQpadding + (3/4)*expCfg.t_pi + (5*t_min)
+	if expCfg.sequence == 'T2seq' and expCfg.numberOfPiPulses == 1:
+		return [t_min,(expCfg.t_pi/4)%t_min,max(3*(5*t_min),pulseMinimum),'for your pi pulse length and IQpadding, delays must be at least '+str(max(3*(5*t_min),pulseMinimum))+'ns']
+	# T2seq with several pi pulses, and XY8seq:
+	return [2*t_min,(expCfg.t_pi/2)%(2*t_min),max(3*(5*t_min),2*pulseMinimum),'for your pi pulse length and IQpadding, delays must be at least '+str(max(3*(5*t_min),2*pulseMinimum))+'ns']
+
+def isUniform(values):
+	steps = np.diff(values)
+	return (len(values)>2) and np.allclose(steps,steps[0],rtol=1e-9,atol=0)
+
+def snapScanGrid(values,unit,offset,minimum,minimumDescription=''):
+	#Snaps the scan points values to the grid offset + k*unit and checks them against minimum. Returns a ScanGrid.
+	requested = np.asarray(values,dtype=float)
+	if isUniform(requested):
+		startTick = np.round((requested[0]-offset)/unit)
+		stepTicks = np.round((requested[1]-requested[0])/unit)
+		ticks = (startTick + stepTicks*np.arange(0,len(requested))).astype(np.int64)
+	else:
+		ticks = np.round((requested-offset)/unit).astype(np.int64)
+	snapped = offset + ticks*unit
+	violations = []
+	shifted = np.abs(snapped-requested) > np.maximum(gridTolerance*unit,roundingTolerance*np.spacing(requested))
+	for i in np.nonzero(shifted)[0]:
+		violations.append([int(i),float(requested[i]),'warning','not on the grid of multiples of '+repr(unit)+(' offset by '+repr(offset) if offset else '')+', snapped to '+repr(float(snapped[i]))])
+	for i in np.nonzero(snapped < minimum - gridTolerance*unit)[0]:
+		violations.append([int(i),float(requested[i]),'error','below the minimum of '+repr(minimum)+' ('+minimumDescription+')'])
+	#Points which snap to the same grid value (e.g. if the requested step is smaller than the grid unit):
+	[uniqueTicks,firstIndices,counts] = np.unique(ticks,return_index=True,return_counts=True)
+	for tick,firstIndex in zip(uniqueTicks[counts>1],firstIndices[counts>1]):
+		for i in np.nonzero(ticks == tick)[0][1:]:
+			violations.append([int(i),float(requested[i]),'error','snaps to the same value, '+repr(float(snapped[i]))+', as scan point '+str(firstIndex+1)+' (the scan step is too small for the grid unit, '+repr(unit)+')'])
+	return ScanGrid(snapped,ticks,unit,offset,sorted(violations,key=lambda violation: violation[0]))
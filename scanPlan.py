@@ -0,0 +1,104 @@
+# scanPlan.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Scan plan: the pulse sequences of all the scan points of an experiment, compiled before acquisition starts, so that the
+# acquisition loop of mainControl.runExperiment only has to upload a precompiled instruction array at each scan point.
+# The instruction arrays of all scan points are stored one after the other in a single structured array (bit mask,
+# instruction, instruction data, duration, see sequenceControl.instructionDtype), with the offset of each scan point's
+# instructions, its sequence period, DAQ sample period and number of DAQ samples.
+# Sequences already in the sequence cache (see sequenceCache.py) are loaded from it. The remaining sequences are compiled
+# in parallel in a pool of worker processes (one per CPU core by default) if compiling them one after the other would take
+# more than parallelMinTime (estimated from the time taken to compile the first one), since starting the worker processes
+# takes about a second on Windows.
+# In ESR experiments, the same sequence is used at every scan point, so the plan contains a single sequence.
+# PBcontrol (which loads the SpinAPI driver) is only imported when sequences have to be compiled.
+import sequenceCache as seqCache
+import sequenceControl as seqCtl
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+# Minimum estimated compilation time (in s) for which the sequences are compiled in a process pool:
+parallelMinTime = 3.0
+# Number of scan points sent to a worker process at a time:
+poolChunkSize = 16
+
+class ScanPlan:
+	def __init__(self,scanValues,instructionArrays,samplesPerPoint):
+		#scanValues: the scan points, and instructionArrays: their compiled sequences (a single sequence, shared by all scan points, for ESR).
+		self.scanValues = np.asarray(scanValues,dtype=float)
+		if len(instructionArrays) == 1:
+			self.index = {scanValue:0 for scanValue in scanValues}
+		else:
+			self.index = {scanValue:i for i,scanValue in enumerate(scanValues)}
+		self.offsets = np.cumsum([0]+[len(instructionArray) for instructionArray in instructionArrays])
+		self.instructions = np.concatenate(instructionArrays)
+		self.periods = np.array([seqCtl.sequencePeriod(instructionArray) for instructionArray in instructionArrays])
+		self.samplePeriods = np.array([seqCtl.DAQsamplePeriod(instructionArray) for instructionArray in instructionArrays])
+		self.samplesPerPoint = samplesPerPoint
+
+	def instructionArray(self,scanValue):
+		#Returns the compiled sequence of a scan point, in the format of PBcontrol.makeInstructionArray (a view of instructions).
+		i = self.index[scanValue]
+		return self.instructions[self.offsets[i]:self.offsets[i+1]]
+
+	def samplePeriod(self,scanValue):
+		#Returns the time between DAQ samples (in ns) at a scan point (see sequenceControl.DAQsamplePeriod).
+		return self.samplePeriods[self.index[scanValue]]
+
+	def acquisitionTimes(self):
+		#Returns the time (in s) taken to acquire the DAQ samples of each scan point, in the order of scanValues.
+		return [self.samplesPerPoint*self.samplePeriod(scanValue)*1e-9 for scanValue in self.scanValues]
+
+def compileSequences(sequence,sequenceArgsList,maxWorkers=None):
+	#Compiles the sequence for each list of arguments in sequenceArgsList (loading those already in the sequence cache), in a process pool if compiling them one after the other is expected to take more than parallelMinTime.
+	instructionArrays = [None]*len(sequenceArgsList)
+	if seqCache.enabled():
+		for i,sequenceArgs in enumerate(sequenceArgsList):
+			instructionArrays[i] = seqCache.load(seqCache.cacheKey(sequence,sequenceArgs))
+	toCompile = [i for i in range(0,len(sequenceArgsList)) if instructionArrays[i] is None]
+	if not toCompile:
+		return instructionArrays
+	import PBcontrol as PBctl
+	startTime = time.perf_counter()
+	instructionArrays[toCompile[0]] = PBctl.compileSequence(sequence,sequenceArgsList[toCompile[0]])
+	toCompile = toCompile[1:]
+	estimatedTime = (time.perf_counter()-startTime)*len(toCompile)
+	if ((os.cpu_count() or 1)>1) and (estimatedTime >= parallelMinTime):
+		print('Compiling',len(toCompile),'pulse sequences in parallel...')
+		with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+			for i,instructionArray in zip(toCompile,executor.map(PBctl.compileSequence,[sequence]*len(toCompile),[sequenceArgsList[i] for i in toCompile],chunksize=poolChunkSize)):
+				instructionArrays[i] = instructionArray
+	else:
+		for i in toCompile:
+			instructionArrays[i] = PBctl.compileSequence(sequence,sequenceArgsList[i])
+	return instructionArrays
+
+def compileScanPlan(expCfg,maxWorkers=None):
+	#Compiles the scan plan of an experiment (after mainControl.validateUserInput). Multiplexed T1 experiments (multiplexFactor>1) program groups of delays which change from run to run, so their plan only contains the single-delay sequences, used to estimate the duration of each scan point (the group sequences are compiled with compileSequences at the start of each run, see mainControl.runExperiment).
+	sequenceArgs = expCfg.updateSequenceArgs()
+	samplesPerPoint = 2*expCfg.Nsamples
+	if expCfg.sequence == 'ESRseq':
+		return ScanPlan(expCfg.scannedParam,compileSequences(expCfg.sequence,[sequenceArgs],maxWorkers),samplesPerPoint)
+	return ScanPlan(expCfg.scannedParam,compileSequences(expCfg.sequence,[[scanValue]+sequenceArgs for scanValue in expCfg.scannedParam],maxWorkers),samplesPerPoint)
@@ -0,0 +1,159 @@
+# sequenceCache.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# On-disk cache of compiled pulse sequences (the instruction arrays returned by PBcontrol.compileSequence), kept across
+# sessions in sequenceCachePath (see connectionConfig.py), so that scans which were run before start without recompiling
+# the sequence of every scan point.
+# Each instruction array (a structured array of bit mask, instruction, instruction data and duration) is stored as a .npy file,
+# named by a hash of everything the compiled sequence depends on: the sequence name, its arguments (time arguments as
+# integer numbers of PulseBlaster clock ticks) and the connection settings read by sequenceControl.py (see
+# sequenceSettingNames: the PulseBlaster clock frequency, the channel bit masks and the maximum DAQ sampling rate). The files are
+# kept in a subdirectory named by a hash of the source code of sequenceControl.py and PBcontrol.py (see version), so that
+# editing a sequence invalidates the cache: subdirectories of other versions are deleted the first time the cache is used.
+# When the cache exceeds sequenceCacheMaxMB, the least recently used files are deleted.
+import connectionConfig as conCfg
+import sequenceControl as seqCtl
+import numpy as np
+import hashlib
+import importlib.util
+import os
+
+# Fraction of sequenceCacheMaxMB to which the cache is reduced when it exceeds sequenceCacheMaxMB:
+evictionTarget = 0.8
+# Bump to invalidate all cached files if the file format (or the cache key) changes:
+formatVersion = 2
+# Connection settings read by sequenceControl.py (which copies them from connectionConfig.py when it is imported), included in the cache key:
+sequenceSettingNames = ['PBclk','DAQ_MaxSamplingRate','I','Q','STARTtrig','DAQ','AOM','uW']
+
+_version = None
+_cacheSize = None
+
+def version():
+	#Hash of the source code of the modules which compile sequences, and of the cache file format.
+	global _version
+	if _version is None:
+		digest = hashlib.sha1(str(formatVersion).encode())
+		#The source files are located without importing the modules (importing PBcontrol would load the SpinAPI driver):
+		for moduleName in ['sequenceControl','PBcontrol']:
+			with open(importlib.util.find_spec(moduleName).origin,'rb') as sourceFile:
+				digest.update(sourceFile.read())
+		_version = digest.hexdigest()[0:16]
+	return _version
+
+def enabled():
+	return conCfg.sequenceCachePath is not None
+
+def cacheRoot():
+	#sequenceCachePath, relative to the folder of the MaGNiFi scripts if it is a relative path (os.path.join returns absolute paths unchanged).
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)),conCfg.sequenceCachePath)
+
+def cacheFolder():
+	return os.path.join(cacheRoot(),version())
+
+def keyValue(value):
+	#Normalizes a sequence argument for the cache key: times on the PulseBlaster clock grid are converted to integer numbers of clock ticks (so that e.g. 300 and 300.0000001 give the same key), lists are normalized element-wise.
+	if isinstance(value,(list,tuple,np.ndarray)):
+		return [keyValue(element) for element in value]
+	if isinstance(value,(int,float,np.integer,np.floating)) and not isinstance(value,bool):
+		t_min = 1e3/conCfg.PBclk
+		ticks = round(float(value)/t_min)
+		if abs(float(value)/t_min-ticks)<1e-6:
+			return ['ticks',int(ticks)]
+		return repr(float(value))
+	return repr(value)
+
+def cacheKey(sequence,sequenceArgs):
+	settings = [getattr(seqCtl,name) for name in sequenceSettingNames]
+	return hashlib.sha1(repr([sequence,keyValue(list(sequenceArgs)),settings]).encode()).hexdigest()
+
+def initialize():
+	#Creates the cache folder of the current version, deletes the folders of other versions and measures the size of the cache.
+	global _cacheSize
+	folder = cacheFolder()
+	os.makedirs(folder,exist_ok=True)
+	for entry in os.scandir(cacheRoot()):
+		if entry.is_dir() and entry.name != version():
+			try:
+				for cachedFile in os.scandir(entry.path):
+					os.remove(cachedFile.path)
+				os.rmdir(entry.path)
+			except OSError:
+				#e.g. the folder is being deleted by another process
+				pass
+	_cacheSize = sum(entry.stat().st_size for entry in os.scandir(folder))
+
+def load(key):
+	#Returns the cached instruction array of key, or None if it is not cached.
+	if _cacheSize is None:
+		initialize()
+	fileName = os.path.join(cacheFolder(),key+'.npy')
+	try:
+		instructionArray = np.load(fileName)
+		#Mark the file as recently used:
+		os.utime(fileName)
+	except (OSError,ValueError):
+		return None
+	if instructionArray.dtype != seqCtl.instructionDtype:
+		return None
+	return instructionArray
+
+def store(key,instructionArray):
+	#Saves an instruction array in the cache, then evicts the least recently used files if the cache has grown beyond sequenceCacheMaxMB.
+	global _cacheSize
+	if _cacheSize is None:
+		initialize()
+	fileName = os.path.join(cacheFolder(),key+'.npy')
+	try:
+		# Write to a temporary file first, so that other processes never read a partly written file:
+		with open(fileName+'.tmp','wb') as cacheFile:
+			np.save(cacheFile,instructionArray)
+		os.replace(fileName+'.tmp',fileName)
+	except OSError as excpt:
+		print('Warning: could not save the compiled sequence in the sequence cache. Exception details:', type(excpt).__name__,'.',excpt)
+		return
+	_cacheSize += os.path.getsize(fileName)
+	if _cacheSize > conCfg.sequenceCacheMaxMB*1e6:
+		evict()
+
+def evict():
+	#Deletes the least recently used files until the cache is reduced to evictionTarget*sequenceCacheMaxMB.
+	global _cacheSize
+	entries = sorted(os.scandir(cacheFolder()),key=lambda entry: entry.stat().st_mtime)
+	_cacheSize = sum(entry.stat().st_size for entry in entries)
+	for entry in entries:
+		if _cacheSize <= evictionTarget*conCfg.sequenceCacheMaxMB*1e6:
+			break
+		try:
+			size = entry.stat().st_size
+			os.remove(entry.path)
+			_cacheSize -= size
+		except OSError:
+			pass
+
+def clear():
+	#Deletes all cached sequences.
+	global _cacheSize
+	if os.path.isdir(cacheFolder()):
+		for entry in os.scandir(cacheFolder()):
+			os.remove(entry.path)
+	_cacheSize = 0
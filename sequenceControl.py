@@ -21,18 +21,23 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import matplotlib.pyplot as plt
 import math
 import numpy as np
 import sys
 from collections import namedtuple
-from spinapi import *
 from connectionConfig import *
 
+# A PulseBlaster channel (or short-pulse flag) bit mask, with the start times and durations of its pulses as int64 arrays of PulseBlaster clock ticks (see makeChannel):
 PBchannel = namedtuple('PBchannel',['channelNumber','startTimes','pulseDurations']) 
+# Compiled pulse sequences (instruction arrays) are structured arrays with one record per PulseBlaster instruction: output bit mask, opcode, instruction data and duration (in ns):
+instructionDtype = np.dtype([('bitMask',np.uint32),('inst',np.int32),('instData',np.int32),('duration',np.float64)])
 
 # Define t_min, time resolution of the PulseBlaster, given by 1/(clock frequency):
 t_min = 1e3/PBclk #in ns 
+# Time units (in ns), as in spinapi.py (defined here so that sequences can be compiled without loading the SpinAPI driver, see PBcontrol.py):
+ns = 1.0
+us = 1e3
+ms = 1e6
 
 #Short pulse flags:
 ONE_PERIOD = 0x200000
@@ -41,55 +46,61 @@ THREE_PERIOD = 0x600000
 FOUR_PERIOD = 0x800000 
 FIVE_PERIOD= 0xA00000
 
+def toTicks(times):
+	#Converts times (in ns, a number or a sequence of numbers) to an int64 array of PulseBlaster clock ticks.
+	return np.round(np.asarray(times,dtype=np.float64)/t_min).astype(np.int64)
+
+def makeChannel(channelNumber,startTimes,pulseDurations):
+	#Returns the PBchannel of the pulses with the given start times and durations (in ns).
+	return PBchannel(channelNumber,np.atleast_1d(toTicks(startTimes)),np.atleast_1d(toTicks(pulseDurations)))
+
+def shiftChannel(channel,shift):
+	#Returns a copy of channel with all its pulses delayed by shift (in ns).
+	return channel._replace(startTimes=channel.startTimes+toTicks(shift))
+
+def mergeChannels(channels):
+	#Returns a single PBchannel with the pulses of all the given channels, which must have the same channelNumber.
+	return PBchannel(channels[0].channelNumber,np.concatenate([channel.startTimes for channel in channels]),np.concatenate([channel.pulseDurations for channel in channels]))
+
 def plotSequence(instructions,channelMasks):
+	#Returns [t_us, channelPulses, yTicks]: the edge times (in us) and the level of each channel in channelMasks (offset by log2 of its bit mask, so that the channels are stacked) for plotting a compiled instruction array as step plots.
 	scalingFactor = 0.8
-	t_ns = [0,0]
-	pulses ={}
-	tDone = False
+	edgeTimes = np.concatenate([[0],np.cumsum(instructions['duration'])])
+	t_us = np.repeat(edgeTimes,2)/1e3
 	channelPulses=[]
 	for channelMask in channelMasks.values():
-		pulses[channelMask]=[0,channelMask&instructions[0][0]]
-		for i in range(0, len(instructions)):
-			currentPulseLength = instructions[i][3]
-			if not tDone:
-				previousEdgeTime = t_ns[-1]
-				nextEdgeTime = previousEdgeTime + currentPulseLength
-				t_ns.append(nextEdgeTime)
-				t_ns.append(nextEdgeTime)
-				if i == (len(instructions)-1):
-					tDone = True
-			if i==len(instructions)-1:
-				pulses[channelMask].append(channelMask&instructions[i][0])
-				pulses[channelMask].append(channelMask&instructions[i][0])
-			else:
-				pulses[channelMask].append(channelMask&instructions[i][0])
-				pulses[channelMask].append(channelMask&instructions[i+1][0])
-		t_us = np.divide(t_ns,1e3)
-		channelPulses.append(list(np.add(math.log(channelMask,2),np.multiply(list(pulses[channelMask]),scalingFactor/channelMask))))
+		levels = instructions['bitMask'] & channelMask
+		pulses = np.concatenate([[0],np.repeat(levels,2),levels[-1:]])
+		channelPulses.append(list(np.add(math.log(channelMask,2),np.multiply(pulses,scalingFactor/channelMask))))
 	yTicks = np.arange(math.log(min(channelMasks.values()),2), 1+math.log(max(channelMasks.values()),2),1)
 	return [t_us,channelPulses,yTicks]
 
+def sequencePeriod(instructions):
+	#Returns the duration (in ns) of one repetition of a compiled instruction array (as returned by PBcontrol.programPB).
+	return float(np.sum(instructions['duration']))
+
+def DAQsamplePeriod(instructions):
+	#Returns the mean time (in ns) between DAQ samples for a compiled instruction array, i.e. the sequence period divided by the number of DAQ sample-clock pulses (rising edges on the DAQ channel) in each repetition.
+	DAQon = (instructions['bitMask'] & DAQ) != 0
+	N_DAQpulses = int(np.count_nonzero(DAQon & ~np.roll(DAQon,1)))
+	return sequencePeriod(instructions)/max(N_DAQpulses,1)
+
 
 
 def sequenceEventCataloguer(channels):
-	#Catalogs sequence events in terms of consecutive rising edges on the channels provided. Returns a dictionary, channelBitMasks, whose keys are event (rising/falling edge) times and values are the channelBitMask which indicate which channels are on at that time.
-	eventCatalog ={} #dictionary where the keys are rising/falling edge times and the values are the channel bit masks which turn on/off at that time
-	for channel in channels:
-		channelMask = channel.channelNumber
-		endTimes = [startTime + pulseDuration for startTime, pulseDuration in zip(channel.startTimes,channel.pulseDurations)]
-		for eventTime in channel.startTimes+endTimes:
-			eventChannelMask = channelMask
-			if eventTime in eventCatalog.keys():
-				eventChannelMask = eventCatalog[eventTime]^channelMask 
-				#I'm XORing instead of ORing here in case someone has a zero-length pulse in the sequence. In that case, the XOR ensures that the channel does not turn on at the pulse start/end time. If we did an OR here, it would turn on and only turn off at the next event (which would have been a rising edge), so this would have given unexpected behaviour.
-			eventCatalog[eventTime]=eventChannelMask
-	channelBitMasks = {}
-	currentBitMask=0
-	channelBitMasks[0]=currentBitMask
-	for event in sorted(eventCatalog.keys()):
-		channelBitMasks[event]=currentBitMask^eventCatalog[event]
-		currentBitMask = channelBitMasks[event]
-	return channelBitMasks
+	#Catalogs sequence events in terms of consecutive rising edges on the channels provided. Returns [eventTimes, bitMasks]: the event (rising/falling edge) times, in PulseBlaster clock ticks and starting at 0, and the channel bit masks which indicate which channels are on from each event time to the next.
+	edgeTimes = np.concatenate([np.concatenate([channel.startTimes,channel.startTimes+channel.pulseDurations]) for channel in channels])
+	edgeMasks = np.concatenate([np.full(2*len(channel.startTimes),channel.channelNumber,dtype=np.int64) for channel in channels])
+	order = np.argsort(edgeTimes,kind='stable')
+	[eventTimes,firstEdges] = np.unique(edgeTimes[order],return_index=True)
+	# The bit mask of the channels which turn on/off at each event time. I'm XORing instead of ORing here in case someone has a zero-length pulse in the sequence. In that case, the XOR ensures that the channel does not turn on at the pulse start/end time. If we did an OR here, it would turn on and only turn off at the next event (which would have been a rising edge), so this would have given unexpected behaviour.
+	eventMasks = np.bitwise_xor.reduceat(edgeMasks[order],firstEdges)
+	bitMasks = np.bitwise_xor.accumulate(eventMasks)
+	if eventTimes[0] != 0:
+		# All channels are off until the first event:
+		eventTimes = np.concatenate([[0],eventTimes])
+		bitMasks = np.concatenate([[0],bitMasks])
+	return [eventTimes,bitMasks.astype(np.uint32)]
 
 ################--------------------------------------------- PulseBlaster Sequences---------------------------------------------------###################
 def makeSequence(sequence, args):
@@ -99,6 +110,8 @@ def makeSequence(sequence, args):
 		return makeRabiSeq(*args)
 	elif sequence == 'T1seq':
 		return makeT1Seq(*args)
+	elif sequence == 'T1multiplexSeq':
+		return makeMultiplexedT1Seq(*args)
 	elif sequence == 'T2seq':
 		return makeT2Seq(*args)
 	elif sequence == 'XY8seq':
@@ -107,19 +120,23 @@ def makeSequence(sequence, args):
 		return makecorrelationSpectSeq(*args)
 	elif sequence == 'optimReadoutSeq':
 		return makeReadoutDelaySweep(*args)
+	elif sequence == 'optimReadoutSingleShotSeq':
+		return makeSingleShotReadoutDelaySweep(*args)
 	else:
 		print('Error: requested sequence not recognised.')
 		sys.exit
 
-def makeESRseq(t_duration):
+# The padding arguments at the end of the sequence builders below (e.g. startPadding, uWtoAOM_delay) set the dead times inside the sequences. Their default values are safe for most setups;
+# shotRateOptimizer.py calculates the minimum safe values for a given setup (from the latencies in connectionConfig.py), which can be passed to the builders through the sequencePadding experiment parameter.
+def makeESRseq(t_duration,t_readoutBuffer=2*us):
 	t_sigAndref = 2*t_duration
 	t_startTrig = t_min*round(300*ns/t_min)
 	t_readout = t_min*round(300*ns/t_min)
-	t_readoutBuffer= t_min*round(2*us/t_min)
-	AOMchannel = PBchannel(AOM,[0],[t_sigAndref])
-	uWchannel = PBchannel(uW,[0],[t_sigAndref/2])
-	DAQchannel = PBchannel(DAQ,[(t_sigAndref/2)-t_readoutBuffer,t_sigAndref-t_readoutBuffer],[t_readout,t_readout])
-	STARTtrigchannel = PBchannel(STARTtrig,[0],[t_startTrig])
+	t_readoutBuffer= t_min*round(t_readoutBuffer/t_min)
+	AOMchannel = makeChannel(AOM,[0],[t_sigAndref])
+	uWchannel = makeChannel(uW,[0],[t_sigAndref/2])
+	DAQchannel = makeChannel(DAQ,[(t_sigAndref/2)-t_readoutBuffer,t_sigAndref-t_readoutBuffer],[t_readout,t_readout])
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
 	channels = [AOMchannel,DAQchannel,uWchannel, STARTtrigchannel]
 	return channels
 
@@ -127,29 +144,43 @@ def makeReadoutDelaySweep(t_readoutDelay,t_AOM):
 	t_startTrig = t_min*round(300*ns/t_min)
 	start_delay = t_min*round(5*us/t_min)-t_startTrig
 	t_readout = t_min*round(300*ns/t_min)
-	AOMchannel = PBchannel(AOM,[start_delay],[t_AOM])
-	DAQchannel = PBchannel(DAQ,[start_delay+t_readoutDelay],[t_readout])
-	STARTtrigchannel = PBchannel(STARTtrig,[start_delay+t_AOM],[2*t_min*round(5*us/t_min)+t_startTrig])
+	AOMchannel = makeChannel(AOM,[start_delay],[t_AOM])
+	DAQchannel = makeChannel(DAQ,[start_delay+t_readoutDelay],[t_readout])
+	STARTtrigchannel = makeChannel(STARTtrig,[start_delay+t_AOM],[2*t_min*round(5*us/t_min)+t_startTrig])
 	channels=[AOMchannel,DAQchannel, STARTtrigchannel]
 	return channels
-	
-def makeRabiSeq(t_uW,t_AOM,t_readoutDelay):
-	start_delay = t_min*round(1*us/t_min) + t_readoutDelay
+
+def makeSingleShotReadoutDelaySweep(t_readoutDelays,t_AOM):
+	#Single program sweeping through all the readout delays: segment i is a dark time followed by an AOM pulse, with one DAQ sample-clock pulse t_readoutDelays[i] after the AOM pulse starts. Segments are at least 1/DAQ_MaxSamplingRate long, so that consecutive DAQ pulses do not exceed the DAQ's maximum sampling rate.
+	t_startTrig = t_min*round(300*ns/t_min)
+	t_dark = t_min*round(5*us/t_min)
+	t_readout = t_min*round(300*ns/t_min)
+	t_segment = t_dark + max(t_AOM,max(t_readoutDelays)+t_readout)
+	t_segment = max(t_segment,t_min*math.ceil((1e9/DAQ_MaxSamplingRate)/t_min))
+	AOMstartTimes = t_segment*np.arange(0,len(t_readoutDelays))+t_dark
+	AOMchannel = makeChannel(AOM,AOMstartTimes,np.full(len(t_readoutDelays),t_AOM))
+	DAQchannel = makeChannel(DAQ,AOMstartTimes+np.asarray(t_readoutDelays),np.full(len(t_readoutDelays),t_readout))
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
+	channels=[AOMchannel,DAQchannel, STARTtrigchannel]
+	return channels
+
+def makeRabiSeq(t_uW,t_AOM,t_readoutDelay,startPadding=1*us,uWtoAOM_delay=1*us):
+	start_delay = t_min*round(startPadding/t_min) + t_readoutDelay
 	t_startTrig = t_min*round(300*ns/t_min)
 	t_readout = t_min*round(300*ns/t_min)
-	uWtoAOM_delay =t_min*round(1*us/t_min)	
+	uWtoAOM_delay =t_min*round(uWtoAOM_delay/t_min)	
 	firstHalfDuration = start_delay + t_uW + uWtoAOM_delay+t_AOM
 	if t_uW <=5*t_min and t_uW>0:
-		uWchannel = PBchannel(uW,[start_delay],[5*t_min])
+		uWchannel = makeChannel(uW,[start_delay],[5*t_min])
 		shortpulseFLAG = int((t_uW/2)*ONE_PERIOD)
-		shortPulseChannel =PBchannel(shortpulseFLAG, [start_delay],[5*t_min])
+		shortPulseChannel =makeChannel(shortpulseFLAG, [start_delay],[5*t_min])
 		channels = [shortPulseChannel,uWchannel]#Short pulse feature
 	else:
-		uWchannel = PBchannel(uW,[start_delay],[t_uW])
+		uWchannel = makeChannel(uW,[start_delay],[t_uW])
 		channels = [uWchannel]
-	AOMchannel = PBchannel(AOM,[firstHalfDuration-t_AOM,2*firstHalfDuration-t_AOM],[t_AOM,t_AOM])
-	DAQchannel = PBchannel(DAQ,[firstHalfDuration-t_AOM+t_readoutDelay,2*firstHalfDuration-t_AOM+t_readoutDelay],[t_readout,t_readout])
-	STARTtrigchannel = PBchannel(STARTtrig,[0],[t_startTrig])
+	AOMchannel = makeChannel(AOM,[firstHalfDuration-t_AOM,2*firstHalfDuration-t_AOM],[t_AOM,t_AOM])
+	DAQchannel = makeChannel(DAQ,[firstHalfDuration-t_AOM+t_readoutDelay,2*firstHalfDuration-t_AOM+t_readoutDelay],[t_readout,t_readout])
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
 	channels.extend([AOMchannel,DAQchannel, STARTtrigchannel])
 	return channels
 
@@ -160,19 +191,33 @@ def makeT1Seq(t_delay,t_AOM,t_readoutDelay,t_pi):
 	AOMstartTime1 = t_delay
 	firstHalfDuration=AOMstartTime1+t_AOM
 	AOMstartTime2 =  firstHalfDuration+AOMstartTime1 
-	AOMchannel = PBchannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
-	uWchannel = PBchannel(uW,[firstHalfDuration +t_readoutDelay + t_min*round(1*us/t_min)],[t_pi])
-	DAQchannel = PBchannel(DAQ,[AOMstartTime1+t_readoutDelay, AOMstartTime2+t_readoutDelay],[t_readout,t_readout])
-	STARTtrigchannel = PBchannel(STARTtrig,[0],[t_startTrig])
+	AOMchannel = makeChannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
+	uWchannel = makeChannel(uW,[firstHalfDuration +t_readoutDelay + t_min*round(1*us/t_min)],[t_pi])
+	DAQchannel = makeChannel(DAQ,[AOMstartTime1+t_readoutDelay, AOMstartTime2+t_readoutDelay],[t_readout,t_readout])
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
 	channels = [AOMchannel,DAQchannel,uWchannel, STARTtrigchannel]
 	return channels
 	
-def makeT2Seq(t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding, numberOfPiPulses):
+def makeMultiplexedT1Seq(t_delays,t_AOM,t_readoutDelay,t_pi):
+	#Single program measuring several T1 delays: the T1 sequence of each delay in t_delays (see makeT1Seq) is played in turn, so that each repetition gives a signal and a background DAQ gate for each delay, in the order of t_delays.
+	#The laser pulse which reads out one wait also initializes the spins for the next, so the segments follow each other without extra padding.
+	segmentChannels = {}
+	segmentStart = 0
+	for t_delay in t_delays:
+		for channel in makeT1Seq(t_delay,t_AOM,t_readoutDelay,t_pi):
+			if channel.channelNumber == STARTtrig and segmentStart>0:
+				continue #one start trigger per repetition
+			segmentChannels.setdefault(channel.channelNumber,[]).append(shiftChannel(channel,segmentStart))
+		segmentStart += 2*(t_delay+t_AOM)
+	channels = [mergeChannels(channelSegments) for channelSegments in segmentChannels.values()]
+	return channels
+	
+def makeT2Seq(t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding, numberOfPiPulses,startPadding=1*us,uWtoAOM_delay=1*us):
 	t_piby2=t_pi/2
 	t_startTrig = t_min*round(300*ns/t_min)
 	t_readout = t_min*round(300*ns/t_min)
-	uWtoAOM_delay =t_min*round(1*us/t_min)
-	start_delay = (t_min*round(1*us/t_min) + t_readoutDelay) 
+	uWtoAOM_delay =t_min*round(uWtoAOM_delay/t_min)
+	start_delay = (t_min*round(startPadding/t_min) + t_readoutDelay) 
 	#Make pulses for signal half of the sequence:
 	[uWstartTimes1,uWdurations,IstartTimes1,Idurations,QstartTimes1,Qdurations]= makeCPMGpulses(start_delay,numberOfPiPulses,t_delay,t_pi, t_piby2,IQpadding)
 	CPMGduration = uWstartTimes1[-1]+t_piby2-start_delay
@@ -180,30 +225,26 @@ def makeT2Seq(t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding, numberOfPiPulses):
 	DAQstartTime1 = AOMstartTime1+t_readoutDelay
 	firstHalfDuration = AOMstartTime1+t_AOM 
 	#Make pulses for background half of the sequence:
-	uWstartTimes2 =[x+firstHalfDuration for x in uWstartTimes1]
-	#IstartTimes2 = [x+firstHalfDuration for x in IstartTimes1]
-	QstartTimes2nd = QstartTimes1[:-1]
-	QstartTimes2 = [x+firstHalfDuration for x in QstartTimes2nd]
+	uWstartTimes2 = uWstartTimes1+firstHalfDuration
+	QstartTimes2 = QstartTimes1[:-1]+firstHalfDuration
 	AOMstartTime2 = firstHalfDuration + AOMstartTime1
 	DAQstartTime2 = firstHalfDuration + DAQstartTime1
-	#Make full uW, I and Q pulse lists
-	uWstartTimes=uWstartTimes1 +uWstartTimes2
 	#Make channels:
-	AOMchannel 		 = PBchannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
-	DAQchannel 		 = PBchannel(DAQ,[DAQstartTime1,DAQstartTime2],[t_readout,t_readout])
-	uWchannel  		 = PBchannel(uW,uWstartTimes1 +uWstartTimes2,uWdurations+uWdurations)
-	Ichannel   		 = PBchannel(I,IstartTimes1,Idurations)
-	Qchannel   		 = PBchannel(Q,QstartTimes1+QstartTimes2,Qdurations+Qdurations[:-1])
-	STARTtrigchannel = PBchannel(STARTtrig,[0],[t_startTrig])
+	AOMchannel 		 = makeChannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
+	DAQchannel 		 = makeChannel(DAQ,[DAQstartTime1,DAQstartTime2],[t_readout,t_readout])
+	uWchannel  		 = makeChannel(uW,np.concatenate([uWstartTimes1,uWstartTimes2]),np.tile(uWdurations,2))
+	Ichannel   		 = makeChannel(I,IstartTimes1,Idurations)
+	Qchannel   		 = makeChannel(Q,np.concatenate([QstartTimes1,QstartTimes2]),np.concatenate([Qdurations,Qdurations[:-1]]))
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
 	channels=[AOMchannel,DAQchannel, uWchannel, Ichannel, Qchannel, STARTtrigchannel]
 	return channels
 	
-def makeXY8seq(t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding, numberOfRepeats):
+def makeXY8seq(t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding, numberOfRepeats,startPadding=1*us,uWtoAOM_delay=1*us):
 	t_piby2=t_pi/2
 	t_startTrig = t_min*round(300*ns/t_min)
 	t_readout = t_min*round(300*ns/t_min)
-	uWtoAOM_delay =t_min*round(1*us/t_min)
-	start_delay = (t_min*round(1*us/t_min) + t_readoutDelay) 
+	uWtoAOM_delay =t_min*round(uWtoAOM_delay/t_min)
+	start_delay = (t_min*round(startPadding/t_min) + t_readoutDelay) 
 	#Make pulses for signal half of the sequence:
 	[uWstartTimes1,uWdurations,IstartTimes1,Idurations,QstartTimes1,Qdurations]= makeXY8pulses(start_delay,numberOfRepeats,t_delay,t_pi, t_piby2,IQpadding)
 	XY8duration = uWstartTimes1[-1]+t_pi/2-start_delay
@@ -211,34 +252,33 @@ def makeXY8seq(t_delay,t_AOM,t_readoutDelay,t_pi,IQpadding, numberOfRepeats):
 	DAQstartTime1 = AOMstartTime1+t_readoutDelay
 	firstHalfDuration = AOMstartTime1+t_AOM 
 	#Make pulses for background half of the sequence:
-	uWstartTimes2 =[x+firstHalfDuration for x in uWstartTimes1]
-	QstartTimes2nd = QstartTimes1[:-1]
-	QstartTimes2 = [x+firstHalfDuration for x in QstartTimes2nd]
+	uWstartTimes2 = uWstartTimes1+firstHalfDuration
+	QstartTimes2 = QstartTimes1[:-1]+firstHalfDuration
 	AOMstartTime2 = firstHalfDuration + AOMstartTime1
 	DAQstartTime2 = firstHalfDuration + DAQstartTime1
 	#Make channels:
-	AOMchannel 		 = PBchannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
-	DAQchannel 		 = PBchannel(DAQ,[DAQstartTime1,DAQstartTime2],[t_readout,t_readout])
-	uWchannel  		 = PBchannel(uW,uWstartTimes1 +uWstartTimes2,uWdurations+uWdurations)
-	Ichannel   		 = PBchannel(I,IstartTimes1,Idurations)
-	Qchannel   		 = PBchannel(Q,QstartTimes1+QstartTimes2,Qdurations+Qdurations[:-1])
-	STARTtrigchannel = PBchannel(STARTtrig,[0],[t_startTrig])
+	AOMchannel 		 = makeChannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
+	DAQchannel 		 = makeChannel(DAQ,[DAQstartTime1,DAQstartTime2],[t_readout,t_readout])
+	uWchannel  		 = makeChannel(uW,np.concatenate([uWstartTimes1,uWstartTimes2]),np.tile(uWdurations,2))
+	Ichannel   		 = makeChannel(I,IstartTimes1,Idurations)
+	Qchannel   		 = makeChannel(Q,np.concatenate([QstartTimes1,QstartTimes2]),np.concatenate([Qdurations,Qdurations[:-1]]))
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
 	channels=[AOMchannel,DAQchannel, uWchannel, Ichannel, Qchannel, STARTtrigchannel]
 	return channels
 	
 	
-def makecorrelationSpectSeq(t_delay_betweenXY8seqs,t_delay, t_AOM,t_readoutDelay,t_pi,IQpadding,numberOfRepeats):
+def makecorrelationSpectSeq(t_delay_betweenXY8seqs,t_delay, t_AOM,t_readoutDelay,t_pi,IQpadding,numberOfRepeats,start_delay=2*us,uWtoAOM_delay=1*us):
 	t_piby2=t_pi/2
 	t_startTrig = t_min*round(300*ns/t_min)
 	t_readout = t_min*round(300*ns/t_min)
-	uWtoAOM_delay =t_min*round(1*us/t_min)
-	start_delay = t_min*round(2*us/t_min)
+	uWtoAOM_delay =t_min*round(uWtoAOM_delay/t_min)
+	start_delay = t_min*round(start_delay/t_min)
 	#Make pulses for first XY8 in the first half of the sequence (I only pulses in second XY8 of second half, so we will take the I times here and shift them in time):
 	[uWstartTimes1a,uWdurations1a,IstartTimes,Idurations,QstartTimes1a,Qdurations1a]= makeXY8pulses(start_delay,numberOfRepeats,t_delay,t_pi, t_piby2,IQpadding)
 	#Make pulses for second XY8 in the first half of the sequence:
 	firstXY8duration = uWstartTimes1a[-1]+t_piby2
-	uWstartTimes1b = [x+firstXY8duration + t_delay_betweenXY8seqs for x in uWstartTimes1a]
-	QstartTimes1b = [x +firstXY8duration + t_delay_betweenXY8seqs for x in QstartTimes1a]
+	uWstartTimes1b = uWstartTimes1a+firstXY8duration+t_delay_betweenXY8seqs
+	QstartTimes1b = QstartTimes1a+firstXY8duration+t_delay_betweenXY8seqs
 	Qdurations1b = Qdurations1a
 	#Make AOM pulse and DAQ pulse for signal half
 	XY8duration = uWstartTimes1b[-1]+t_pi/2-start_delay
@@ -247,102 +287,66 @@ def makecorrelationSpectSeq(t_delay_betweenXY8seqs,t_delay, t_AOM,t_readoutDelay
 	firstHalfDuration = AOMstartTime1+t_AOM 
 		
 	#Make pulses for first XY8 in the second half of the sequence (no I's on this half):
-	uWstartTimes2 = [x+firstHalfDuration for x in uWstartTimes1a+uWstartTimes1b]
-	QstartTimes2 = [x+firstHalfDuration for x in QstartTimes1a+QstartTimes1b[:-1]]
+	uWstartTimes2 = np.concatenate([uWstartTimes1a,uWstartTimes1b])+firstHalfDuration
+	QstartTimes2 = np.concatenate([QstartTimes1a,QstartTimes1b[:-1]])+firstHalfDuration
 	AOMstartTime2 = firstHalfDuration + AOMstartTime1
 	DAQstartTime2 = firstHalfDuration + DAQstartTime1
-	IstartTimes = [x +firstHalfDuration+firstXY8duration+t_delay_betweenXY8seqs for x in IstartTimes]
+	IstartTimes = IstartTimes+firstHalfDuration+firstXY8duration+t_delay_betweenXY8seqs
 	
 	#concatenate pulse times:
-	uWstartTimes = uWstartTimes1a+uWstartTimes1b+uWstartTimes2
-	uWdurations = uWdurations1a*4
-	QstartTimes = QstartTimes1a+QstartTimes1b+QstartTimes2
-	Qdurations = Qdurations1a+Qdurations1b+Qdurations1a+Qdurations1b[:-1]
+	uWstartTimes = np.concatenate([uWstartTimes1a,uWstartTimes1b,uWstartTimes2])
+	uWdurations = np.tile(uWdurations1a,4)
+	QstartTimes = np.concatenate([QstartTimes1a,QstartTimes1b,QstartTimes2])
+	Qdurations = np.concatenate([Qdurations1a,Qdurations1b,Qdurations1a,Qdurations1b[:-1]])
 	
 	#Make channels:
-	AOMchannel 		 = PBchannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
-	DAQchannel 		 = PBchannel(DAQ,[DAQstartTime1,DAQstartTime2],[t_readout,t_readout])
-	uWchannel  		 = PBchannel(uW,uWstartTimes,uWdurations)
-	Ichannel   		 = PBchannel(I,IstartTimes,Idurations)
-	Qchannel   		 = PBchannel(Q,QstartTimes,Qdurations)
-	STARTtrigchannel = PBchannel(STARTtrig,[0],[t_startTrig])
+	AOMchannel 		 = makeChannel(AOM,[AOMstartTime1,AOMstartTime2],[t_AOM,t_AOM])
+	DAQchannel 		 = makeChannel(DAQ,[DAQstartTime1,DAQstartTime2],[t_readout,t_readout])
+	uWchannel  		 = makeChannel(uW,uWstartTimes,uWdurations)
+	Ichannel   		 = makeChannel(I,IstartTimes,Idurations)
+	Qchannel   		 = makeChannel(Q,QstartTimes,Qdurations)
+	STARTtrigchannel = makeChannel(STARTtrig,[0],[t_startTrig])
 	channels=[AOMchannel,DAQchannel, uWchannel, Ichannel, Qchannel, STARTtrigchannel]
 	return channels
 		
 def makeCPMGpulses(start_delay,numberOfPiPulses,t_delay,t_pi, t_piby2,IQpadding):
+	#Returns the start times and durations (in ns, as arrays) of the uW, I and Q pulses of a CPMG sequence.
 	t_piby4 = t_piby2/2;
 	if numberOfPiPulses == 1:
-		uWstartTimes = [start_delay, start_delay +t_delay-t_piby4, start_delay +2*t_delay] 
-		uWdurations =  [t_piby2, t_pi, t_piby2]
+		uWstartTimes = np.array([start_delay, start_delay +t_delay-t_piby4, start_delay +2*t_delay])
+		uWdurations =  np.array([t_piby2, t_pi, t_piby2])
 	else:
 		half_t_delay = t_delay/2
-		#Start off the sequence by adding the initial pi/2 and first pi pulse
-		uWstartTimes =[start_delay, start_delay +half_t_delay-t_piby4] 
-		uWdurations =[t_piby2, t_pi]
-		#Add remaining pi pulses:
-		for i in range(1,numberOfPiPulses):
-			currentEdgeTime = uWstartTimes[-1]+t_delay
-			uWstartTimes.append(currentEdgeTime)
-			uWdurations.append(t_pi)
-		#Append the final pi/2 pulse:
-		uWstartTimes.append(uWstartTimes[-1]+half_t_delay+t_piby4)
-		uWdurations.append(t_piby2)
+		#Pi pulses, the first one half a delay after the initial pi/2 pulse:
+		piPulseStartTimes = start_delay +half_t_delay-t_piby4 + t_delay*np.arange(0,numberOfPiPulses)
+		#Add the initial pi/2 pulse and the final pi/2 pulse:
+		uWstartTimes = np.concatenate([[start_delay],piPulseStartTimes,[piPulseStartTimes[-1]+half_t_delay+t_piby4]])
+		uWdurations = np.concatenate([[t_piby2],np.full(numberOfPiPulses,t_pi),[t_piby2]])
 	#Make the I and Q channel pulses:
 	#Q is ON during pi(y) pulses and the final pi/2(-x), but not the first pi/2(x) pulse
-	QstartTimes = [x-IQpadding for x in uWstartTimes[1:]]
-	Qdurations=[x +2*IQpadding for x in uWdurations[1:]]
+	QstartTimes = uWstartTimes[1:]-IQpadding
+	Qdurations = uWdurations[1:]+2*IQpadding
 	#I is only on during the final pi/2(-x) pulse:
-	IstartTimes =[x-IQpadding for x in [uWstartTimes[-1]]]
-	Idurations =[x +2*IQpadding for x in [uWdurations[-1]]]
+	IstartTimes = uWstartTimes[-1:]-IQpadding
+	Idurations = uWdurations[-1:]+2*IQpadding
 	return [uWstartTimes,uWdurations,IstartTimes,Idurations,QstartTimes,Qdurations]
 	
 def makeXY8pulses(start_delay,numberOfRepeats,t_delay,t_pi, t_piby2,IQpadding):
+	#Returns the start times and durations (in ns, as arrays) of the uW, I and Q pulses of an XY8-N sequence (N = numberOfRepeats).
 	t_piby4=t_piby2/2
-	#Start off the sequence by adding the initial pi/2:
 	half_t_delay = t_delay/2
-	uWstartTimes =[start_delay] 
-	uWdurations =[t_piby2]
-	QstartTimes=[]
-	Qdurations =[]
-	#Add remaining pi pulses:
-	firstPiPulseDone = False
-	for i in range(0,numberOfRepeats):
-		#Make next 8 pi pulses:
-		next8piPulseStartTimes =[]
-		next8piPulseDurations=[]
-		#Add the first pulse in the set of 8
-		currentEdgeTime=0
-		if not firstPiPulseDone:
-			currentEdgeTime = uWstartTimes[-1]+half_t_delay-t_piby4
-			firstPiPulseDone=True
-		else:
-			currentEdgeTime = uWstartTimes[-1]+t_delay
-		next8piPulseStartTimes.append(currentEdgeTime)
-		next8piPulseDurations.append(t_pi)
-		for j in range (1,8):
-			newEdgeTime = next8piPulseStartTimes[-1]+t_delay
-			next8piPulseStartTimes.append(newEdgeTime)
-			next8piPulseDurations.append(t_pi)
-		# Make next 8 Q start times (Q is only on for pulses 1,3,4,6 of the xy8 pi pulses, for a 0-indexed sequence):
-		next8QstartTimes = list(next8piPulseStartTimes[i] for i in [1,3,4,6])
-		next8Qdurations = list(next8piPulseDurations[i] for i in [1,3,4,6])
-		# Append next 8 pi pulses and Q pulses to start times lists:
-		uWstartTimes.extend(next8piPulseStartTimes)
-		uWdurations.extend(next8piPulseDurations)
-		QstartTimes.extend(next8QstartTimes)
-		Qdurations.extend(next8Qdurations)
-		
-	#Append the final pi/2 pulse:
-	uWstartTimes.append(uWstartTimes[-1]+half_t_delay+t_piby4)
-	uWdurations.append(t_piby2)
-	#Append the final pi/2 pulse to Q channel since (in the signal bin) Q is on for this pulse as it is a -x pulse.
-	QstartTimes.append(uWstartTimes[-1])
-	Qdurations.append(uWdurations[-1])
+	#Pi pulses, the first one half a delay after the initial pi/2 pulse:
+	piPulseStartTimes = start_delay+half_t_delay-t_piby4 + t_delay*np.arange(0,8*numberOfRepeats)
+	lastPulseStartTime = piPulseStartTimes[-1] if numberOfRepeats else start_delay
+	#Add the initial pi/2 pulse and the final pi/2 pulse:
+	uWstartTimes = np.concatenate([[start_delay],piPulseStartTimes,[lastPulseStartTime+half_t_delay+t_piby4]])
+	uWdurations = np.concatenate([[t_piby2],np.full(8*numberOfRepeats,t_pi),[t_piby2]])
+	# Q is only on for pulses 1,3,4,6 of each set of 8 xy8 pi pulses (for a 0-indexed sequence), and for the final pi/2 pulse since (in the signal bin) it is a -x pulse:
+	Qpulses = np.concatenate([[False],np.isin(np.arange(0,8*numberOfRepeats)%8,[1,3,4,6]),[True]])
 	#Pad the Q channel pulses:
-	QstartTimes = [x-IQpadding for x in QstartTimes]
-	Qdurations=[x +2*IQpadding for x in Qdurations]
+	QstartTimes = uWstartTimes[Qpulses]-IQpadding
+	Qdurations = uWdurations[Qpulses]+2*IQpadding
 	#Make I channel pulses. I is only on during the final pi/2(-x) pulse:
-	IstartTimes =[x-IQpadding for x in [uWstartTimes[-1]]]
-	Idurations =[x +2*IQpadding for x in [uWdurations[-1]]]
+	IstartTimes = uWstartTimes[-1:]-IQpadding
+	Idurations = uWdurations[-1:]+2*IQpadding
 	return [uWstartTimes,uWdurations,IstartTimes,Idurations,QstartTimes,Qdurations]
-	
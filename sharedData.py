@@ -0,0 +1,202 @@
+# sharedData.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Shared-memory data plane
+
+If sharedMemoryName is set in connectionConfig.py, mainControl.runExperiment allocates its data arrays in a shared memory
+block of that name, so that other processes (e.g. a fitting, FFT or plotting script running on another core) can read
+the data of an experiment while it runs, without the acquisition loop doing any extra work for them and without
+rereading the saved text files.
+
+The block starts with a header of int64 values (see headerFields), followed by the float64 arrays in arrayLayout:
+ *scanOrder, signalCurrentRun, backgroundCurrentRun, contrastCurrentRun: the scan points of the current run in the
+  order they are measured, and the values measured so far at these points.
+ *scannedParam: the scan points in increasing order, and signal, background, contrast: (N_scanPts, Navg) arrays of the
+  completed runs, sorted by scan point (one column per run, as in mainControl.runExperiment).
+ *rawShots: if shareRawShots is set in connectionConfig.py, the raw DAQ readings (alternating signal and background
+  readings) of the last measured scan point (or group of scan points, in multiplexed T1 experiments), whose index is
+  header field rawScanPoint and whose number of readings is rawCount.
+
+Consistency is ensured by a seqlock: the first header field, version, is incremented by the writer before and after
+every update, so it is odd while an update is in progress. A reader takes a consistent snapshot by reading version,
+copying the data, and checking that version is even and unchanged (see snapshot). Readers that want to avoid the copy
+can work directly on the zero-copy arrays between readBegin and readRetry, and discard their result if readRetry
+returns True. Readers never block the writer.
+
+To monitor an experiment from another command prompt while it runs, call:
+ python sharedData.py <sharedMemoryName>
+"""
+#Imports
+import numpy as np
+from multiprocessing import shared_memory
+import contextlib
+import sys
+import time
+
+headerFields = ['version','state','i_run','i_scanPoint','runsCompleted','N_scanPts','Navg','rawLength','rawScanPoint','rawCount']
+headerLength = 16 #int64 values, including spare values for future fields
+headerIndex = {name:i for i,name in enumerate(headerFields)}
+# State of the experiment (header field state):
+RUNNING = 1
+FINISHED = 2
+
+def arrayLayout(N_scanPts,Navg,rawLength):
+	#Returns the [name, shape] of each float64 array of the data plane, in the order they are stored.
+	return [['scanOrder',(N_scanPts,)],['signalCurrentRun',(N_scanPts,)],['backgroundCurrentRun',(N_scanPts,)],['contrastCurrentRun',(N_scanPts,)],
+			['scannedParam',(N_scanPts,)],['signal',(N_scanPts,Navg)],['background',(N_scanPts,Navg)],['contrast',(N_scanPts,Navg)],['rawShots',(rawLength,)]]
+
+def blockSize(N_scanPts,Navg,rawLength):
+	return 8*(headerLength + sum(int(np.prod(shape)) for [name,shape] in arrayLayout(N_scanPts,Navg,rawLength)))
+
+def mapArrays(buffer,N_scanPts,Navg,rawLength):
+	#Returns the header and a dictionary of the arrays, as NumPy views of buffer.
+	header = np.ndarray((headerLength,),dtype=np.int64,buffer=buffer)
+	arrays = {}
+	offset = 8*headerLength
+	for [name,shape] in arrayLayout(N_scanPts,Navg,rawLength):
+		arrays[name] = np.ndarray(shape,dtype=np.float64,buffer=buffer,offset=offset)
+		offset += 8*int(np.prod(shape))
+	return [header,arrays]
+
+def allocateArrays(N_scanPts,Navg,rawLength=0):
+	#Returns a dictionary of private (not shared) zeroed arrays with the layout of the data plane, used when no shared memory is configured.
+	return {name:np.zeros(shape) for [name,shape] in arrayLayout(N_scanPts,Navg,rawLength)}
+
+class DataPlane:
+	def __init__(self,sharedMemory,owner):
+		self.sharedMemory = sharedMemory
+		self.owner = owner
+		self.header = np.ndarray((headerLength,),dtype=np.int64,buffer=sharedMemory.buf)
+		[N_scanPts,Navg,rawLength] = [int(self.header[headerIndex[name]]) for name in ['N_scanPts','Navg','rawLength']]
+		[self.header,self.arrays] = mapArrays(sharedMemory.buf,N_scanPts,Navg,rawLength)
+
+	@classmethod
+	def create(cls,name,N_scanPts,Navg,rawLength=0):
+		#Allocates the data plane of an experiment (called by mainControl.runExperiment). A block left behind by an experiment which did not finish cleanly is replaced.
+		size = blockSize(N_scanPts,Navg,rawLength)
+		try:
+			sharedMemory = shared_memory.SharedMemory(name=name,create=True,size=size)
+		except FileExistsError:
+			stale = shared_memory.SharedMemory(name=name)
+			stale.close()
+			stale.unlink()
+			sharedMemory = shared_memory.SharedMemory(name=name,create=True,size=size)
+		sharedMemory.buf[0:size] = bytes(size)
+		header = np.ndarray((headerLength,),dtype=np.int64,buffer=sharedMemory.buf)
+		for [field,value] in [['N_scanPts',N_scanPts],['Navg',Navg],['rawLength',rawLength],['rawScanPoint',-1],['i_run',-1],['i_scanPoint',-1],['state',RUNNING]]:
+			header[headerIndex[field]] = value
+		del header
+		return cls(sharedMemory,owner=True)
+
+	@classmethod
+	def attach(cls,name):
+		#Attaches to the data plane of a running (or finished) experiment, for reading.
+		try:
+			sharedMemory = shared_memory.SharedMemory(name=name,track=False)
+		except TypeError:
+			#Before Python 3.13, attaching processes register the block with the resource tracker, which would destroy it when they exit:
+			sharedMemory = shared_memory.SharedMemory(name=name)
+			if sys.platform != 'win32':
+				from multiprocessing import resource_tracker
+				resource_tracker.unregister(sharedMemory._name,'shared_memory')
+		return cls(sharedMemory,owner=False)
+
+	##-------------------- Writer--------------------
+	@contextlib.contextmanager
+	def writing(self,**headerValues):
+		#Brackets an update of the arrays by the writer, and sets the given header fields (e.g. i_run, i_scanPoint) at the end of the update.
+		self.header[0] += 1
+		try:
+			yield self.arrays
+		finally:
+			for [field,value] in headerValues.items():
+				self.header[headerIndex[field]] = value
+			self.header[0] += 1
+
+	def close(self):
+		#Releases the block. The writer marks the experiment as finished and destroys the block (processes still attached keep their mapping until they close it).
+		if self.owner:
+			with self.writing(state=FINISHED):
+				pass
+		self.header = None
+		self.arrays = None
+		try:
+			self.sharedMemory.close()
+		except BufferError:
+			#Views of the arrays are still referenced by the caller: the mapping is released when they are garbage-collected.
+			pass
+		if self.owner:
+			self.sharedMemory.unlink()
+
+	##-------------------- Readers--------------------
+	def readBegin(self):
+		#Waits until no update is in progress and returns the current version.
+		while True:
+			version = int(self.header[0])
+			if not version%2:
+				return version
+			time.sleep(0)
+
+	def readRetry(self,version):
+		#Returns True if the data was updated since readBegin returned version, i.e. if what was read since must be discarded.
+		return int(self.header[0]) != version
+
+	def readHeader(self):
+		return {name:int(self.header[i]) for i,name in enumerate(headerFields)}
+
+	def snapshot(self,names=None,maxAttempts=1000):
+		#Returns [header, arrays]: a consistent copy of the header and of the named arrays (all arrays if names is None), or None if no consistent copy could be taken in maxAttempts attempts.
+		names = list(self.arrays.keys()) if names is None else names
+		for attempt in range(0,maxAttempts):
+			version = self.readBegin()
+			header = self.readHeader()
+			arrays = {name:np.array(self.arrays[name]) for name in names}
+			if not self.readRetry(version):
+				return [header,arrays]
+		print('Warning: could not take a consistent snapshot of the shared data after',maxAttempts,'attempts.')
+		return None
+
+def writing(dataPlane,**headerValues):
+	#dataPlane.writing, or a context which does nothing if dataPlane is None (no shared memory configured).
+	if dataPlane is None:
+		return contextlib.nullcontext()
+	return dataPlane.writing(**headerValues)
+
+if __name__ == "__main__":
+	if len(sys.argv)!=2:
+		print('Usage: python sharedData.py <sharedMemoryName>')
+		sys.exit()
+	dataPlane = DataPlane.attach(sys.argv[1])
+	try:
+		while True:
+			[header,arrays] = dataPlane.snapshot(['contrastCurrentRun','contrast'])
+			print('Run',header['i_run']+1,'of',header['Navg'],', scan point',header['i_scanPoint']+1,'of',header['N_scanPts'],
+				', mean contrast of completed runs:',np.mean(arrays['contrast'][:,0:header['runsCompleted']]) if header['runsCompleted'] else None)
+			if header['state'] == FINISHED:
+				break
+			time.sleep(1)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		dataPlane.close()
@@ -0,0 +1,126 @@
+# shotRateOptimizer.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Shot-rate optimizer
+
+The pulse sequences contain fixed dead times (padding): e.g. a 1us wait plus t_readoutDelay before the first microwave
+pulse and a 1us wait between the last microwave pulse and the laser pulse in the Rabi, T2 and XY8 sequences. For short
+scans, these dominate the sequence period, so far fewer shots per second are taken than the hardware allows.
+
+This script calculates the minimum safe padding of an experiment from the latencies of the setup (AOM_FallTime,
+uW_SwitchTime and paddingMargin, entered in connectionConfig.py):
+ *startPadding (or start_delay, for correlation spectroscopy): after the end of a laser pulse, the light stays on for
+  t_readoutDelay (the AOM propagation delay) and then takes AOM_FallTime to switch off. The first microwave pulse, and the
+  I/Q pulses which start IQpadding before it, must only start after that.
+ *uWtoAOM_delay: the microwave switch (and the I/Q pulses, which end IQpadding after the last microwave pulse) must have
+  switched off before the laser pulse starts.
+ *t_readoutBuffer (ESR): the DAQ gate must end before the microwaves are switched off at the end of the signal half.
+Each minimum is increased by paddingMargin and rounded up to the PulseBlaster time resolution. If the tightened sequence
+is so short that the DAQ gates would exceed DAQ_MaxSamplingRate, the start padding is lengthened until they do not.
+
+The script then compiles the default and tightened sequences of every scan point (without programming the PulseBlaster)
+and reports the gain in shot rate at each scan point and in total acquisition time. The tightened padding is printed as
+a sequencePadding dictionary, which can be added to the experiment config file (e.g. sequencePadding = {...} in
+XY8config.py, or "sequencePadding": {...} in a JSON config file) to run the tightened sequence variant.
+Note that, in the ESR sequence, the padding does not set the sequence period (which is 2*t_duration), so no gain is expected,
+and that the T1 sequence has no padding to optimize.
+
+To run this script, from a windows command prompt, call:
+ python shotRateOptimizer.py <config>
+e.g. python shotRateOptimizer.py XY8config
+"""
+#Imports
+import connectionConfig as conCfg
+import configControl as cfgCtl
+import mainControl as mainCtl
+import PBcontrol as PBctl
+import sequenceControl as seqCtl
+import math
+import sys
+
+t_min = seqCtl.t_min
+
+def roundUp(t):
+	#Rounds t up to the PulseBlaster time resolution.
+	return t_min*math.ceil(t/t_min)
+
+def minimumPadding(expCfg):
+	#Returns a dictionary of the minimum safe value (in ns) of each padding argument of the experiment's pulse sequence, calculated from the setup latencies only.
+	if not cfgCtl.sequenceInfo[expCfg.sequence].paddingArgNames:
+		print('Error: the',expCfg.sequence,'sequence has no padding arguments to optimize (its period is set by the scanned parameter and t_AOM).')
+		sys.exit()
+	IQpadding = expCfg.IQpadding if expCfg.sequence in ['T2seq','XY8seq','correlSpecSeq'] else 0
+	if expCfg.sequence == 'ESRseq':
+		return {'t_readoutBuffer':roundUp(t_min*round(300/t_min) + conCfg.uW_SwitchTime + conCfg.paddingMargin)}
+	uWtoAOM_delay = roundUp(max(conCfg.uW_SwitchTime,IQpadding) + conCfg.paddingMargin)
+	if expCfg.sequence == 'correlSpecSeq':
+		#start_delay does not include t_readoutDelay in this sequence:
+		return {'start_delay':roundUp(expCfg.t_readoutDelay + conCfg.AOM_FallTime + IQpadding + conCfg.paddingMargin),'uWtoAOM_delay':uWtoAOM_delay}
+	return {'startPadding':roundUp(conCfg.AOM_FallTime + IQpadding + conCfg.paddingMargin),'uWtoAOM_delay':uWtoAOM_delay}
+
+def sequencePeriods(expCfg,padding=None):
+	#Returns the sequence period (in ns) of each scan point, with the given padding (or the default padding of the sequence builder if padding is None).
+	sequenceArgs = [getattr(expCfg,name) for name in cfgCtl.sequenceInfo[expCfg.sequence].sequenceArgNames]
+	if padding is not None:
+		sequenceArgs += [padding[name] for name in cfgCtl.sequenceInfo[expCfg.sequence].paddingArgNames]
+	if expCfg.sequence == 'ESRseq':
+		return [seqCtl.sequencePeriod(PBctl.compileSequence(expCfg.sequence,sequenceArgs))]*len(expCfg.scannedParam)
+	return [seqCtl.sequencePeriod(PBctl.compileSequence(expCfg.sequence,[scanValue]+sequenceArgs)) for scanValue in expCfg.scannedParam]
+
+def tightenedPadding(expCfg):
+	#Returns the tightened padding of the experiment: the minimum safe padding, with the start padding lengthened if needed so that the DAQ gates (two per sequence period, one per half) never exceed DAQ_MaxSamplingRate.
+	padding = minimumPadding(expCfg)
+	if expCfg.sequence == 'ESRseq':
+		return padding
+	minimumHalfPeriod = roundUp(1e9/conCfg.DAQ_MaxSamplingRate)
+	shortestHalfPeriod = min(sequencePeriods(expCfg,padding))/2
+	if shortestHalfPeriod < minimumHalfPeriod:
+		startName = cfgCtl.sequenceInfo[expCfg.sequence].paddingArgNames[0]
+		padding[startName] = padding[startName] + roundUp(minimumHalfPeriod-shortestHalfPeriod)
+	return padding
+
+def reportShotRateGain(expCfg,padding):
+	#Prints the shot rate (sequence repetitions per second) of each scan point with the default and the given padding, and returns the list of gains (tightened/default shot rate).
+	defaultPeriods = sequencePeriods(expCfg)
+	tightenedPeriods = sequencePeriods(expCfg,padding)
+	gains = [defaultPeriod/tightenedPeriod for defaultPeriod,tightenedPeriod in zip(defaultPeriods,tightenedPeriods)]
+	print('Scan point\tDefault shot rate (kHz)\tTightened shot rate (kHz)\tGain')
+	for [scanValue,defaultPeriod,tightenedPeriod,gain] in zip(expCfg.scannedParam,defaultPeriods,tightenedPeriods,gains):
+		print('%g\t%.2f\t%.2f\t%.2fx' % (scanValue,1e6/defaultPeriod,1e6/tightenedPeriod,gain))
+	defaultTime = 2*expCfg.Nsamples*sum(defaultPeriods)*1e-9
+	tightenedTime = 2*expCfg.Nsamples*sum(tightenedPeriods)*1e-9
+	print('Acquisition time per run:',mainCtl.formatDuration(defaultTime),'(default padding),',mainCtl.formatDuration(tightenedTime),'(tightened padding), i.e.',round(defaultTime/tightenedTime,2),'times faster.')
+	if min(gains)<1:
+		print('Note: the tightened sequence is longer than the default sequence at some scan points, i.e. the default padding is shorter than the minimum safe padding for the latencies entered in connectionConfig.py.')
+	return gains
+
+if __name__ == "__main__":
+	if len(sys.argv)!=2:
+		print('Usage: python shotRateOptimizer.py <config>')
+		sys.exit()
+	expCfg = cfgCtl.loadConfig(sys.argv[1])._replace(sequencePadding=None).makeRunConfig()
+	mainCtl.validateUserInput(expCfg)
+	padding = tightenedPadding(expCfg)
+	reportShotRateGain(expCfg,padding)
+	print('To run the tightened sequence, add the following line to the experiment config file:\nsequencePadding =',padding)
@@ -0,0 +1,78 @@
+# spectrumControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Streaming spectrum of correlation spectroscopy data: the windowed, zero-padded FFT of the contrast versus t_corr, updated
+# after each averaging run. The FFT is linear, so the spectrum of the averaged contrast is the average of the spectra of the
+# individual runs: only the FFT of the new run is calculated at each update, and the run-to-run scatter of the spectra gives
+# the noise level used to calculate the signal-to-noise ratio (SNR) of the spectral peaks.
+import numpy as np
+
+# The FFT length is the smallest power of two which is at least zeroPadFactor times the number of scan points:
+zeroPadFactor = 4
+
+class StreamingSpectrum:
+	def __init__(self,t_corr,zeroPadFactor=zeroPadFactor):
+		#t_corr: scan points (in ns), in increasing order. Non-uniformly spaced scan points are interpolated onto a uniform grid.
+		self.t_corr = np.asarray(t_corr,dtype=float)
+		self.tUniform = np.linspace(self.t_corr[0],self.t_corr[-1],len(self.t_corr))
+		self.uniform = np.allclose(self.t_corr,self.tUniform)
+		self.window = np.hanning(len(self.t_corr))
+		self.Nfft = 2**int(np.ceil(np.log2(zeroPadFactor*len(self.t_corr))))
+		self.frequencies = np.fft.rfftfreq(self.Nfft,(self.tUniform[1]-self.tUniform[0])*1e-9) #in Hz
+		self.sumSpectrum = np.zeros(len(self.frequencies),dtype=complex)
+		self.sumPower = np.zeros(len(self.frequencies))
+		self.Nruns = 0
+
+	def addRun(self,contrast):
+		#Adds the contrast of one averaging run (in the order of t_corr) to the spectrum.
+		contrast = np.asarray(contrast,dtype=float)
+		if not self.uniform:
+			contrast = np.interp(self.tUniform,self.t_corr,contrast)
+		spectrum = np.fft.rfft(self.window*(contrast-np.mean(contrast)),self.Nfft)
+		self.sumSpectrum += spectrum
+		self.sumPower += np.abs(spectrum)**2
+		self.Nruns += 1
+
+	def amplitude(self):
+		#Amplitude spectrum of the averaged contrast.
+		return np.abs(self.sumSpectrum)/max(self.Nruns,1)
+
+	def noiseLevel(self):
+		#Noise level of the amplitude spectrum: the standard error of the mean spectrum (from the run-to-run scatter, averaged over frequency) once two or more runs have been added, or the median amplitude (i.e. the floor of the spectrum) after the first run (which underestimates the noise of denoised, e.g. sparse-sampling reconstructed, contrasts).
+		if self.Nruns<2:
+			return np.median(self.amplitude()[1:])
+		meanSpectrum = self.sumSpectrum/self.Nruns
+		variance = (self.sumPower/self.Nruns - np.abs(meanSpectrum)**2)/(self.Nruns-1)
+		return np.sqrt(np.mean(np.maximum(variance[1:],0)))
+
+	def peaks(self,Npeaks=3):
+		#Returns [frequency (Hz), amplitude, SNR] of the Npeaks largest local maxima of the amplitude spectrum (excluding zero frequency), in order of decreasing amplitude.
+		amplitude = self.amplitude()
+		i_maxima = 1+np.nonzero((amplitude[1:-1]>amplitude[:-2]) & (amplitude[1:-1]>=amplitude[2:]))[0]
+		i_maxima = i_maxima[np.argsort(amplitude[i_maxima])[::-1][0:Npeaks]]
+		noise = self.noiseLevel()
+		return [[self.frequencies[i],amplitude[i],amplitude[i]/noise if noise>0 else np.inf] for i in i_maxima]
+
+	def save(self,spectrumFileName):
+		#Saves the frequencies (Hz) and amplitude spectrum as a tabulated text file.
+		np.savetxt(spectrumFileName,np.transpose([self.frequencies,self.amplitude()]),fmt=['%.3f','%.8e'],delimiter='\t')
@@ -0,0 +1,67 @@
+# test_dataCatalog.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+#Imports
+import configControl as cfgCtl
+import dataCatalog
+import numpy as np
+import os
+
+def saveRun(savePath,fileName,sequence,values,N_scanPts=5):
+	#Writes a data file and its _PARAMS.txt file as mainControl.py saves them (values gives the parameters, by name).
+	dataFileName = os.path.join(str(savePath),fileName+'.txt')
+	with open(dataFileName[:-len('.txt')]+'_PARAMS.txt','w') as paramFile:
+		for [label,name,fmt] in cfgCtl.sequenceInfo[sequence].paramFileFields:
+			paramFile.write(('%s\t'+fmt+'\n')%(label,values.get(name,dataFileName if name=='dataFileName' else 0)))
+	np.savetxt(dataFileName,np.column_stack([np.linspace(values['scanStart'],values['scanEnd'],N_scanPts),np.ones(N_scanPts),np.ones(N_scanPts)]))
+	return dataFileName
+
+def test_updateAndQuery(tmp_path):
+	saveRun(tmp_path,'XY8_2026-09-02_10h00m00s','XY8seq',{'scanStart':100,'scanEnd':500,'t_pi':24,'N':4})
+	saveRun(tmp_path,'XY8_2026-08-20_10h00m00s','XY8seq',{'scanStart':100,'scanEnd':500,'t_pi':24,'N':8})
+	saveRun(tmp_path,'ESR_2026-09-03_10h00m00s','ESRseq',{'scanStart':2.8e9,'scanEnd':2.9e9,'t_duration':5e4})
+	assert dataCatalog.updateCatalog(tmp_path) == 3
+	#Unchanged files are not re-indexed:
+	assert dataCatalog.updateCatalog(tmp_path) == 0
+	entries = dataCatalog.query(tmp_path,"sequence='XY8seq' AND t_pi=24 AND N>=4 AND dateTime>=?",['2026-09-01'])
+	assert [os.path.basename(entry.dataFileName) for entry in entries] == ['XY8_2026-09-02_10h00m00s.txt']
+	[entry] = entries
+	assert (entry.state,entry.pointsSaved,entry.scanStart,entry.scanEnd) == ('unknown',5,100,500)
+	assert entry.load().sequence == 'XY8seq'
+	assert [entry.sequence for entry in dataCatalog.query(tmp_path)] == ['XY8seq','XY8seq','ESRseq']
+
+def test_recordSaveKeepsState(tmp_path):
+	dataFileName = saveRun(tmp_path,'T2_2026-09-02_10h00m00s','T2seq',{'scanStart':100,'scanEnd':500,'t_pi':24,'numberOfPiPulses':2})
+	dataCatalog.recordSave(dataFileName,3,3,False)
+	[entry] = dataCatalog.query(tmp_path)
+	assert (entry.state,entry.Navg,entry.runsCompleted) == ('incomplete',3,3)
+	#A re-indexed run keeps the completion state recorded by mainControl.py:
+	saveRun(tmp_path,'T2_2026-09-02_10h00m00s','T2seq',{'scanStart':100,'scanEnd':500,'t_pi':24,'numberOfPiPulses':2},N_scanPts=7)
+	[entry] = dataCatalog.query(tmp_path)
+	assert (entry.state,entry.pointsSaved,entry.Navg) == ('incomplete',7,3)
+
+def test_deletedRunsAreRemoved(tmp_path):
+	dataFileName = saveRun(tmp_path,'ESR_2026-09-03_10h00m00s','ESRseq',{'scanStart':2.8e9,'scanEnd':2.9e9,'t_duration':5e4})
+	assert len(dataCatalog.query(tmp_path)) == 1
+	os.remove(dataFileName)
+	assert dataCatalog.query(tmp_path) == []
@@ -0,0 +1,65 @@
+# test_fitControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+#Imports
+import fitControl as fitCtl
+import numpy as np
+import pytest
+
+def noisy(y,noise=1e-4,seed=0):
+	return y + noise*np.random.default_rng(seed).standard_normal(len(y))
+
+def test_leastSquaresFit_recoversLinearModel():
+	x = np.linspace(0,10,50)
+	[p,cost] = fitCtl.leastSquaresFit(lambda x,a,b: a*x+b,x,3*x-2,[1,0])
+	assert np.allclose(p,[3,-2],atol=1e-6)
+	assert cost < 1e-12
+
+def test_fitLorentzianDip():
+	f = np.linspace(2.80e9,2.94e9,141)
+	[f0,gamma,depth,offset] = fitCtl.fitLorentzianDip(f,noisy(fitCtl.lorentzianDip(f,2.87e9,5e6,0.1,1.0)))
+	assert f0 == pytest.approx(2.87e9,abs=2e5)
+	assert gamma == pytest.approx(5e6,rel=0.02)
+	assert depth == pytest.approx(0.1,rel=0.02)
+	assert offset == pytest.approx(1.0,abs=1e-3)
+
+def test_fitDampedSinusoid():
+	t = np.arange(10,1000,10.)
+	[amplitude,period,decayTime,offset] = fitCtl.fitDampedSinusoid(t,noisy(fitCtl.dampedSinusoid(t,0.05,180,600,0.9)))
+	assert amplitude == pytest.approx(0.05,rel=0.02)
+	assert period == pytest.approx(180,rel=0.01)
+	assert decayTime == pytest.approx(600,rel=0.05)
+	assert offset == pytest.approx(0.9,abs=1e-3)
+
+def test_fitStretchedExponential():
+	t = np.geomspace(1e3,1e7,40)
+	[amplitude,decayTime,stretch,offset] = fitCtl.fitStretchedExponential(t,noisy(fitCtl.stretchedExponential(t,0.2,3e5,0.7,0.01)))
+	assert amplitude == pytest.approx(0.2,rel=0.02)
+	assert decayTime == pytest.approx(3e5,rel=0.05)
+	assert stretch == pytest.approx(0.7,rel=0.05)
+	assert offset == pytest.approx(0.01,abs=2e-3)
+
+@pytest.mark.parametrize('fitFunction',[fitCtl.fitLorentzianDip,fitCtl.fitDampedSinusoid,fitCtl.fitStretchedExponential])
+def test_fitsRejectTooFewPoints(fitFunction):
+	with pytest.raises(ValueError):
+		fitFunction([1.0],[0.5])
@@ -0,0 +1,48 @@
+# test_samplingControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+#Imports
+import numpy as np
+import samplingControl as smpCtl
+
+def test_sparseScanPoints():
+	gridPoints = np.arange(0,200.)*10
+	points = smpCtl.sparseScanPoints(gridPoints,60,seed=1)
+	assert len(points) == 60
+	assert (points[0],points[-1]) == (gridPoints[0],gridPoints[-1])
+	assert np.all(np.diff(points)>0) and np.all(np.isin(points,gridPoints))
+
+def test_logScanPoints_roundsAndMerges():
+	points = smpCtl.logScanPoints(100,1e6,30,10)
+	assert (points[0],points[-1]) == (100,1e6)
+	assert np.all(points%10 == 0) and np.all(np.diff(points)>0)
+	#Only 10 distinct multiples of 10 ns lie between 10 and 100 ns:
+	assert np.array_equal(smpCtl.logScanPoints(10,100,50,10),np.arange(10,101,10))
+
+def test_reconstructSparse_recoversSinusoid():
+	tGrid = np.arange(0,200.)*10
+	signal = 0.3+0.1*np.cos(2*np.pi*tGrid/200)
+	tSampled = smpCtl.sparseScanPoints(tGrid,60,seed=1)
+	reconstruction = smpCtl.reconstructSparse(tGrid,tSampled,signal[np.searchsorted(tGrid,tSampled)])
+	assert np.max(np.abs(reconstruction-signal)) < 0.02
+	assert np.argmax(np.abs(np.fft.rfft(reconstruction-np.mean(reconstruction)))) == 10
@@ -0,0 +1,80 @@
+# test_sequenceCache.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+#Imports
+import connectionConfig as conCfg
+import numpy as np
+import os
+import pytest
+import sequenceCache as seqCache
+import sequenceControl as seqCtl
+
+@pytest.fixture
+def cache(tmp_path,monkeypatch):
+	#A cache in a temporary folder, limited to 1 MB:
+	monkeypatch.setattr(conCfg,'sequenceCachePath',str(tmp_path))
+	monkeypatch.setattr(conCfg,'sequenceCacheMaxMB',1)
+	monkeypatch.setattr(seqCache,'_cacheSize',None)
+	return tmp_path
+
+def instructionArray(N_instructions,duration=10.0):
+	instructions = np.zeros(N_instructions,dtype=seqCtl.instructionDtype)
+	instructions['duration'] = duration
+	return instructions
+
+def test_storeAndLoad(cache):
+	key = seqCache.cacheKey('T1seq',[1000,2000,300,50])
+	assert seqCache.load(key) is None
+	seqCache.store(key,instructionArray(4,duration=25.0))
+	loaded = seqCache.load(key)
+	assert loaded.dtype == seqCtl.instructionDtype and np.array_equal(loaded,instructionArray(4,duration=25.0))
+	assert os.listdir(cache) == [seqCache.version()]
+
+def test_cacheKey(monkeypatch):
+	key = seqCache.cacheKey('T1seq',[1000,2000,300,50])
+	#Times equal on the PulseBlaster clock grid give the same key:
+	assert seqCache.cacheKey('T1seq',[1000.0000000001,2000,300,50]) == key
+	assert seqCache.cacheKey('T1seq',[1000,2000,300,60]) != key
+	assert seqCache.cacheKey('T2seq',[1000,2000,300,50]) != key
+	monkeypatch.setattr(seqCtl,'DAQ_MaxSamplingRate',2*seqCtl.DAQ_MaxSamplingRate)
+	assert seqCache.cacheKey('T1seq',[1000,2000,300,50]) != key
+
+def test_evictsLeastRecentlyUsed(cache):
+	#Files of about 0.2 MB, used in the order they are stored:
+	keys = [seqCache.cacheKey('T1seq',[1000*i]) for i in range(0,5)]
+	for i,key in enumerate(keys[0:4]):
+		seqCache.store(key,instructionArray(10000))
+		os.utime(os.path.join(seqCache.cacheFolder(),key+'.npy'),(i,i))
+	#Use the oldest file, then exceed 1 MB:
+	assert seqCache.load(keys[0]) is not None
+	seqCache.store(keys[4],instructionArray(10000))
+	cached = [key for key in keys if os.path.isfile(os.path.join(seqCache.cacheFolder(),key+'.npy'))]
+	assert cached == [keys[0],keys[3],keys[4]]
+	assert seqCache._cacheSize <= seqCache.evictionTarget*1e6
+
+def test_staleVersionsAreDeleted(cache):
+	staleFolder = os.path.join(str(cache),'0123456789abcdef')
+	os.makedirs(staleFolder)
+	open(os.path.join(staleFolder,'stale.npy'),'wb').close()
+	assert seqCache.load(seqCache.cacheKey('T1seq',[1000])) is None
+	assert os.listdir(cache) == [seqCache.version()]
@@ -0,0 +1,51 @@
+# test_sequenceControl.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+#Imports
+import json
+import numpy as np
+import os
+import pytest
+import sequenceControl as seqCtl
+
+# Event catalogs (event times in PulseBlaster clock ticks and channel bit masks) of a few sequences, as calculated by the
+# list-based sequence builders and event cataloguer which preceded the NumPy ones, with the settings they were calculated for:
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),'data','sequenceCatalogs.json')) as catalogFile:
+	reference = json.load(catalogFile)
+
+@pytest.fixture(autouse=True)
+def referenceSettings(monkeypatch):
+	for [name,value] in reference['settings'].items():
+		monkeypatch.setattr(seqCtl,name,value)
+
+@pytest.mark.parametrize('sequence,args,eventTimes,bitMasks',reference['catalogs'],ids=[catalog[0] for catalog in reference['catalogs']])
+def test_sequenceEventCataloguer_matchesReference(sequence,args,eventTimes,bitMasks):
+	[newEventTimes,newBitMasks] = seqCtl.sequenceEventCataloguer(seqCtl.makeSequence(sequence,args))
+	assert newEventTimes.tolist() == eventTimes
+	assert newBitMasks.tolist() == bitMasks
+
+def test_zeroLengthPulsesCancel():
+	channels = [seqCtl.makeChannel(seqCtl.AOM,[0,100],[50,0]),seqCtl.makeChannel(seqCtl.DAQ,[100],[20])]
+	[eventTimes,bitMasks] = seqCtl.sequenceEventCataloguer(channels)
+	assert (eventTimes*seqCtl.t_min).tolist() == [0,50,100,120]
+	assert bitMasks.tolist() == [seqCtl.AOM,0,seqCtl.DAQ,0]
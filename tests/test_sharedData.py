@@ -0,0 +1,89 @@
+# test_sharedData.py
+# Copyright 2018 Diana Prado Lopes Aude Craik
+
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+#Imports
+import ast
+import numpy as np
+import os
+import pytest
+import sharedData
+import subprocess
+import sys
+import threading
+
+@pytest.fixture
+def dataPlane():
+	dataPlane = sharedData.DataPlane.create('qdSpectroTest_'+str(os.getpid()),N_scanPts=5,Navg=3,rawLength=4)
+	yield dataPlane
+	dataPlane.close()
+
+def test_createAndAttach(dataPlane):
+	header = dataPlane.readHeader()
+	assert [header[name] for name in ['version','state','N_scanPts','Navg','rawLength','i_run']] == [0,sharedData.RUNNING,5,3,4,-1]
+	assert dataPlane.arrays['signal'].shape == (5,3) and dataPlane.arrays['rawShots'].shape == (4,)
+	with dataPlane.writing(i_run=1,i_scanPoint=2) as arrays:
+		arrays['signal'][2,1] = 7.5
+	#Readers attach from another process (attaching from the writer's process would confuse the resource tracker):
+	reader = 'import sharedData; reader = sharedData.DataPlane.attach(%r); print(reader.readHeader()); print(reader.arrays["signal"].tolist()); reader.close()'%dataPlane.sharedMemory.name
+	output = subprocess.run([sys.executable,'-c',reader],cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),capture_output=True,text=True,check=True).stdout
+	[header,signal] = [ast.literal_eval(line) for line in output.splitlines()]
+	assert [header[name] for name in ['version','i_run','i_scanPoint','N_scanPts']] == [2,1,2,5]
+	assert signal[2][1] == 7.5 and sum(map(sum,signal)) == 7.5
+
+def test_readRetryDetectsUpdates(dataPlane):
+	version = dataPlane.readBegin()
+	assert not dataPlane.readRetry(version)
+	with dataPlane.writing() as arrays:
+		#A reader starting during an update must retry:
+		assert dataPlane.readRetry(version)
+		arrays['contrast'][:] = 1
+	assert dataPlane.readRetry(version)
+	assert dataPlane.readBegin() == version+2
+
+def test_snapshotIsConsistent(dataPlane):
+	#The writer sets signal and background to the same value in each update, so a consistent snapshot always has equal arrays:
+	stop = threading.Event()
+	def write():
+		value = 0
+		while not stop.is_set():
+			value += 1
+			with dataPlane.writing(i_scanPoint=value%5) as arrays:
+				arrays['signal'][:] = value
+				arrays['background'][:] = value
+	writer = threading.Thread(target=write)
+	writer.start()
+	try:
+		for i in range(0,200):
+			[header,arrays] = dataPlane.snapshot(['signal','background'])
+			assert header['version']%2 == 0
+			assert np.all(arrays['signal'] == arrays['signal'][0,0]) and np.array_equal(arrays['signal'],arrays['background'])
+	finally:
+		stop.set()
+		writer.join()
+
+def test_writingWithoutSharedMemory():
+	arrays = sharedData.allocateArrays(5,3)
+	with sharedData.writing(None,i_scanPoint=1):
+		arrays['signal'][1,0] = 2
+	assert arrays['signal'].shape == (5,3) and arrays['rawShots'].shape == (0,)
+	assert arrays['signal'][1,0] == 2